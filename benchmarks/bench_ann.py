@@ -0,0 +1,72 @@
+"""Recall@k and latency of the IVF index against exact search.
+
+Uses clustered synthetic unit vectors (real embeddings are far from uniform)
+and reports, per ``nprobe``, the fraction of the exact top-k that the IVF
+search returns and the median query latency.
+
+Run from the Backend directory::
+
+    python -m benchmarks.bench_ann --rows 200000 --nprobe 1,4,8,16,32
+"""
+import argparse
+import time
+
+import numpy as np
+
+from services.ann_index import IVFIndex
+from services.vector_store import _normalize, _top_k_cosine, _top_k_indices
+
+
+def _clustered(rng: np.random.Generator, rows: int, dim: int, clusters: int) -> np.ndarray:
+    centers = _normalize(rng.standard_normal((clusters, dim), dtype=np.float32))
+    labels = rng.integers(0, clusters, size=rows)
+    noise = rng.standard_normal((rows, dim), dtype=np.float32) * 0.06
+    return _normalize(centers[labels] + noise)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=8)
+    parser.add_argument("--nlist", type=int, default=0)
+    parser.add_argument("--nprobe", default="1,4,8,16,32")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    matrix = _clustered(rng, args.rows, args.dim, args.clusters)
+    picks = rng.choice(args.rows, size=args.queries, replace=False)
+    queries = _normalize(matrix[picks] + rng.standard_normal((args.queries, args.dim), dtype=np.float32) * 0.05)
+
+    start = time.perf_counter()
+    index = IVFIndex.build(matrix, args.nlist)
+    build_s = time.perf_counter() - start
+
+    exact, exact_ms = [], []
+    for query in queries:
+        start = time.perf_counter()
+        exact.append(set(_top_k_cosine(matrix, query, args.top_k)))
+        exact_ms.append((time.perf_counter() - start) * 1000)
+
+    print(f"rows={args.rows} dim={args.dim} nlist={index.nlist} build={build_s:.2f}s")
+    print(f"{'search':>10} {'recall@k':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    print(f"{'exact':>10} {1.0:>9.3f} {np.percentile(exact_ms, 50):>8.2f} {np.percentile(exact_ms, 99):>8.2f}")
+    for nprobe in (int(n) for n in args.nprobe.split(",") if n):
+        hits, latencies = 0, []
+        for query, truth in zip(queries, exact):
+            start = time.perf_counter()
+            rows = index.candidates(query, nprobe)
+            found = rows[_top_k_indices(matrix[rows] @ query, args.top_k)]
+            latencies.append((time.perf_counter() - start) * 1000)
+            hits += len(truth.intersection(found.tolist()))
+        recall = hits / (args.top_k * len(queries))
+        print(
+            f"{'nprobe=' + str(nprobe):>10} {recall:>9.3f} "
+            f"{np.percentile(latencies, 50):>8.2f} {np.percentile(latencies, 99):>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
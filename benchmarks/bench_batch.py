@@ -0,0 +1,65 @@
+"""Per-query search loop vs one batched scoring pass for N questions.
+
+Scores the same queries one ``_search_rows`` call at a time and with
+``_search_rows_batch`` (one matrix-matrix product per block of rows), for
+float32 and int8 stores, and checks both return the same rows.
+
+Run from the Backend directory::
+
+    python -m benchmarks.bench_batch --rows 10000,100000 --queries 1,8,32
+"""
+import argparse
+import time
+
+import numpy as np
+
+from services.quantization import QuantizedMatrix
+from services.vector_store import Sentences, StoreView, _normalize, _search_rows, _search_rows_batch
+
+
+def _view(vectors: np.ndarray, quantization: str) -> StoreView:
+    rows = vectors.shape[0]
+    quantized = QuantizedMatrix.from_vectors(quantization, vectors) if quantization != "none" else None
+    docs = [("", "doc")] * rows
+    return StoreView(vectors, docs, {"doc": [(0, rows)]}, {}, 0, None, quantized, Sentences.empty(), None)
+
+
+def _time_ms(fn, repeat: int) -> float:
+    fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return float(np.median(samples))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", default="10000,100000")
+    parser.add_argument("--queries", default="1,8,32")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--top-k", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'rows':>8} {'quant':>6} {'queries':>7} {'loop ms':>9} {'batch ms':>9} {'speedup':>8} {'same':>5}")
+    for rows in (int(r) for r in args.rows.split(",") if r):
+        vectors = _normalize(rng.standard_normal((rows, args.dim), dtype=np.float32))
+        for quantization in ("none", "int8"):
+            view = _view(vectors, quantization)
+            for count in (int(q) for q in args.queries.split(",") if q):
+                queries = _normalize(rng.standard_normal((count, args.dim), dtype=np.float32))
+                loop = lambda: [_search_rows(view, query, args.top_k) for query in queries]
+                batch = lambda: _search_rows_batch(view, queries, args.top_k)
+                same = loop() == batch()
+                loop_ms, batch_ms = _time_ms(loop, args.repeat), _time_ms(batch, args.repeat)
+                print(
+                    f"{rows:>8} {quantization:>6} {count:>7} {loop_ms:>9.2f} {batch_ms:>9.2f} "
+                    f"{loop_ms / batch_ms:>7.1f}x {str(same):>5}"
+                )
+
+
+if __name__ == "__main__":
+    main()
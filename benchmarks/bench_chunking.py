@@ -0,0 +1,82 @@
+"""Throughput and index size of the structured chunker vs fixed 500-character slicing.
+
+Chunks synthetic manual-like pages (paragraphs of varied sentences) page by
+page, the way ingestion streams them, and reports pages/s, chunk count,
+token statistics, chunks cut mid-word and the float32 index size each scheme
+would produce.
+
+Run from the Backend directory::
+
+    python -m benchmarks.bench_chunking --pages 500 --tokenizer
+"""
+import argparse
+import time
+
+import numpy as np
+
+from utils.chunking import approximate_token_counts, make_chunker
+
+_WORDS = (
+    "the a torque setting for assembly valve pressure must be checked before each operation "
+    "replace filter cartridge every hours of service warranty does not cover damage caused by "
+    "improper installation refer to section table figure maintenance schedule inspection"
+).split()
+
+
+def synthetic_pages(pages: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    out = []
+    for number in range(pages):
+        paragraphs = []
+        for _ in range(rng.integers(3, 7)):
+            sentences = []
+            for _ in range(rng.integers(2, 7)):
+                words = rng.choice(_WORDS, size=rng.integers(6, 28))
+                sentences.append(" ".join(words).capitalize() + f" ({number}-{len(sentences)}).")
+            paragraphs.append(" ".join(sentences))
+        out.append("\n\n".join(paragraphs))
+    return out
+
+
+def _run(label, chunker, pages, count_tokens, dim):
+    start = time.perf_counter()
+    chunks = []
+    for number, text in enumerate(pages, start=1):
+        chunks.extend(chunker.feed(number, text))
+    chunks.extend(chunker.finish())
+    elapsed = time.perf_counter() - start
+    tokens = np.array(count_tokens([chunk.text for chunk in chunks]))
+    mid_word = sum(1 for chunk in chunks if chunk.text[-1:].isalnum())
+    index_mb = len(chunks) * dim * 4 / 1e6
+    print(
+        f"{label:>22} {len(pages) / elapsed:>9.0f} {len(chunks):>7} {tokens.mean():>7.0f} "
+        f"{tokens.max():>6} {(tokens > 512).mean() * 100:>7.1f}% {mid_word / len(chunks) * 100:>7.1f}% {index_mb:>8.2f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--max-tokens", type=int, default=256)
+    parser.add_argument("--overlap", type=int, default=32)
+    parser.add_argument("--tokenizer", action="store_true", help="count with the embedding model's tokenizer")
+    args = parser.parse_args()
+
+    count_tokens = approximate_token_counts
+    if args.tokenizer:
+        from services.embedding_service import count_tokens
+    pages = synthetic_pages(args.pages)
+    print(f"pages={args.pages} chars={sum(map(len, pages))} dim={args.dim}")
+    print(
+        f"{'chunker':>22} {'pages/s':>9} {'chunks':>7} {'avg tok':>7} {'max':>6} {'>512':>8} "
+        f"{'mid-word':>8} {'index MB':>8}"
+    )
+    _run("fixed 500 chars", make_chunker("fixed"), pages, count_tokens, args.dim)
+    for max_tokens in sorted({args.max_tokens // 2, args.max_tokens, args.max_tokens * 2}):
+        chunker = make_chunker("structured", max_tokens, args.overlap, count_tokens=count_tokens)
+        _run(f"structured {max_tokens}/{args.overlap}", chunker, pages, count_tokens, args.dim)
+
+
+if __name__ == "__main__":
+    main()
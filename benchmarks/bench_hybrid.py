@@ -0,0 +1,91 @@
+"""BM25 index build/query throughput and hybrid vs vector-only hit rate.
+
+Synthetic chunks each mention a unique part number and error code; their
+vectors are clustered by topic, and queries ask for one identifier with a
+query vector that only finds the right topic, which is the case where pure
+cosine search misses exact identifiers.
+
+Run from the Backend directory::
+
+    python -m benchmarks.bench_hybrid --rows 10000,100000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from services.lexical_index import BM25Index
+from services.vector_store import Sentences, StoreView, _normalize, _search_rows
+
+_WORDS = "valve pump filter pressure torque seal bearing housing gasket sensor relay motor".split()
+
+
+def _texts(rng: np.random.Generator, rows: int):
+    return [
+        f"Part PN-{row}-{row % 97} {' '.join(rng.choice(_WORDS, size=12))}. "
+        f"Error code E{row:06d} means the {rng.choice(_WORDS)} needs service."
+        for row in range(rows)
+    ]
+
+
+def _bench(rows: int, dim: int, clusters: int, queries: int, top_k: int, batch: int):
+    rng = np.random.default_rng(0)
+    texts = _texts(rng, rows)
+    labels = np.arange(rows) % clusters
+    centers = _normalize(rng.standard_normal((clusters, dim), dtype=np.float32))
+    vectors = _normalize(centers[labels] + rng.standard_normal((rows, dim), dtype=np.float32) * 0.06)
+
+    start = time.perf_counter()
+    index = BM25Index.build(texts)
+    build_s = time.perf_counter() - start
+    start = time.perf_counter()
+    incremental = BM25Index()
+    for offset in range(0, rows, batch):
+        incremental = incremental.extended(texts[offset:offset + batch])
+    incremental_s = time.perf_counter() - start
+
+    view = StoreView(vectors, [(text, "doc") for text in texts], {"doc": [(0, rows)]}, {}, 0, None, None, Sentences.empty(), index)
+    targets = rng.choice(rows, size=queries, replace=False)
+    query_texts = [f"What does error E{row:06d} mean?" for row in targets]
+    query_vecs = _normalize(centers[labels[targets]] + rng.standard_normal((queries, dim), dtype=np.float32) * 0.05)
+
+    results = {}
+    for label, use_text in (("vector", False), ("hybrid", True)):
+        hits, latencies = 0, []
+        for target, text, query_vec in zip(targets, query_texts, query_vecs):
+            start = time.perf_counter()
+            found = _search_rows(view, query_vec, top_k, query_text=text if use_text else None)
+            latencies.append((time.perf_counter() - start) * 1000)
+            hits += int(target in found)
+        results[label] = (hits / queries, np.percentile(latencies, 50), np.percentile(latencies, 99))
+
+    lexical_ms = []
+    for text in query_texts:
+        start = time.perf_counter()
+        index.search(text, [(0, rows)], top_k * 4)
+        lexical_ms.append((time.perf_counter() - start) * 1000)
+
+    print(
+        f"rows={rows} build={rows / build_s:,.0f} chunks/s incremental({batch})={rows / incremental_s:,.0f} chunks/s "
+        f"segments={len(incremental.segments)} index={index.nbytes / 1e6:.1f} MB "
+        f"bm25 query p50={np.percentile(lexical_ms, 50):.2f} ms ({1000 / np.mean(lexical_ms):,.0f} q/s)"
+    )
+    for label, (hit_rate, p50, p99) in results.items():
+        print(f"  {label:>7} hit@{top_k}={hit_rate:.3f} p50={p50:.2f} ms p99={p99:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", default="10000,100000")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=8)
+    parser.add_argument("--batch", type=int, default=256, help="chunks per incremental add")
+    args = parser.parse_args()
+    for rows in (int(r) for r in args.rows.split(",") if r):
+        _bench(rows, args.dim, args.clusters, args.queries, args.top_k, args.batch)
+
+
+if __name__ == "__main__":
+    main()
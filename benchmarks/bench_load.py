@@ -0,0 +1,284 @@
+"""Load test of the HTTP API against in-memory Supabase, emitting JSON.
+
+Drives the FastAPI app in process (``httpx.ASGITransport``) with tables and
+storage served by ``SupabaseStub`` (``SUPABASE_STUB=1``) and the
+deterministic hash embedder (``EMBEDDING_BACKEND=hash``), so runs need no
+Supabase project or model download and are repeatable across commits:
+
+* ingest: concurrent PDF uploads until every job is done (docs, pages and
+  chunks per second);
+* query: ``POST /messages`` latency percentiles and throughput for each
+  store size and concurrency level;
+* remove: ``DELETE /documents/{id}`` latency at each store size.
+
+The answer cache is off unless ``ANSWER_CACHE`` is set, so every query runs
+retrieval. Run from the Backend directory::
+
+    python -m benchmarks.bench_load --sizes 1000,20000 --concurrency 1,8,32 --output load.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+if "BENCH_LOAD_DIR" not in os.environ:
+    os.environ["BENCH_LOAD_DIR"] = tempfile.mkdtemp(prefix="bench_load_")
+_WORKDIR = os.environ["BENCH_LOAD_DIR"]
+for _key, _value in {
+    "SUPABASE_STUB": "1",
+    "SUPABASE_JWT_SECRET": "bench-load",
+    "EMBEDDING_BACKEND": "hash",
+    "ANSWER_CACHE": "0",
+    "INGEST_QUEUE_SIZE": "64",
+    "VECTOR_STORE_DIR": os.path.join(_WORKDIR, "stores"),
+    "INGEST_JOB_DIR": os.path.join(_WORKDIR, "jobs"),
+    "EMBEDDING_CACHE_PATH": os.path.join(_WORKDIR, "embeddings.sqlite3"),
+}.items():
+    os.environ.setdefault(_key, _value)
+
+import httpx
+import jwt
+import numpy as np
+
+USER = "00000000-0000-0000-0000-00000000b0b0"
+_VOCABULARY = 5000
+_SETTINGS = (
+    "SUPABASE_STUB_LATENCY_MS", "EMBEDDING_BACKEND", "VECTOR_STORE_QUANTIZATION", "VECTOR_HYBRID_SEARCH",
+    "VECTOR_DEDUP", "ANSWER_CACHE", "EMBEDDING_WORKERS", "PDF_PARSE_WORKERS", "INGEST_WORKERS",
+)
+
+
+def _percentiles(samples_ms) -> dict:
+    if not samples_ms:
+        return {"count": 0}
+    samples = np.asarray(samples_ms)
+    return {
+        "count": int(samples.size),
+        "mean_ms": round(float(samples.mean()), 3),
+        "p50_ms": round(float(np.percentile(samples, 50)), 3),
+        "p90_ms": round(float(np.percentile(samples, 90)), 3),
+        "p99_ms": round(float(np.percentile(samples, 99)), 3),
+        "max_ms": round(float(samples.max()), 3),
+    }
+
+
+def _chunk_texts(rng: np.random.Generator, count: int, sentences: int = 4, words: int = 12):
+    """Chunks of random words from a fixed vocabulary, so chunks rarely near-duplicate each other."""
+    ids = rng.integers(0, _VOCABULARY, size=(count, sentences, words))
+    return [" ".join(" ".join(f"w{w}" for w in sentence) + "." for sentence in chunk) for chunk in ids]
+
+
+class _Api:
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+        token = jwt.encode({"sub": USER}, os.environ["SUPABASE_JWT_SECRET"], algorithm="HS256")
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.params = {"user_id": USER}
+
+    async def call(self, method: str, path: str, **kwargs) -> httpx.Response:
+        return await self.client.request(method, path, params=self.params, headers=self.headers, **kwargs)
+
+    async def new_conversation(self, title: str) -> str:
+        response = await self.call("POST", "/conversations", json={"title": title})
+        response.raise_for_status()
+        return response.json()["conversation_id"]
+
+
+async def _ingest(api: _Api, docs: int, pages: int, rng: np.random.Generator) -> dict:
+    from benchmarks.bench_pdf import text_pdf
+
+    # Random-word lines: templated text would be deduplicated as near-duplicate chunks.
+    pdfs = [
+        text_pdf([_chunk_texts(rng, 45, sentences=1) for _ in range(pages)])
+        for _ in range(docs)
+    ]
+    conversation_id = await api.new_conversation("ingest")
+    accept_ms, rejected = [], 0
+
+    async def upload(i: int) -> str:
+        nonlocal rejected
+        while True:
+            start = time.perf_counter()
+            response = await api.call(
+                "POST", f"/conversations/{conversation_id}/documents",
+                files={"file": (f"doc{i}.pdf", pdfs[i], "application/pdf")},
+            )
+            if response.status_code != 503:
+                response.raise_for_status()
+                accept_ms.append((time.perf_counter() - start) * 1000)
+                return response.json()["doc_id"]
+            rejected += 1  # queue full: back off like a client honouring Retry-After
+            await asyncio.sleep(0.05)
+
+    async def finished(doc_id: str) -> dict:
+        while True:
+            response = await api.call("GET", f"/conversations/{conversation_id}/documents/{doc_id}/status")
+            status = response.json()
+            if status.get("state") in ("done", "failed", "cancelled"):
+                return status
+            await asyncio.sleep(0.02)
+
+    async def ingest(i: int) -> dict:
+        return await finished(await upload(i))
+
+    start = time.perf_counter()
+    statuses = await asyncio.gather(*(ingest(i) for i in range(docs)))
+    elapsed = time.perf_counter() - start
+    chunks = sum(status.get("chunks_total") or 0 for status in statuses)
+    return {
+        "docs": docs,
+        "pages_per_doc": pages,
+        "failed": sum(status.get("state") != "done" for status in statuses),
+        "queue_full_retries": rejected,
+        "seconds": round(elapsed, 3),
+        "docs_per_second": round(docs / elapsed, 3),
+        "pages_per_second": round(docs * pages / elapsed, 3),
+        "chunks": chunks,
+        "chunks_duplicate": sum(status.get("chunks_duplicate") or 0 for status in statuses),
+        "chunks_per_second": round(chunks / elapsed, 3),
+        "upload_accept": _percentiles(accept_ms),
+    }
+
+
+async def _seed(api: _Api, chunks: int, docs: int, rng: np.random.Generator):
+    """A conversation whose store holds ``chunks`` chunks over ``docs`` documents, added directly."""
+    from db.document_repo import save_document
+    from services.executors import run_cpu, run_io
+    from services.vector_store import get_store
+
+    conversation_id = await api.new_conversation(f"store-{chunks}")
+    store = await run_io(get_store, conversation_id)
+    texts = _chunk_texts(rng, chunks)
+    doc_ids = []
+    per_doc = -(-chunks // docs)
+    for d in range(docs):
+        doc_texts = texts[d * per_doc:(d + 1) * per_doc]
+        if not doc_texts:
+            break
+        doc_id = await save_document(USER, conversation_id, f"seed{d}.pdf", f"{USER}/{conversation_id}/seed{d}.pdf")
+        for start in range(0, len(doc_texts), 1024):
+            batch = doc_texts[start:start + 1024]
+            await run_cpu(store.add, batch, doc_id=doc_id, pages=[(1, 1)] * len(batch))
+        doc_ids.append(doc_id)
+    return conversation_id, texts, doc_ids
+
+
+async def _queries(api: _Api, conversation_id: str, texts, concurrency: int, requests: int, rng) -> dict:
+    # Questions are word runs from stored chunks, so retrieval has real matches.
+    questions = []
+    for i in rng.integers(0, len(texts), size=requests):
+        words = texts[i].rstrip(".").split()
+        offset = int(rng.integers(0, max(len(words) - 8, 1)))
+        questions.append(" ".join(words[offset:offset + 8]).replace(".", ""))
+    latencies, errors = [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def ask(question: str):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            response = await api.call("POST", f"/conversations/{conversation_id}/messages", json={"content": question})
+            if response.status_code == 200:
+                latencies.append((time.perf_counter() - start) * 1000)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(ask(question) for question in questions))
+    elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "errors": errors,
+        "throughput_rps": round(requests / elapsed, 3),
+        **_percentiles(latencies),
+    }
+
+
+async def _removes(api: _Api, conversation_id: str, doc_ids, count: int) -> dict:
+    latencies = []
+    for doc_id in doc_ids[:count]:
+        start = time.perf_counter()
+        response = await api.call("DELETE", f"/conversations/{conversation_id}/documents/{doc_id}")
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return _percentiles(latencies)
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+async def _main(args) -> dict:
+    import main as app_module
+
+    rng = np.random.default_rng(args.seed)
+    results = {
+        "benchmark": "bench_load",
+        "commit": _commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "config": {**{k: v for k, v in vars(args).items() if k != "output"}, **{k: os.getenv(k) for k in _SETTINGS}},
+    }
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with app_module.lifespan(app_module.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            api = _Api(client)
+            if args.docs:
+                results["ingest"] = await _ingest(api, args.docs, args.pages, rng)
+            results["query"], results["remove_doc"] = [], []
+            for size in [int(s) for s in args.sizes.split(",") if s.strip()]:
+                seed_start = time.perf_counter()
+                conversation_id, texts, doc_ids = await _seed(api, size, args.docs_per_store, rng)
+                seed_seconds = round(time.perf_counter() - seed_start, 3)
+                for concurrency in [int(c) for c in args.concurrency.split(",") if c.strip()]:
+                    row = await _queries(api, conversation_id, texts, concurrency, args.requests, rng)
+                    results["query"].append({"store_chunks": size, **row})
+                results["remove_doc"].append({
+                    "store_chunks": size,
+                    "chunks_per_doc": -(-size // args.docs_per_store),
+                    "seed_seconds": seed_seconds,
+                    **await _removes(api, conversation_id, doc_ids, args.removes),
+                })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=8, help="PDFs uploaded in the ingest phase (0 skips it)")
+    parser.add_argument("--pages", type=int, default=20, help="pages per uploaded PDF")
+    parser.add_argument("--sizes", default="1000,10000", help="store sizes (chunks) for query and remove runs")
+    parser.add_argument("--docs-per-store", type=int, default=10)
+    parser.add_argument("--concurrency", default="1,8,32")
+    parser.add_argument("--requests", type=int, default=200, help="queries per store size and concurrency")
+    parser.add_argument("--removes", type=int, default=3, help="documents removed per store size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON here as well as to stdout")
+    parser.add_argument("--keep", action="store_true", help=f"keep the working directory ({_WORKDIR})")
+    args = parser.parse_args()
+    try:
+        results = asyncio.run(_main(args))
+    finally:
+        if not args.keep:
+            shutil.rmtree(_WORKDIR, ignore_errors=True)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    sys.stdout.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
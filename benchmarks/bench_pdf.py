@@ -0,0 +1,121 @@
+"""Serial vs page-parallel PDF text extraction on a large synthetic PDF.
+
+Reports total extraction time, time to the first page (when chunking can
+start) and per-page extraction time percentiles, for the original
+``load_pdf``, for serial ``iter_pages`` and for ``aiter_pages`` (the path
+ingestion uses) over process pools of several sizes.
+
+Run from the Backend directory::
+
+    python -m benchmarks.bench_pdf --pages 600 --workers 1,2,4
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import List
+
+import numpy as np
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from utils.pdf_loader import aiter_pages, count_pages, iter_pages, load_pdf
+
+
+def synthetic_pdf(pages: int, lines_per_page: int = 45) -> bytes:
+    """A text-only PDF whose pages each hold ``lines_per_page`` distinct sentences."""
+    return text_pdf([
+        [
+            f"Section {number}.{line}: the torque setting for "
+            f"assembly A-{number}-{line} is {(number * 7 + line) % 90 + 10} Nm."
+            for line in range(lines_per_page)
+        ]
+        for number in range(pages)
+    ])
+
+
+def text_pdf(pages: List[List[str]]) -> bytes:
+    """A PDF with one page per entry of ``pages``, each line drawn as one text run."""
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    }))
+    resources = DictionaryObject({NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})})
+    for lines in pages:
+        page = writer.add_blank_page(612, 792)
+        body = "".join(
+            f"BT /F1 9 Tf 36 {770 - number * 16} Td ({line}) Tj ET\n" for number, line in enumerate(lines)
+        )
+        stream = DecodedStreamObject()
+        stream.set_data(body.encode("latin-1"))
+        page[NameObject("/Contents")] = writer._add_object(stream)
+        page[NameObject("/Resources")] = resources
+    out = BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+
+async def _aiter(pages):
+    for page in pages:
+        yield page
+
+
+async def _run(label: str, pages_iter):
+    start = time.perf_counter()
+    first = None
+    per_page = []
+    async for page in pages_iter:
+        if first is None:
+            first = time.perf_counter() - start
+        per_page.append(page.seconds * 1000)
+    total = time.perf_counter() - start
+    print(
+        f"{label:>16} {total:>8.2f} {first * 1000:>10.1f} "
+        f"{np.percentile(per_page, 50):>8.2f} {np.percentile(per_page, 99):>8.2f} {max(per_page):>8.2f}"
+    )
+
+
+async def _run_pool(label: str, pool: ProcessPoolExecutor, path: str, page_count: int, pages_per_task: int):
+    loop = asyncio.get_running_loop()
+
+    def submit(fn, *args):
+        return loop.run_in_executor(pool, fn, *args)
+
+    await _run(label, aiter_pages(path, submit, page_count, pages_per_task))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=600)
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--pages-per-task", type=int, default=16)
+    args = parser.parse_args()
+
+    data = synthetic_pdf(args.pages)
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    print(f"pages={args.pages} size={len(data) / 1e6:.1f} MB cpus={os.cpu_count()}")
+    try:
+        start = time.perf_counter()
+        load_pdf(BytesIO(data))
+        print(f"{'load_pdf':>16} {time.perf_counter() - start:>8.2f}  (whole document before any chunking)")
+        print(f"{'extractor':>16} {'total s':>8} {'first ms':>10} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        asyncio.run(_run("serial", _aiter(iter_pages(path))))
+        page_count = count_pages(path)
+        for workers in (int(w) for w in args.workers.split(",") if w):
+            with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                pool.submit(int).result()  # start the workers outside the timing
+                asyncio.run(_run_pool(f"{workers} processes", pool, path, page_count, args.pages_per_task))
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Memory, recall@k and latency of quantized vector storage.
+
+For each mode, scores the quantized copy, optionally re-ranks the best
+``top_k * rerank`` rows exactly against float32, and compares the result with
+exact float32 search.
+
+Run from the Backend directory::
+
+    python -m benchmarks.bench_quantization --rows 200000 --rerank 4
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.bench_ann import _clustered
+from services.quantization import QuantizedMatrix
+from services.vector_store import _normalize, _top_k_cosine, _top_k_indices
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=8)
+    parser.add_argument("--rerank", type=int, default=4, help="re-rank factor (0 disables)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    matrix = _clustered(rng, args.rows, args.dim, args.clusters)
+    picks = rng.choice(args.rows, size=args.queries, replace=False)
+    queries = _normalize(matrix[picks] + rng.standard_normal((args.queries, args.dim), dtype=np.float32) * 0.05)
+    exact, exact_ms = [], []
+    for query in queries:
+        start = time.perf_counter()
+        exact.append(set(_top_k_cosine(matrix, query, args.top_k)))
+        exact_ms.append((time.perf_counter() - start) * 1000)
+
+    print(f"rows={args.rows} dim={args.dim}")
+    print(f"{'mode':>8} {'MiB':>8} {'ratio':>6} {'recall':>7} {'+rerank':>8} {'p50 ms':>8}")
+    print(
+        f"{'float32':>8} {matrix.nbytes / 2**20:>8.1f} {1.0:>5.1f}x {1.0:>7.3f} {'-':>8} "
+        f"{np.percentile(exact_ms, 50):>8.2f}"
+    )
+    for mode in ("float16", "int8"):
+        quantized = QuantizedMatrix.from_vectors(mode, matrix)
+        coarse_hits = rerank_hits = 0
+        latencies = []
+        for query, truth in zip(queries, exact):
+            start = time.perf_counter()
+            scores = quantized.score_range(0, args.rows, query)
+            coarse = _top_k_indices(scores, args.top_k)
+            if args.rerank:
+                candidates = np.sort(_top_k_indices(scores, args.top_k * args.rerank))
+                reranked = candidates[_top_k_indices(matrix[candidates] @ query, args.top_k)]
+            latencies.append((time.perf_counter() - start) * 1000)
+            coarse_hits += len(truth.intersection(coarse.tolist()))
+            if args.rerank:
+                rerank_hits += len(truth.intersection(reranked.tolist()))
+        total = args.top_k * len(queries)
+        rerank_recall = f"{rerank_hits / total:>8.3f}" if args.rerank else f"{'-':>8}"
+        print(
+            f"{mode:>8} {quantized.nbytes / 2**20:>8.1f} {matrix.nbytes / quantized.nbytes:>5.1f}x "
+            f"{coarse_hits / total:>7.3f} {rerank_recall} {np.percentile(latencies, 50):>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
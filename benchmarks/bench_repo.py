@@ -0,0 +1,104 @@
+"""Round trips of message persistence and conversation deletes, serial vs async.
+
+Runs against ``PostgrestStub`` with a fixed per-request latency standing in
+for the network, so the numbers reflect request count and overlap rather
+than database work: two single-row inserts vs one bulk insert, and the
+chained cascading deletes vs the concurrent fan-out.
+
+Run from the Backend directory::
+
+    python -m benchmarks.bench_repo --latency-ms 20
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("SUPABASE_URL", "http://stub.local")
+
+from db.conversation_repo import delete_conversation
+from db.document_repo import delete_documents_for_conversation, list_included_doc_ids
+from db.message_repo import delete_messages_for_conversation, save_messages
+from db.postgrest import postgrest, postgrest_stats
+from db.postgrest_stub import PostgrestStub
+
+CONV = "00000000-0000-0000-0000-000000000001"
+USER = "00000000-0000-0000-0000-000000000002"
+
+
+async def _seed(docs: int):
+    await postgrest.insert("conversations", {"id": CONV, "user_id": USER, "title": "bench"}, returning=False)
+    await postgrest.insert(
+        "documents",
+        [{"conversation_id": CONV, "user_id": USER, "storage_path": f"p/{i}", "include": True} for i in range(docs)],
+        returning=False,
+    )
+
+
+async def _serial_message():
+    await list_included_doc_ids(CONV)
+    await postgrest.insert("messages", {"conversation_id": CONV, "sender": "user", "content": "q"}, returning=False)
+    await postgrest.insert("messages", {"conversation_id": CONV, "sender": "ai", "content": "a"}, returning=False)
+
+
+async def _bulk_message():
+    # The doc id lookup overlaps retrieval in the route; only the insert follows it.
+    await list_included_doc_ids(CONV)
+    await save_messages(CONV, [("user", "q"), ("ai", "a")])
+
+
+async def _serial_delete():
+    docs = await postgrest.select("documents", "id,storage_path", {"conversation_id": CONV, "user_id": USER})
+    if docs:
+        await postgrest.delete("documents", {"conversation_id": CONV, "user_id": USER})
+    await postgrest.delete("messages", {"conversation_id": CONV})
+    await postgrest.delete("conversations", {"id": CONV, "user_id": USER})
+
+
+async def _fanout_delete():
+    await asyncio.gather(
+        delete_documents_for_conversation(CONV, USER),
+        delete_messages_for_conversation(CONV),
+    )
+    await delete_conversation(CONV, USER)
+
+
+async def _time(label: str, stub: PostgrestStub, fn, repeat: int, docs: int = 0):
+    samples, before = [], stub.requests
+    for _ in range(repeat):
+        if docs:
+            await _seed(docs)
+        start = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    requests = (stub.requests - before) / repeat - (2 if docs else 0)
+    samples.sort()
+    print(f"{label:>22} {samples[len(samples) // 2]:>8.1f} ms {requests:>5.1f} requests")
+
+
+async def _main(latency_ms: float, repeat: int, docs: int):
+    stub = PostgrestStub(latency=latency_ms / 1000)
+    await postgrest.use_transport(stub.transport())
+    await _seed(docs)
+    print(f"stub latency={latency_ms} ms per request")
+    await _time("send_message serial", stub, _serial_message, repeat)
+    await _time("send_message bulk", stub, _bulk_message, repeat)
+    stub.tables.clear()
+    await _time("delete chained", stub, _serial_delete, repeat, docs)
+    await _time("delete fan-out", stub, _fanout_delete, repeat, docs)
+    for name, stats in postgrest_stats().items():
+        print(f"  {name:<22} calls={stats['count']:<5} avg={stats['avg_ms']:.1f} ms max={stats['max_ms']:.1f} ms")
+    await postgrest.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--docs", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(_main(args.latency_ms, args.repeat, args.docs))
+
+
+if __name__ == "__main__":
+    main()
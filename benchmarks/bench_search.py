@@ -0,0 +1,59 @@
+"""Micro-benchmark for VectorStore top-k search.
+
+Compares the previous per-query implementation (normalize a copy of the whole
+matrix, full ``argsort``) against the current one (rows normalized once at
+``add`` time, single matmul + ``argpartition``).
+
+Run from the Backend directory::
+
+    python -m benchmarks.bench_search --sizes 10000,100000,1000000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from services.vector_store import _normalize, _top_k_cosine
+
+
+def _legacy_top_k_cosine(matrix: np.ndarray, query: np.ndarray, k: int):
+    matrix_norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix_norm = matrix / np.maximum(matrix_norms, 1e-12)
+    query_norm = query / (np.linalg.norm(query) + 1e-12)
+    scores = matrix_norm @ query_norm
+    return np.argsort(-scores)[: min(k, matrix.shape[0])].tolist()
+
+
+def _time_ms(fn, repeat: int) -> float:
+    fn()  # warm caches / BLAS threads
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return float(np.median(samples))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--top-k", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'rows':>10} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+    for size in (int(s) for s in args.sizes.split(",") if s):
+        raw = rng.standard_normal((size, args.dim), dtype=np.float32)
+        query = rng.standard_normal(args.dim, dtype=np.float32)
+        before = _time_ms(lambda: _legacy_top_k_cosine(raw, query, args.top_k * 3), args.repeat)
+
+        matrix = _normalize(raw)  # done once, at add time
+        unit_query = query / np.linalg.norm(query)
+        after = _time_ms(lambda: _top_k_cosine(matrix, unit_query, args.top_k * 3), args.repeat)
+        print(f"{size:>10} {before:>10.2f} {after:>10.2f} {before / after:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
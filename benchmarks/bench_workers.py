@@ -0,0 +1,168 @@
+"""Per-worker memory of a shared vector store, and cross-worker invalidation latency.
+
+Builds one store with the hash embedder, then starts ``--workers`` spawned
+processes that each load it through ``get_store`` and run searches, the way
+uvicorn workers would. Each worker reports RSS, PSS and shared/private
+memory from ``/proc/self/smaps_rollup`` (Linux): the memory-mapped vectors
+and sentences show up as shared pages counted once across workers. With
+``--private`` each worker also copies the vectors onto its heap, which is
+what every worker would pay if stores were not mapped.
+
+Then the parent adds and removes probe documents and the workers report how
+long each write took to become visible to them (``get_store`` reloads a
+store another process has written).
+
+Run from the Backend directory::
+
+    python -m benchmarks.bench_workers --rows 200000 --workers 4
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+if "BENCH_WORKERS_DIR" not in os.environ:
+    os.environ["BENCH_WORKERS_DIR"] = tempfile.mkdtemp(prefix="bench_workers_")
+_WORKDIR = os.environ["BENCH_WORKERS_DIR"]
+for _key, _value in {
+    "EMBEDDING_BACKEND": "hash",
+    "EMBEDDING_CACHE": "0",
+    "VECTOR_DEDUP": "0",
+    "VECTOR_STORE_DIR": os.path.join(_WORKDIR, "stores"),
+}.items():
+    os.environ.setdefault(_key, _value)
+
+import numpy as np
+
+CONVERSATION = "bench-workers"
+_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def _memory() -> dict:
+    """Selected ``smaps_rollup`` fields of this process, in MiB."""
+    values = {}
+    try:
+        with open("/proc/self/smaps_rollup", encoding="ascii") as f:
+            for line in f:
+                name, _, rest = line.partition(":")
+                if name in _FIELDS:
+                    values[name] = int(rest.split()[0]) / 1024
+    except OSError:
+        pass
+    return values
+
+
+def _worker(index: int, queries: int, private: bool, probes: int, ready, start_probe, probe_done, results):
+    from services.vector_store import get_store
+
+    store = get_store(CONVERSATION)
+    heap_copy = np.array(store.vectors) if private else None
+    rng = np.random.default_rng(index)
+    latencies = []
+    for _ in range(queries):
+        query = rng.standard_normal(store.vectors.shape[1]).astype(np.float32)
+        start = time.perf_counter()
+        get_store(CONVERSATION).retrieve_vector(query, top_k=8)
+        latencies.append((time.perf_counter() - start) * 1000)
+    results.put(("memory", index, _memory(), float(np.percentile(latencies, 50))))
+    ready.wait()
+
+    for probe in range(probes):
+        doc_id = f"probe{probe}"
+        for present in (True, False):
+            start_probe.wait()
+            while (doc_id in get_store(CONVERSATION).doc_rows) != present:
+                time.sleep(0.0005)
+            results.put(("visible", index, time.monotonic()))
+            probe_done.wait()
+    del heap_copy
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000, help="chunks in the shared store")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=50, help="searches per worker before measuring memory")
+    parser.add_argument("--probes", type=int, default=5, help="add/remove pairs timed for invalidation")
+    parser.add_argument("--private", action="store_true", help="workers also copy the vectors onto their heap")
+    parser.add_argument("--keep", action="store_true", help=f"keep the working directory ({_WORKDIR})")
+    args = parser.parse_args()
+    try:
+        _run(args)
+    finally:
+        if not args.keep:
+            shutil.rmtree(_WORKDIR, ignore_errors=True)
+
+
+def _run(args):
+    from benchmarks.bench_load import _chunk_texts
+    from services.vector_store import get_store
+
+    store = get_store(CONVERSATION)
+    if len(store.docs) < args.rows:
+        texts = _chunk_texts(np.random.default_rng(0), args.rows - len(store.docs), sentences=2)
+        for start in range(0, len(texts), 4096):
+            batch = texts[start:start + 4096]
+            store.add(batch, doc_id=f"seed{start // 4096}", pages=[(1, 1)] * len(batch))
+    vector_mib = store.vectors.nbytes / 2**20
+    sentence_mib = store.sentences.vectors.nbytes / 2**20 if store.sentences.vectors is not None else 0.0
+
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(args.workers + 1)
+    start_probe = context.Barrier(args.workers + 1)
+    probe_done = context.Barrier(args.workers + 1)
+    results = context.Queue()
+    processes = [
+        context.Process(
+            target=_worker,
+            args=(i, args.queries, args.private, args.probes, barrier, start_probe, probe_done, results),
+        )
+        for i in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    memory = sorted(results.get() for _ in processes)
+    barrier.wait()
+
+    visible_ms = []
+    for probe in range(args.probes):
+        for present in (True, False):
+            start_probe.wait()  # workers are polling before the write starts
+            if present:
+                written = _timed_write(lambda: store.add([f"probe {probe} marker"], doc_id=f"probe{probe}"))
+            else:
+                written = _timed_write(lambda: store.remove_doc(f"probe{probe}"))
+            for _ in processes:
+                _, _, seen = results.get()
+                visible_ms.append(max(seen - written, 0.0) * 1000)
+            probe_done.wait()
+    for process in processes:
+        process.join()
+
+    print(f"rows={len(store.docs)} vectors={vector_mib:.1f} MiB sentence vectors={sentence_mib:.1f} MiB "
+          f"workers={args.workers} private_copy={args.private}")
+    print(f"{'worker':>6} {'RSS':>8} {'PSS':>8} {'shared':>8} {'private':>8} {'p50 ms':>8}")
+    for _, index, values, p50 in memory:
+        shared = values.get("Shared_Clean", 0) + values.get("Shared_Dirty", 0)
+        private = values.get("Private_Clean", 0) + values.get("Private_Dirty", 0)
+        print(f"{index:>6} {values.get('Rss', 0):>8.1f} {values.get('Pss', 0):>8.1f} {shared:>8.1f} "
+              f"{private:>8.1f} {p50:>8.2f}")
+    total_pss = sum(values.get("Pss", 0) for _, _, values, _ in memory)
+    print(f"total PSS {total_pss:.1f} MiB ({total_pss / max(args.workers, 1):.1f} MiB per worker)")
+    if visible_ms:
+        print(
+            f"write visible to other workers after: p50 {np.percentile(visible_ms, 50):.2f} ms, "
+            f"max {max(visible_ms):.2f} ms ({len(visible_ms)} observations)"
+        )
+
+
+def _timed_write(write) -> float:
+    """Run ``write`` and return the monotonic time it finished (comparable across processes)."""
+    write()
+    return time.monotonic()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,21 @@
+import os
 import time
 from db.supabase_client import supabase, SUPABASE_BUCKET
+from db.postgrest import postgrest
+from utils.ttl_cache import TTLCache
+
+# Inclusion sets and document rows are cached per process for this long;
+# writes through this module invalidate them immediately, so the TTL only
+# bounds staleness from writes made elsewhere (other workers, the dashboard).
+_CACHE_TTL = float(os.getenv("DOCUMENT_CACHE_TTL_SECONDS", "30"))
+_CACHE_MAX_ITEMS = int(os.getenv("DOCUMENT_CACHE_MAX_ITEMS", "10000"))
+# Signed URLs are handed out again until this many seconds before they expire.
+_SIGNED_URL_MARGIN = float(os.getenv("SIGNED_URL_REFRESH_MARGIN_SECONDS", "60"))
+
+_included_cache: TTLCache = TTLCache(_CACHE_TTL, _CACHE_MAX_ITEMS)  # conversation_id -> frozenset of doc ids
+_document_cache: TTLCache = TTLCache(_CACHE_TTL, _CACHE_MAX_ITEMS)  # doc_id -> row
+_doc_conversations: TTLCache = TTLCache(_CACHE_TTL, _CACHE_MAX_ITEMS)  # doc_id -> conversation_id
+_signed_urls: TTLCache = TTLCache(0, _CACHE_MAX_ITEMS)  # (path, expires_in) -> url, TTL set per URL
 
 def _sanitize_name(filename: str) -> str:
     return (
@@ -23,42 +39,52 @@ def upload_to_bucket(user_id: str, conversation_id: str, filename: str, file_byt
     supabase.storage.from_(SUPABASE_BUCKET).upload(path, file_bytes, options)
     return path
 
-def save_document(user_id: str, conversation_id: str, filename: str, path: str) -> str:
-    res = supabase.table("documents").insert({
+def _document_row(user_id: str, conversation_id: str, filename: str, path: str) -> dict:
+    return {
         "user_id": user_id,
         "conversation_id": conversation_id,
         "filename": filename,
         "storage_path": path,
         "include": True
-    }).execute()
-    return res.data[0]["id"]
-
-def list_documents_for_conversation(conversation_id: str, user_id: str | None = None):
-    query = supabase.table("documents").select("*").eq("conversation_id", conversation_id)
-    if user_id is not None:
-        query = query.eq("user_id", user_id)
-    res = query.order("uploaded_at", desc=True).execute()
-    return res.data
-
-def get_document(doc_id: str):
-    res = supabase.table("documents").select("*").eq("id", doc_id).single().execute()
-    return res.data
+    }
 
-def delete_document(doc_id: str):
-    supabase.table("documents").delete().eq("id", doc_id).execute()
+def _remember_document(row, token: int):
+    if row:
+        _document_cache.put(row["id"], dict(row), token)
+        _doc_conversations.put(row["id"], row["conversation_id"])
+    return row
 
-def set_document_inclusion(doc_id: str, include: bool):
-    supabase.table("documents").update({"include": include}).eq("id", doc_id).execute()
+def _invalidate_document(doc_id: str):
+    conversation_id = _doc_conversations.get(doc_id)
+    _document_cache.invalidate(doc_id)
+    if conversation_id:
+        _included_cache.invalidate(conversation_id)
+    else:
+        _included_cache.clear()  # owner unknown: drop every conversation's set
 
 def create_signed_url_for_path(path: str, expires_in: int = 60 * 10) -> str:
-    # 10 minutes default
+    # 10 minutes default; a cached URL is reused while it has more than the margin left
+    key = (path, expires_in)
+    url = _signed_urls.get(key)
+    if url is not None:
+        return url
+    token = _signed_urls.token()
     res = supabase.storage.from_(SUPABASE_BUCKET).create_signed_url(path, expires_in)
-    return res.get("signedURL") or res.get("signed_url") or res.get("data", {}).get("signedUrl")
+    url = res.get("signedURL") or res.get("signed_url") or res.get("data", {}).get("signedUrl")
+    if url:
+        _signed_urls.put(key, url, token, ttl=expires_in - _SIGNED_URL_MARGIN)
+    return url
 
-def list_included_doc_ids(conversation_id: str) -> set[str]:
-    res = supabase.table("documents").select("id, include").eq("conversation_id", conversation_id).execute()
+def _remember_included(conversation_id: str, rows, token: int) -> set[str]:
+    for row in rows or []:
+        _doc_conversations.put(row["id"], conversation_id)
+    ids = _included_ids(rows)
+    _included_cache.put(conversation_id, frozenset(ids), token)
+    return ids
+
+def _included_ids(rows) -> set[str]:
     ids = set()
-    for d in res.data or []:
+    for d in rows or []:
         inc = d.get("include", True)
         # strict coercion: accept only True or "true"
         if isinstance(inc, bool):
@@ -71,20 +97,66 @@ def list_included_doc_ids(conversation_id: str) -> set[str]:
             ids.add(d["id"])
     return ids
 
-def delete_documents_for_conversation(conversation_id: str, user_id: str):
-    res = (
-        supabase.table("documents")
-        .select("id, storage_path")
-        .eq("conversation_id", conversation_id)
-        .eq("user_id", user_id)
-        .execute()
-    )
-    documents = res.data or []
-    if documents:
-        supabase.table("documents").delete().eq("conversation_id", conversation_id).eq("user_id", user_id).execute()
-    return documents
+def _invalidate_conversation(conversation_id: str, documents):
+    _document_cache.invalidate(*(doc["id"] for doc in documents or []))
+    _included_cache.invalidate(conversation_id)
 
 def delete_paths_from_bucket(paths: list[str]):
     if not paths:
         return
     supabase.storage.from_(SUPABASE_BUCKET).remove(paths)
+    _signed_urls.clear()
+
+def document_cache_stats() -> dict:
+    """Entries and hit rates of the inclusion-set, document-row and signed-URL caches."""
+    return {
+        "included_doc_ids": _included_cache.stats(),
+        "documents": _document_cache.stats(),
+        "signed_urls": _signed_urls.stats(),
+    }
+
+# ---- rows (pooled PostgREST client) ----
+
+async def save_document(user_id: str, conversation_id: str, filename: str, path: str) -> str:
+    rows = await postgrest.insert("documents", _document_row(user_id, conversation_id, filename, path))
+    _included_cache.invalidate(conversation_id)
+    return rows[0]["id"]
+
+async def list_documents_for_conversation(conversation_id: str, user_id: str | None = None):
+    filters = {"conversation_id": conversation_id}
+    if user_id is not None:
+        filters["user_id"] = user_id
+    return await postgrest.select("documents", filters=filters, order="uploaded_at", desc=True)
+
+async def get_document(doc_id: str):
+    """The document row, or None if it does not exist."""
+    cached = _document_cache.get(doc_id)
+    if cached is not None:
+        return dict(cached)
+    token = _document_cache.token()
+    rows = await postgrest.select("documents", filters={"id": doc_id}, limit=1)
+    return _remember_document(rows[0] if rows else None, token)
+
+async def delete_document(doc_id: str):
+    await postgrest.delete("documents", {"id": doc_id})
+    _invalidate_document(doc_id)
+
+async def set_document_inclusion(doc_id: str, include: bool):
+    await postgrest.update("documents", {"include": include}, {"id": doc_id})
+    _invalidate_document(doc_id)
+
+async def list_included_doc_ids(conversation_id: str) -> set[str]:
+    cached = _included_cache.get(conversation_id)
+    if cached is not None:
+        return set(cached)
+    token = _included_cache.token()
+    rows = await postgrest.select("documents", "id,include", {"conversation_id": conversation_id})
+    return _remember_included(conversation_id, rows, token)
+
+async def delete_documents_for_conversation(conversation_id: str, user_id: str):
+    """Delete a conversation's documents in one request, returning their ids and storage paths."""
+    documents = await postgrest.delete(
+        "documents", {"conversation_id": conversation_id, "user_id": user_id}, returning="id,storage_path"
+    )
+    _invalidate_conversation(conversation_id, documents)
+    return documents
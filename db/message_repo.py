@@ -1,13 +1,22 @@
-from db.supabase_client import supabase
-from datetime import datetime
+from db.postgrest import postgrest
+from datetime import datetime, timedelta
 
-def save_message(conversation_id: str, sender: str, content: str):
-    data = {"conversation_id": conversation_id, "sender": sender, "content": content, "timestamp": datetime.utcnow().isoformat()}
-    supabase.table("messages").insert(data).execute()
+def _message_rows(conversation_id: str, messages):
+    now = datetime.utcnow()
+    return [
+        {"conversation_id": conversation_id, "sender": sender, "content": content,
+         "timestamp": (now + timedelta(microseconds=i)).isoformat()}
+        for i, (sender, content) in enumerate(messages)
+    ]
 
-def get_messages(conversation_id: str):
-    res = supabase.table("messages").select("*").eq("conversation_id", conversation_id).order("timestamp").execute()
-    return res.data
+async def save_messages(conversation_id: str, messages):
+    """Insert ``(sender, content)`` pairs in one request, timestamped in list order."""
+    if not messages:
+        return
+    await postgrest.insert("messages", _message_rows(conversation_id, messages), returning=False)
 
-def delete_messages_for_conversation(conversation_id: str):
-    supabase.table("messages").delete().eq("conversation_id", conversation_id).execute()
+async def get_messages(conversation_id: str):
+    return await postgrest.select("messages", filters={"conversation_id": conversation_id}, order="timestamp")
+
+async def delete_messages_for_conversation(conversation_id: str):
+    await postgrest.delete("messages", {"conversation_id": conversation_id})
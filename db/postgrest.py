@@ -0,0 +1,195 @@
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+_STUB = os.getenv("SUPABASE_STUB", "0").strip().lower() in ("1", "true", "yes")
+_URL = (os.getenv("SUPABASE_URL") or ("http://stub.local" if _STUB else "")).rstrip("/")
+_KEY = os.getenv("SUPABASE_KEY") or ""
+# Keep-alive connections shared by all async repository calls.
+_MAX_CONNECTIONS = int(os.getenv("SUPABASE_HTTP_MAX_CONNECTIONS", "20"))
+_TIMEOUT = float(os.getenv("SUPABASE_HTTP_TIMEOUT", "10"))
+# Upper bounds (ms) of the per-call latency histogram buckets.
+_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+Filters = Dict[str, object]  # column -> value, matched with PostgREST ``eq``
+
+
+class PostgrestError(Exception):
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"PostgREST {status_code}: {message}")
+        self.status_code = status_code
+
+
+class LatencyHistogram:
+    """Call count, total/max latency and bucketed counts of one operation."""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(_BUCKETS_MS) + 1)
+
+    def record(self, ms: float, error: bool):
+        self.count += 1
+        self.errors += int(error)
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        slot = next((i for i, bound in enumerate(_BUCKETS_MS) if ms <= bound), len(_BUCKETS_MS))
+        self.buckets[slot] += 1
+
+    def snapshot(self) -> dict:
+        labels = [f"<={bound}ms" for bound in _BUCKETS_MS] + [f">{_BUCKETS_MS[-1]}ms"]
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": self.total_ms / self.count if self.count else 0.0,
+            "max_ms": self.max_ms,
+            "histogram": dict(zip(labels, self.buckets)),
+        }
+
+
+class AsyncPostgrest:
+    """Minimal async PostgREST client over one pooled ``httpx.AsyncClient``.
+
+    Covers the table operations the repositories use (eq filters, order,
+    bulk insert, delete returning rows). ``transport`` replaces the network,
+    e.g. an ``httpx.MockTransport`` serving a local stub.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        key: str,
+        max_connections: int = 20,
+        timeout: float = 10.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.base_url = f"{url.rstrip('/')}/rest/v1"
+        self.key = key
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._latency: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"apikey": self.key, "Authorization": f"Bearer {self.key}"},
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections, max_keepalive_connections=self.max_connections
+                ),
+                transport=self.transport,
+            )
+        return self._client
+
+    async def use_transport(self, transport: Optional[httpx.AsyncBaseTransport]):
+        """Serve later calls through ``transport`` (tests, local stubs)."""
+        await self.aclose()
+        self.transport = transport
+
+    async def aclose(self):
+        client, self._client = self._client, None
+        if client is not None:
+            await client.aclose()
+
+    # ---- operations ----
+    async def select(
+        self,
+        table: str,
+        columns: str = "*",
+        filters: Optional[Filters] = None,
+        order: Optional[str] = None,
+        desc: bool = False,
+        limit: Optional[int] = None,
+    ) -> List[Dict]:
+        params = [("select", columns), *_eq(filters)]
+        if order:
+            params.append(("order", f"{order}.{'desc' if desc else 'asc'}"))
+        if limit is not None:
+            params.append(("limit", str(limit)))
+        return await self._request("select", table, "GET", params)
+
+    async def insert(self, table: str, rows, returning: bool = True) -> List[Dict]:
+        """Insert one row (dict) or many (list) in a single request."""
+        prefer = "return=representation" if returning else "return=minimal"
+        return await self._request("insert", table, "POST", [], rows, {"Prefer": prefer})
+
+    async def update(self, table: str, values: Dict, filters: Filters) -> List[Dict]:
+        return await self._request("update", table, "PATCH", _eq(filters), values, {"Prefer": "return=minimal"})
+
+    async def delete(self, table: str, filters: Filters, returning: Optional[str] = None) -> List[Dict]:
+        """Delete matching rows; with ``returning`` (a column list) the deleted rows come back."""
+        params = _eq(filters)
+        prefer = "return=minimal"
+        if returning:
+            params.append(("select", returning))
+            prefer = "return=representation"
+        return await self._request("delete", table, "DELETE", params, None, {"Prefer": prefer})
+
+    async def _request(
+        self,
+        op: str,
+        table: str,
+        method: str,
+        params: Sequence[Tuple[str, str]],
+        body=None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> List[Dict]:
+        started = time.perf_counter()
+        failed = True
+        try:
+            response = await self._http().request(method, f"/{table}", params=params, json=body, headers=headers)
+            if response.status_code >= 400:
+                raise PostgrestError(response.status_code, response.text)
+            failed = False
+            return response.json() if response.content else []
+        finally:
+            self._record(f"{table}.{op}", (time.perf_counter() - started) * 1000, failed)
+
+    def _record(self, name: str, ms: float, error: bool):
+        with self._lock:
+            histogram = self._latency.get(name)
+            if histogram is None:
+                histogram = self._latency[name] = LatencyHistogram()
+            histogram.record(ms, error)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {name: histogram.snapshot() for name, histogram in sorted(self._latency.items())}
+
+
+def _eq(filters: Optional[Filters]) -> List[Tuple[str, str]]:
+    return [(column, f"eq.{_literal(value)}") for column, value in (filters or {}).items()]
+
+
+def _literal(value) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def _transport() -> Optional[httpx.AsyncBaseTransport]:
+    if not _STUB:
+        return None
+    from db.supabase_stub import local_supabase
+
+    return local_supabase().rest.transport()
+
+
+postgrest = AsyncPostgrest(_URL, _KEY, _MAX_CONNECTIONS, _TIMEOUT, _transport())
+
+
+def postgrest_stats() -> dict:
+    """Per ``table.operation`` call counts and latency histograms of the async repositories."""
+    return postgrest.stats()
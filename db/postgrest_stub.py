@@ -0,0 +1,77 @@
+import asyncio
+import json
+import uuid
+from datetime import datetime
+from typing import Dict, List
+
+import httpx
+
+
+class PostgrestStub:
+    """In-memory stand-in for the PostgREST tables the repositories use.
+
+    Serves ``eq`` filters, ``select`` column lists, ``order``, ``limit``
+    and the ``Prefer: return=...`` header, which is all ``AsyncPostgrest``
+    sends. ``latency`` (seconds) is added to every call to model a network
+    round trip. Use it with ``postgrest.use_transport(stub.transport())``.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.tables: Dict[str, List[Dict]] = {}
+        self.requests = 0
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        table = request.url.path.rsplit("/", 1)[-1]
+        rows = self.tables.setdefault(table, [])
+        params = list(request.url.params.multi_items())
+        filters = [(column, value[3:]) for column, value in params if value.startswith("eq.")]
+        columns = dict(params).get("select")
+        returning = "return=representation" in request.headers.get("prefer", "")
+
+        if request.method == "POST":
+            payload = json.loads(request.content)
+            created = [self._new_row(row) for row in (payload if isinstance(payload, list) else [payload])]
+            rows.extend(created)
+            return self._rows(201, created if returning else None, columns)
+        matched = [row for row in rows if all(_text(row.get(column)) == value for column, value in filters)]
+        if request.method == "GET":
+            order = dict(params).get("order")
+            if order:
+                column, _, direction = order.partition(".")
+                matched.sort(key=lambda row: _text(row.get(column)), reverse=direction == "desc")
+            limit = dict(params).get("limit")
+            return self._rows(200, matched[: int(limit)] if limit else matched, columns)
+        if request.method == "PATCH":
+            for row in matched:
+                row.update(json.loads(request.content))
+            return self._rows(200, matched if returning else None, columns)
+        if request.method == "DELETE":
+            self.tables[table] = [row for row in rows if row not in matched]
+            return self._rows(200, matched if returning else None, columns)
+        return httpx.Response(405)
+
+    @staticmethod
+    def _new_row(row: Dict) -> Dict:
+        return {"id": str(uuid.uuid4()), "uploaded_at": datetime.utcnow().isoformat(), **row}
+
+    @staticmethod
+    def _rows(status: int, rows, columns) -> httpx.Response:
+        if rows is None:
+            return httpx.Response(204 if status == 200 else status)
+        if columns and columns != "*":
+            keep = [column.strip() for column in columns.split(",")]
+            rows = [{column: row.get(column) for column in keep} for row in rows]
+        return httpx.Response(status, json=rows)
+
+
+def _text(value) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return "" if value is None else str(value)
@@ -1,10 +1,47 @@
 import os
-from supabase import create_client, Client
+import threading
+from typing import TYPE_CHECKING
+
 from dotenv import load_dotenv
 
+if TYPE_CHECKING:
+    from supabase import Client
+
 load_dotenv()
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-SUPABASE_BUCKET = os.getenv("SUPABASE_BUCKET")
+# "1" serves tables and storage from memory (db/supabase_stub.py) instead of a Supabase project.
+SUPABASE_STUB = os.getenv("SUPABASE_STUB", "0").strip().lower() in ("1", "true", "yes")
+SUPABASE_URL = os.getenv("SUPABASE_URL") or ("http://stub.local" if SUPABASE_STUB else None)
+SUPABASE_KEY = os.getenv("SUPABASE_KEY") or ("stub" if SUPABASE_STUB else None)
+SUPABASE_BUCKET = os.getenv("SUPABASE_BUCKET") or ("documents" if SUPABASE_STUB else None)
+
+
+class _LazyClient:
+    """Creates the supabase-py client on first attribute access.
+
+    Importing supabase-py and building the client takes a noticeable part of
+    startup, and most requests go through the async PostgREST client instead.
+    """
+
+    def __init__(self):
+        self._client = None
+        self._lock = threading.Lock()
+
+    def _get(self) -> "Client":
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from supabase import create_client
+
+                    self._client = create_client(SUPABASE_URL, SUPABASE_KEY)
+        return self._client
+
+    def __getattr__(self, name: str):
+        return getattr(self._get(), name)
+
+
+if SUPABASE_STUB:
+    from db.supabase_stub import local_supabase
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    supabase = local_supabase()
+else:
+    supabase: "Client" = _LazyClient()
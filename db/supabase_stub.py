@@ -0,0 +1,62 @@
+import os
+import time
+from functools import lru_cache
+from typing import Dict, List
+
+from db.postgrest_stub import PostgrestStub
+
+# Added to every stubbed table or storage call, standing in for the network.
+_LATENCY = float(os.getenv("SUPABASE_STUB_LATENCY_MS", "0")) / 1000
+
+
+class _Bucket:
+    def __init__(self, stub: "SupabaseStub", name: str):
+        self._stub = stub
+        self._files = stub.buckets.setdefault(name, {})
+
+    def upload(self, path: str, data: bytes, options=None):
+        self._stub.wait()
+        self._files[path] = bytes(data)
+        return {"Key": path}
+
+    def remove(self, paths: List[str]):
+        self._stub.wait()
+        return [{"name": path} for path in paths if self._files.pop(path, None) is not None]
+
+    def create_signed_url(self, path: str, expires_in: int):
+        self._stub.wait()
+        return {"signedURL": f"{self._stub.url}/storage/v1/object/sign/{path}?expires={int(time.time()) + expires_in}"}
+
+
+class _Storage:
+    def __init__(self, stub: "SupabaseStub"):
+        self._stub = stub
+
+    def from_(self, bucket: str) -> _Bucket:
+        return _Bucket(self._stub, bucket)
+
+
+class SupabaseStub:
+    """In-memory stand-in for the supabase-py client: storage buckets, plus
+    ``rest`` (a ``PostgrestStub``) serving the tables to the PostgREST client.
+
+    Used in place of the real client when ``SUPABASE_STUB=1`` (benchmarks,
+    local load tests); ``latency`` (seconds) is added to every call.
+    """
+
+    def __init__(self, latency: float = 0.0, url: str = "http://stub.local"):
+        self.url = url
+        self.latency = latency
+        self.rest = PostgrestStub(latency)
+        self.buckets: Dict[str, Dict[str, bytes]] = {}
+        self.storage = _Storage(self)
+
+    def wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+
+@lru_cache(maxsize=1)
+def local_supabase() -> SupabaseStub:
+    """The process-wide stub behind ``SUPABASE_STUB=1``."""
+    return SupabaseStub(_LATENCY)
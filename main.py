@@ -1,15 +1,64 @@
+import asyncio
+import logging
 import os
+import time
+from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
 from routes.conversation_routes import router as conversation_router
 from routes.message_routes import router as message_router
 from routes.document_routes import router as document_router
+from db.document_repo import document_cache_stats
+from db.postgrest import postgrest, postgrest_stats
+from services.answer_cache import answer_cache_stats
+from services.embedding_service import batcher_stats, cache_stats as embedding_cache_stats, warm_up
+from services.executors import run_cpu, shutdown_executors
+from services.ingest_jobs import ingest_queue
+from services.vector_store import cache_stats as store_cache_stats, dedup_stats
+from utils import metrics
 
 load_dotenv()
-app = FastAPI(title="Knowledge Base Search Engine")
+
+logger = logging.getLogger(__name__)
+
+# Load the embedding model and run a dummy batch at startup instead of on the first query.
+_WARMUP = os.getenv("EMBEDDING_WARMUP", "1").strip().lower() not in ("0", "false", "no")
+_readiness = {"state": "starting"}
+
+
+async def _warm_up():
+    if not _WARMUP:
+        _readiness["state"] = "ready"
+        return
+    _readiness["state"] = "warming"
+    try:
+        seconds = await run_cpu(warm_up)
+    except Exception as exc:
+        logger.exception("Embedding model warmup failed")
+        _readiness.update(state="failed", error=str(exc) or exc.__class__.__name__)
+        return
+    metrics.record("model_warmup", seconds)
+    _readiness.update(state="ready", warmup_seconds=round(seconds, 3))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await ingest_queue.start()
+    # uvicorn accepts connections only after startup returns, so the warmup
+    # runs in the background: /health answers at once, /ready once it is done.
+    warmup = asyncio.create_task(_warm_up())
+    yield
+    warmup.cancel()
+    await ingest_queue.stop()
+    await postgrest.aclose()
+    shutdown_executors()
+
+
+app = FastAPI(title="Knowledge Base Search Engine", lifespan=lifespan)
 
 # ---- CORS (allow your frontend) ----
 # Replace origins list with your actual frontend origins (dev + prod)
@@ -36,9 +85,35 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["Content-Disposition"], # optional, if you serve file downloads
+    expose_headers=["Content-Disposition", "Server-Timing"], # optional, if you serve file downloads
 )
 
+# ---- Metrics ----
+for name, stats in (
+    ("postgrest", postgrest_stats),
+    ("document_cache", document_cache_stats),
+    ("answer_cache", answer_cache_stats),
+    ("embedding_cache", embedding_cache_stats),
+    ("embedding_batcher", batcher_stats),
+    ("store_cache", store_cache_stats),
+    ("dedup", dedup_stats),
+    ("ingest_queue", ingest_queue.stats),
+):
+    metrics.register_stats(name, stats)
+
+if metrics.TIMING_HEADER:
+    @app.middleware("http")
+    async def server_timing(request: Request, call_next):
+        start = time.perf_counter()
+        timings, token = metrics.start_request_timings()
+        try:
+            response = await call_next(request)
+        finally:
+            metrics.finish_request_timings(token)
+        # Streaming responses only report the stages finished before the first byte.
+        response.headers["Server-Timing"] = metrics.server_timing(timings, time.perf_counter() - start)
+        return response
+
 # ---- Routers ----
 app.include_router(conversation_router, prefix="/conversations", tags=["Conversations"])
 app.include_router(message_router, prefix="/conversations", tags=["Messages"])
@@ -48,6 +123,18 @@ app.include_router(document_router, prefix="/conversations", tags=["Documents"])
 def health():
     return {"status": "Backend running ✅"}
 
+@app.get("/ready")
+def ready():
+    """503 until the embedding model is loaded and warmed up; /health only reports the process is up."""
+    if _readiness["state"] != "ready":
+        return JSONResponse(_readiness, status_code=503)
+    return _readiness
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Stage latency histograms and cache/queue counters, Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 def root():
     return {"status": "Backend running ✅"}
@@ -1,6 +1,11 @@
+import asyncio
+
 from fastapi import APIRouter, Depends, Query
+from services.answer_cache import invalidate_answers
 from services.auth_service import validate_user_token, enforce_user
-from services.vector_store import VectorStore
+from services.executors import run_io
+from services.ingest_jobs import ingest_queue
+from services.vector_store import get_store
 from db.conversation_repo import (
     create_conversation,
     delete_conversation,
@@ -23,7 +28,7 @@ async def list_conversations(
     token_uid: str = Depends(validate_user_token),
     _: str = Depends(enforce_user),
 ):
-    return get_user_conversations(user_id)
+    return await get_user_conversations(user_id)
 
 @router.post("")
 async def new_conversation(
@@ -32,7 +37,7 @@ async def new_conversation(
     token_uid: str = Depends(validate_user_token),
     _: str = Depends(enforce_user),
 ):
-    conv_id = create_conversation(user_id, payload.title or "New Conversation")
+    conv_id = await create_conversation(user_id, payload.title or "New Conversation")
     return {"conversation_id": conv_id}
 
 @router.delete("/{conversation_id}")
@@ -43,15 +48,25 @@ async def remove_conversation(
     _: str = Depends(enforce_user),
 ):
     ensure_uuid(conversation_id, "conversation_id")
-    documents = delete_documents_for_conversation(conversation_id, user_id)
-    if documents:
-        storage_paths = [
-            doc["storage_path"] for doc in documents if doc.get("storage_path")
-        ]
-        delete_paths_from_bucket(storage_paths)
-    VectorStore(conversation_id).delete_store()
-    delete_messages_for_conversation(conversation_id)
-    delete_conversation(conversation_id, user_id)
+    # Rows that reference the conversation go first, concurrently.
+    _, documents, _, store = await asyncio.gather(
+        run_io(ingest_queue.cancel_conversation, conversation_id),
+        delete_documents_for_conversation(conversation_id, user_id),
+        delete_messages_for_conversation(conversation_id),
+        run_io(get_store, conversation_id),
+    )
+
+    async def drop_index():
+        await asyncio.gather(*(run_io(ingest_queue.forget, doc["id"]) for doc in documents or []))
+        await run_io(store.delete_store)
+
+    storage_paths = [doc["storage_path"] for doc in documents or [] if doc.get("storage_path")]
+    await asyncio.gather(
+        run_io(delete_paths_from_bucket, storage_paths),
+        drop_index(),
+        delete_conversation(conversation_id, user_id),
+    )
+    invalidate_answers(conversation_id)
     return {"ok": True}
 
 
@@ -64,5 +79,5 @@ async def rename_conversation(
     _: str = Depends(enforce_user),
 ):
     ensure_uuid(conversation_id, "conversation_id")
-    update_conversation_title(conversation_id, user_id, payload.title)
+    await update_conversation_title(conversation_id, user_id, payload.title)
     return {"ok": True}
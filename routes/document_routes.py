@@ -1,9 +1,10 @@
 from fastapi import APIRouter, UploadFile, Depends, HTTPException, Query
-from io import BytesIO
 from ._validators import ensure_uuid
+from services.answer_cache import invalidate_answers
 from services.auth_service import validate_user_token, enforce_user
-from utils.pdf_loader import load_pdf
-from services.vector_store import VectorStore
+from services.executors import run_io
+from services.ingest_jobs import DONE, IngestQueueFull, ingest_queue
+from services.vector_store import get_store
 from db.document_repo import (
     upload_to_bucket,
     save_document,
@@ -24,9 +25,9 @@ async def list_documents(
     _: str = Depends(enforce_user),
 ):
     ensure_uuid(conversation_id, "conversation_id")
-    return list_documents_for_conversation(conversation_id, user_id)
+    return await list_documents_for_conversation(conversation_id, user_id)
 
-@router.post("/{conversation_id}/documents")
+@router.post("/{conversation_id}/documents", status_code=202)
 async def upload_document(
     conversation_id: str,
     file: UploadFile,
@@ -35,22 +36,72 @@ async def upload_document(
     _: str = Depends(enforce_user),
 ):
     ensure_uuid(conversation_id, "conversation_id")
-    bytes_ = await file.read()
+    # Refuse before touching storage when the ingestion queue is saturated.
+    try:
+        ingest_queue.reserve()
+    except IngestQueueFull:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many documents are being processed; retry shortly",
+            headers={"Retry-After": "10"},
+        )
+    try:
+        bytes_ = await file.read()
 
-    # Upload to Supabase Storage
-    path = upload_to_bucket(user_id, conversation_id, file.filename, bytes_)
+        # Upload to Supabase Storage
+        path = await run_io(upload_to_bucket, user_id, conversation_id, file.filename, bytes_)
 
-    # Create document record (returns doc_id)
-    doc_id = save_document(user_id, conversation_id, file.filename, path)
+        # Create document record (returns doc_id)
+        doc_id = await save_document(user_id, conversation_id, file.filename, path)
 
-    # Parse and embed per-doc chunks with doc_id
-    text = load_pdf(BytesIO(bytes_))
-    chunks = [text[i:i+500] for i in range(0, len(text), 500)] if text else []
-    if chunks:
-        store = VectorStore(conversation_id)
-        store.add(chunks, doc_id=doc_id)
+        # Parsing, chunking and embedding continue in the background
+        job = await ingest_queue.submit(doc_id, conversation_id, file.filename, bytes_)
+        invalidate_answers(conversation_id)
+    except BaseException:
+        ingest_queue.release()
+        raise
 
-    return {"status": "uploaded", "chunks": len(chunks), "path": path, "doc_id": doc_id}
+    return {"status": job["state"], "job_id": job["job_id"], "path": path, "doc_id": doc_id}
+
+@router.get("/{conversation_id}/documents/{doc_id}/status")
+async def get_document_status(
+    conversation_id: str,
+    doc_id: str,
+    user_id: str = Query(...),
+    token_uid: str = Depends(validate_user_token),
+    _: str = Depends(enforce_user),
+):
+    ensure_uuid(conversation_id, "conversation_id")
+    job = await run_io(ingest_queue.status, doc_id)
+    if job is not None:
+        if job["conversation_id"] != conversation_id:
+            raise HTTPException(status_code=404, detail="Document not found")
+        return job
+    # Documents ingested before background jobs existed have no job record.
+    doc = await get_document(doc_id)
+    if not doc or doc["conversation_id"] != conversation_id:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return {"job_id": None, "doc_id": doc_id, "conversation_id": conversation_id, "state": DONE}
+
+@router.get("/{conversation_id}/documents/{doc_id}/duplicates")
+async def get_document_duplicates(
+    conversation_id: str,
+    doc_id: str,
+    user_id: str = Query(...),
+    token_uid: str = Depends(validate_user_token),
+    _: str = Depends(enforce_user),
+):
+    ensure_uuid(conversation_id, "conversation_id")
+    store = await run_io(get_store, conversation_id)
+    report = store.duplicate_report(doc_id)
+    if report is None:
+        # Ingested before deduplication, or nothing indexed yet
+        doc = await get_document(doc_id)
+        if not doc or doc["conversation_id"] != conversation_id:
+            raise HTTPException(status_code=404, detail="Document not found")
+        return {"doc_id": doc_id, "chunks": 0, "stored": 0, "exact": 0, "near": 0,
+                "duplicate_of": {}, "referenced_rows": 0, "dedup_ratio": 0.0}
+    return report
 
 @router.delete("/{conversation_id}/documents/{doc_id}")
 async def remove_document(
@@ -61,12 +112,14 @@ async def remove_document(
     _: str = Depends(enforce_user),
 ):
     ensure_uuid(conversation_id, "conversation_id")
-    # Remove from vector index (all chunks for this doc)
-    store = VectorStore(conversation_id)
-    store.remove_doc(doc_id)
+    # Stop a pending ingestion job, then remove from vector index (all chunks for this doc)
+    await run_io(ingest_queue.forget, doc_id)
+    store = await run_io(get_store, conversation_id)
+    await run_io(store.remove_doc, doc_id)
 
     # Remove record (does not delete storage file; keep or extend if needed)
-    delete_document(doc_id)
+    await delete_document(doc_id)
+    invalidate_answers(conversation_id)
     return {"ok": True}
 
 @router.patch("/{conversation_id}/documents/{doc_id}")
@@ -83,7 +136,8 @@ async def toggle_document_inclusion(
     include = (body or {}).get("include")
     if include is None:
         raise HTTPException(status_code=400, detail="Missing 'include' boolean in body")
-    set_document_inclusion(doc_id, include)
+    await set_document_inclusion(doc_id, include)
+    invalidate_answers(conversation_id)
     return {"ok": True, "doc_id": doc_id, "include": include}
 
 @router.get("/{conversation_id}/documents/{doc_id}/url")
@@ -95,8 +149,8 @@ async def get_document_url(
     _: str = Depends(enforce_user),
 ):
     ensure_uuid(conversation_id, "conversation_id")
-    doc = get_document(doc_id)
+    doc = await get_document(doc_id)
     if not doc or doc["conversation_id"] != conversation_id:
         raise HTTPException(status_code=404, detail="Document not found")
-    url = create_signed_url_for_path(doc["storage_path"])
+    url = await run_io(create_signed_url_for_path, doc["storage_path"])
     return {"url": url}
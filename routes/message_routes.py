@@ -1,12 +1,24 @@
+import asyncio
+import json
+import os
+
 from fastapi import APIRouter, Depends, HTTPException, Query
-from db.message_repo import get_messages, save_message
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from db.message_repo import get_messages, save_messages
 from db.document_repo import list_included_doc_ids
+from services.answer_cache import answer_cache, doc_set_version
 from services.auth_service import validate_user_token, enforce_user
-from services.llm_service import generate_answer
-from services.vector_store import VectorStore
+from services.embedding_service import get_embeddings_async
+from services.executors import run_cpu, run_io
+from services.llm_service import answer_from_chunks, answer_sentences, answers_from_chunks
+from services.vector_store import get_store
+from utils.metrics import timed
 
 router = APIRouter()
 
+_BATCH_MAX_QUESTIONS = int(os.getenv("MESSAGE_BATCH_MAX_QUESTIONS", "64"))
+
 @router.get("/{conversation_id}/messages")
 async def get_conversation_messages(
     conversation_id: str,
@@ -14,7 +26,7 @@ async def get_conversation_messages(
     token_uid: str = Depends(validate_user_token),
     _: str = Depends(enforce_user),
 ):
-    return get_messages(conversation_id)
+    return await get_messages(conversation_id)
 
 @router.post("/{conversation_id}/messages")
 async def send_message(
@@ -29,13 +41,140 @@ async def send_message(
         raise HTTPException(status_code=400, detail="Missing 'content' (or 'query') in body")
 
     # ✅ Get only truly-included doc IDs
-    allowed_doc_ids = list_included_doc_ids(conversation_id)
+    allowed_doc_ids, store, query_vectors = await asyncio.gather(
+        timed("included_doc_ids", list_included_doc_ids(conversation_id)),
+        timed("store_load", run_io(get_store, conversation_id)),
+        timed("embed_query", get_embeddings_async([question])),
+    )
+    query_vector = query_vectors[0] if query_vectors else None
+    # Repeated (or closely paraphrased) questions over the same documents reuse the answer.
+    version = doc_set_version(store, allowed_doc_ids)
+    answer = None
+    if answer_cache is not None and query_vector is not None:
+        answer = answer_cache.get(conversation_id, version, query_vector, question)
+    if answer is None:
+        retrieved = []
+        if query_vector is not None:
+            retrieved = await timed("retrieve", run_cpu(
+                store.retrieve_vector,
+                query_vector,
+                top_k=8,
+                restrict_doc_ids=allowed_doc_ids,
+                query_text=question,
+            ))
 
-    store = VectorStore(conversation_id)
-    retrieved = store.search(question, top_k=8, restrict_doc_ids=allowed_doc_ids)
-    context = "\n".join(retrieved)
-
-    answer = generate_answer(question, context)
-    save_message(conversation_id, "user", question)
-    save_message(conversation_id, "ai", answer)
+        # Scores stored sentence vectors against the query vector computed above.
+        answer = await timed("answer", run_cpu(answer_from_chunks, query_vector, retrieved))
+        if answer_cache is not None and query_vector is not None:
+            answer_cache.put(conversation_id, version, query_vector, question, answer)
+    await timed("save_messages", save_messages(conversation_id, [("user", question), ("ai", answer)]))
     return {"answer": answer}
+
+@router.post("/{conversation_id}/messages/stream")
+async def stream_message(
+    conversation_id: str,
+    body: dict,
+    user_id: str = Query(...),
+    token_uid: str = Depends(validate_user_token),
+    _: str = Depends(enforce_user),
+):
+    """send_message as Server-Sent Events.
+
+    Emits ``chunks`` (the retrieved chunks) as soon as retrieval finishes,
+    then one ``sentence`` event per answer sentence and a final ``done`` with
+    the full answer. Both messages are saved after the stream has been sent.
+    """
+    question = (body or {}).get("content") or (body or {}).get("query")
+    if not question:
+        raise HTTPException(status_code=400, detail="Missing 'content' (or 'query') in body")
+
+    allowed_doc_ids, store, query_vectors = await asyncio.gather(
+        timed("included_doc_ids", list_included_doc_ids(conversation_id)),
+        timed("store_load", run_io(get_store, conversation_id)),
+        timed("embed_query", get_embeddings_async([question])),
+    )
+    query_vector = query_vectors[0] if query_vectors else None
+    retrieved = []
+    if query_vector is not None:
+        retrieved = await timed("retrieve", run_cpu(
+            store.retrieve_vector,
+            query_vector,
+            top_k=8,
+            restrict_doc_ids=allowed_doc_ids,
+            query_text=question,
+        ))
+    answered = {}
+
+    async def events():
+        yield _sse("chunks", [{"rank": rank, "doc_id": chunk.doc_id, "text": chunk.text} for rank, chunk in enumerate(retrieved)])
+        sentences = await timed("answer", run_cpu(answer_sentences, query_vector, retrieved))
+        for sentence in sentences:
+            yield _sse("sentence", {"text": sentence})
+        answered["answer"] = " ".join(sentences)
+        yield _sse("done", {"answer": answered["answer"]})
+
+    async def persist():
+        # Skipped when the client went away before the answer was sent.
+        if "answer" in answered:
+            await timed("save_messages", save_messages(conversation_id, [("user", question), ("ai", answered["answer"])]))
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(persist),
+    )
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.post("/{conversation_id}/messages/batch")
+async def send_messages_batch(
+    conversation_id: str,
+    body: dict,
+    user_id: str = Query(...),
+    token_uid: str = Depends(validate_user_token),
+    _: str = Depends(enforce_user),
+):
+    """Answer several questions with one embedding call and one scoring pass.
+
+    Body: ``{"questions": [str, ...], "persist": false}``. With ``persist``
+    each question/answer pair is saved to the conversation in one insert.
+    """
+    questions = (body or {}).get("questions")
+    if not isinstance(questions, list) or not questions:
+        raise HTTPException(status_code=400, detail="Missing 'questions' list in body")
+    if len(questions) > _BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"At most {_BATCH_MAX_QUESTIONS} questions per batch")
+    if not all(isinstance(q, str) and q.strip() for q in questions):
+        raise HTTPException(status_code=400, detail="Every question must be a non-empty string")
+    questions = [q.strip() for q in questions]
+
+    allowed_doc_ids, store, query_vectors = await asyncio.gather(
+        timed("included_doc_ids", list_included_doc_ids(conversation_id)),
+        timed("store_load", run_io(get_store, conversation_id)),
+        timed("embed_query", get_embeddings_async(questions)),
+    )
+    retrieved = await timed("retrieve", run_cpu(
+        store.retrieve_vectors,
+        query_vectors,
+        top_k=8,
+        restrict_doc_ids=allowed_doc_ids,
+        query_texts=questions,
+    ))
+    answers = await timed("answer", run_cpu(answers_from_chunks, query_vectors, retrieved))
+    if (body or {}).get("persist"):
+        await timed("save_messages", save_messages(
+            conversation_id,
+            [message for question, answer in zip(questions, answers) for message in (("user", question), ("ai", answer))],
+        ))
+    return {
+        "results": [
+            {
+                "question": question,
+                "answer": answer,
+                "doc_ids": list(dict.fromkeys(chunk.doc_id for chunk in chunks)),
+            }
+            for question, answer, chunks in zip(questions, answers, retrieved)
+        ]
+    }
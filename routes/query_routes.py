@@ -1,8 +1,12 @@
+import asyncio
+
 from fastapi import APIRouter, Depends
 from services.auth_service import validate_user_token
-from services.vector_store import VectorStore
-from services.llm_service import generate_answer
-from db.message_repo import save_message
+from services.embedding_service import get_embeddings_async
+from services.executors import run_cpu, run_io
+from services.vector_store import get_store
+from services.llm_service import answer_from_chunks
+from db.message_repo import save_messages
 
 router = APIRouter()
 
@@ -10,12 +14,16 @@ router = APIRouter()
 async def query(conversation_id: str, body: dict, user_id: str = Depends(validate_user_token)):
     """Query the uploaded documents with the local QA pipeline."""
     question = body.get("query")
-    store = VectorStore(conversation_id)
-    retrieved_chunks = store.search(question, top_k=5)
-    context = "\n".join(retrieved_chunks)
+    store, query_vectors = await asyncio.gather(
+        run_io(get_store, conversation_id),
+        get_embeddings_async([question]),
+    )
+    query_vector = query_vectors[0] if query_vectors else None
+    retrieved_chunks = []
+    if query_vector is not None:
+        retrieved_chunks = await run_cpu(store.retrieve_vector, query_vector, top_k=5, query_text=question)
 
-    answer = generate_answer(question, context)
-    save_message(conversation_id, "user", question)
-    save_message(conversation_id, "ai", answer)
+    answer = await run_cpu(answer_from_chunks, query_vector, retrieved_chunks)
+    await save_messages(conversation_id, [("user", question), ("ai", answer)])
 
     return {"answer": answer}
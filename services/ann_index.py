@@ -0,0 +1,123 @@
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+
+_ASSIGN_BLOCK_ROWS = 65536
+_TRAIN_SAMPLES_PER_LIST = 64
+
+
+class IVFIndex:
+    """Inverted-file index over unit-normalized rows, trained with spherical k-means.
+
+    Each row is assigned to its nearest centroid; a query scores only the rows
+    listed under its ``nprobe`` nearest centroids. Row ids are positions in the
+    owning store's matrix, so callers filter dead or disallowed rows themselves.
+    """
+
+    def __init__(self, centroids: np.ndarray, assign: np.ndarray, trained_rows: int):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.assign = np.ascontiguousarray(assign, dtype=np.int32)
+        self.trained_rows = trained_rows
+        self._lists: Optional[Tuple[int, np.ndarray, np.ndarray]] = None
+
+    @property
+    def nlist(self) -> int:
+        return self.centroids.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        return self.centroids.nbytes + self.assign.nbytes
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, nlist: int = 0, iterations: int = 10, seed: int = 0) -> "IVFIndex":
+        rows = vectors.shape[0]
+        nlist = nlist or _default_nlist(rows)
+        nlist = max(1, min(nlist, rows))
+        rng = np.random.default_rng(seed)
+        sample_size = min(rows, nlist * _TRAIN_SAMPLES_PER_LIST)
+        sample_idx = np.sort(rng.choice(rows, size=sample_size, replace=False))
+        sample = np.ascontiguousarray(vectors[sample_idx], dtype=np.float32)
+        centroids = _spherical_kmeans(sample, nlist, iterations, rng)
+        return cls(centroids, _assign(vectors, centroids), trained_rows=rows)
+
+    def add(self, vectors: np.ndarray):
+        """Assign newly appended rows (which follow all existing rows)."""
+        self.assign = np.concatenate([self.assign, _assign(vectors, self.centroids)])
+
+    def take(self, ranges) -> "IVFIndex":
+        """Index restricted to ``ranges`` of rows, renumbered consecutively (compaction)."""
+        assign = np.concatenate([self.assign[start:stop] for start, stop in ranges]) if ranges else self.assign[:0]
+        return IVFIndex(self.centroids, assign, self.trained_rows)
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """Row ids listed under the ``nprobe`` centroids closest to ``query``."""
+        count, order, bounds = self._inverted_lists()
+        nprobe = max(1, min(nprobe, self.nlist))
+        centroid_scores = self.centroids @ query
+        if nprobe < self.nlist:
+            probes = np.argpartition(centroid_scores, -nprobe)[-nprobe:]
+        else:
+            probes = np.arange(self.nlist)
+        parts = [order[bounds[c]:bounds[c + 1]] for c in probes]
+        return np.sort(np.concatenate(parts)) if parts else order[:0]
+
+    def _inverted_lists(self) -> Tuple[int, np.ndarray, np.ndarray]:
+        assign = self.assign
+        cached = self._lists
+        if cached is None or cached[0] != assign.shape[0]:
+            order = np.argsort(assign, kind="stable").astype(np.int64)
+            bounds = np.searchsorted(assign[order], np.arange(self.nlist + 1))
+            cached = (assign.shape[0], order, bounds)
+            self._lists = cached
+        return cached
+
+    # ---- persistence ----
+    def save(self, path: str, generation: int):
+        tmp_path = path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            centroids=self.centroids,
+            assign=self.assign,
+            trained_rows=np.int64(self.trained_rows),
+            generation=np.int64(generation),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, rows: int, generation: int) -> Optional["IVFIndex"]:
+        """Load a saved index, or None when missing or out of step with the store."""
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            if int(data["generation"]) != generation or data["assign"].shape[0] != rows:
+                return None
+            return cls(data["centroids"], data["assign"], int(data["trained_rows"]))
+
+
+def _default_nlist(rows: int) -> int:
+    return int(min(4096, max(16, np.sqrt(rows))))
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    out = np.empty(vectors.shape[0], dtype=np.int32)
+    for start in range(0, vectors.shape[0], _ASSIGN_BLOCK_ROWS):
+        block = vectors[start:start + _ASSIGN_BLOCK_ROWS]
+        out[start:start + block.shape[0]] = np.argmax(block @ centroids.T, axis=1)
+    return out
+
+
+def _spherical_kmeans(sample: np.ndarray, k: int, iterations: int, rng: np.random.Generator) -> np.ndarray:
+    centroids = sample[rng.choice(sample.shape[0], size=k, replace=False)].copy()
+    for _ in range(iterations):
+        labels = _assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        counts = np.bincount(labels, minlength=k)
+        empty = counts == 0
+        if empty.any():
+            # Re-seed empty clusters from random sample rows.
+            sums[empty] = sample[rng.choice(sample.shape[0], size=int(empty.sum()), replace=False)]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = sums / np.maximum(norms, 1e-12)
+    return centroids.astype(np.float32)
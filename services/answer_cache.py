@@ -0,0 +1,168 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Hashable, Optional, Sequence, Tuple
+
+import numpy as np
+
+from services.lexical_index import tokenize
+
+_ENABLED = os.getenv("ANSWER_CACHE", "1").strip().lower() not in ("0", "false", "no")
+# A cached answer is served for a query at least this similar (cosine) to the cached query.
+_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+_TTL = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "900"))
+_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "4096"))
+_MAX_PER_CONVERSATION = int(os.getenv("ANSWER_CACHE_MAX_PER_CONVERSATION", "256"))
+
+# (store content version, included doc ids): answers are only valid for the
+# exact documents and chunks they were retrieved from.
+DocSetVersion = Tuple[int, FrozenSet[str]]
+
+
+def doc_set_version(store, included_doc_ids) -> DocSetVersion:
+    return store.version, frozenset(included_doc_ids or ())
+
+
+def query_identifiers(question: str) -> FrozenSet[str]:
+    """Tokens of ``question`` with a digit or separator, such as "e1042", "4.2" or "pn-0-3"."""
+    return frozenset(t for t in tokenize(question) if any(c.isdigit() or c in "-_./:" for c in t))
+
+
+class _Entry:
+    __slots__ = ("version", "vector", "identifiers", "answer", "expires_at")
+
+    def __init__(
+        self, version: Hashable, vector: np.ndarray, identifiers: FrozenSet[str], answer: str, expires_at: float
+    ):
+        self.version = version
+        self.vector = vector
+        self.identifiers = identifiers
+        self.answer = answer
+        self.expires_at = expires_at
+
+
+class AnswerCache:
+    """Semantic cache of answers per conversation.
+
+    A lookup hits when an unexpired entry of the same conversation and
+    document-set version has a query vector within ``threshold`` cosine of
+    the new query and the same identifiers (codes, numbers), so repeated and
+    lightly paraphrased questions skip retrieval and answer synthesis while
+    "error E1042" and "error E1043" do not share an answer. Entries are evicted least recently used
+    first, per conversation and overall, and expire after ``ttl`` seconds.
+    """
+
+    def __init__(self, threshold: float, ttl: float, max_entries: int, max_per_conversation: int):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max(int(max_entries), 1)
+        self.max_per_conversation = max(int(max_per_conversation), 1)
+        # conversation -> (entry id -> entry), both in least-recently-used order
+        self._conversations: "OrderedDict[str, OrderedDict[int, _Entry]]" = OrderedDict()
+        self._size = 0
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(
+        self, conversation_id: str, version: Hashable, query_vector: Sequence[float], question: str
+    ) -> Optional[str]:
+        query = _unit(query_vector)
+        identifiers = query_identifiers(question)
+        now = time.monotonic()
+        with self._lock:
+            entries = self._conversations.get(conversation_id)
+            best_id, best_score = None, self.threshold
+            if entries:
+                for entry_id, entry in list(entries.items()):
+                    if entry.expires_at <= now:
+                        del entries[entry_id]
+                        self._size -= 1
+                        continue
+                    if entry.version != version or entry.identifiers != identifiers:
+                        continue
+                    score = float(entry.vector @ query)
+                    if score >= best_score:
+                        best_id, best_score = entry_id, score
+            if best_id is None:
+                self.misses += 1
+                return None
+            entries.move_to_end(best_id)
+            self._conversations.move_to_end(conversation_id)
+            self.hits += 1
+            return entries[best_id].answer
+
+    def put(
+        self, conversation_id: str, version: Hashable, query_vector: Sequence[float], question: str, answer: str
+    ):
+        entry = _Entry(
+            version, _unit(query_vector), query_identifiers(question), answer, time.monotonic() + self.ttl
+        )
+        with self._lock:
+            entries = self._conversations.get(conversation_id)
+            if entries is None:
+                entries = self._conversations[conversation_id] = OrderedDict()
+            # Entries for older versions of this conversation can never hit again.
+            for entry_id in [i for i, e in entries.items() if e.version != version]:
+                del entries[entry_id]
+                self._size -= 1
+            self._next_id += 1
+            entries[self._next_id] = entry
+            self._size += 1
+            self._conversations.move_to_end(conversation_id)
+            while len(entries) > self.max_per_conversation:
+                entries.popitem(last=False)
+                self._size -= 1
+                self.evictions += 1
+            while self._size > self.max_entries:
+                oldest_conversation, oldest = next(iter(self._conversations.items()))
+                oldest.popitem(last=False)
+                self._size -= 1
+                self.evictions += 1
+                if not oldest:
+                    del self._conversations[oldest_conversation]
+
+    def invalidate(self, conversation_id: str):
+        """Drop a conversation's answers (documents added, removed or toggled)."""
+        with self._lock:
+            entries = self._conversations.pop(conversation_id, None)
+            if entries:
+                self._size -= len(entries)
+                self.invalidations += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": self._size,
+                "conversations": len(self._conversations),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+def _unit(vector: Sequence[float]) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+
+answer_cache: Optional[AnswerCache] = (
+    AnswerCache(_THRESHOLD, _TTL, _MAX_ENTRIES, _MAX_PER_CONVERSATION) if _ENABLED else None
+)
+
+
+def invalidate_answers(conversation_id: str):
+    if answer_cache is not None:
+        answer_cache.invalidate(conversation_id)
+
+
+def answer_cache_stats() -> dict:
+    """Hit rate, size and eviction counters of the semantic answer cache."""
+    return answer_cache.stats() if answer_cache is not None else {}
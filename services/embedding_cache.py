@@ -0,0 +1,164 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+_WHITESPACE = re.compile(r"\s+")
+# Eviction deletes down to this share of the disk limit, so it runs once per many inserts.
+_DISK_EVICT_TO = 0.9
+
+
+def text_key(text: str) -> bytes:
+    """Content address of a text: SHA-256 of its whitespace-normalized form."""
+    normalized = _WHITESPACE.sub(" ", text).strip()
+    return hashlib.sha256(normalized.encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """Two-tier (LRU memory, SQLite disk) cache of embeddings for one model.
+
+    Entries are keyed by ``(model, text_key(text))``. Opening the disk tier with
+    a different model name than it was last used with clears it, so changing
+    ``EMBEDDING_MODEL_NAME`` never serves stale vectors. The disk tier keeps at
+    most ``max_disk_items`` vectors (0 for no limit), evicting the least
+    recently used. ``_lock`` guards the memory tier and ``_db_lock`` the
+    connection, so memory hits never wait for disk I/O.
+    """
+
+    def __init__(self, model: str, max_memory_items: int, path: Optional[str], max_disk_items: int = 0):
+        self.model = model
+        self.max_memory_items = max(int(max_memory_items), 0)
+        self.max_disk_items = max(int(max_disk_items), 0)
+        self._memory: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._disk_rows = 0  # upper bound on the rows in the disk tier, exact after each eviction
+        self.disk_evictions = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if path:
+            self._open_disk(path)
+
+    def _open_disk(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings "
+            "(key BLOB PRIMARY KEY, vector BLOB NOT NULL, accessed REAL NOT NULL DEFAULT 0)"
+        )
+        if "accessed" not in {column[1] for column in db.execute("PRAGMA table_info(embeddings)")}:
+            db.execute("ALTER TABLE embeddings ADD COLUMN accessed REAL NOT NULL DEFAULT 0")
+        db.execute("CREATE INDEX IF NOT EXISTS embeddings_accessed ON embeddings (accessed)")
+        row = db.execute("SELECT value FROM meta WHERE key = 'model'").fetchone()
+        if row is None or row[0] != self.model:
+            db.execute("DELETE FROM embeddings")
+            db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('model', ?)", (self.model,))
+        self._disk_rows = db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        self._db = db
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        keys = [text_key(text) for text in texts]
+        found: List[Optional[np.ndarray]] = [None] * len(keys)
+        disk_lookup: Dict[bytes, List[int]] = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[i] = vector
+                    self.memory_hits += 1
+                else:
+                    disk_lookup.setdefault(key, []).append(i)
+        stored = self._select(list(disk_lookup)) if disk_lookup and self._db is not None else []
+        with self._lock:
+            for key, blob in stored:
+                vector = np.frombuffer(blob, dtype=np.float32)
+                for i in disk_lookup.pop(key):
+                    found[i] = vector
+                    self.disk_hits += 1
+                self._remember(key, vector)
+            self.misses += sum(len(positions) for positions in disk_lookup.values())
+        return found
+
+    def _select(self, keys: List[bytes]) -> List:
+        """Stored ``(key, vector)`` rows for ``keys``, marked as just used."""
+        rows = []
+        now = time.time()
+        with self._db_lock:
+            self._db.execute("BEGIN")
+            for start in range(0, len(keys), 500):  # stay under SQLite's parameter limit
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows.extend(self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ))
+                self._db.execute(f"UPDATE embeddings SET accessed = ? WHERE key IN ({placeholders})", [now, *batch])
+            self._db.execute("COMMIT")
+        return rows
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[np.ndarray]):
+        rows = []
+        now = time.time()
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                key = text_key(text)
+                vector = np.asarray(vector, dtype=np.float32)
+                self._remember(key, vector)
+                rows.append((key, vector.tobytes(), now))
+        if self._db is None or not rows:
+            return
+        with self._db_lock:
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, accessed) VALUES (?, ?, ?)", rows
+            )
+            self._disk_rows += len(rows)
+            if self.max_disk_items and self._disk_rows > self.max_disk_items:
+                self._evict()
+            self._db.execute("COMMIT")
+
+    def _evict(self):
+        """Delete the least recently used rows beyond the disk limit; called under ``_db_lock``."""
+        self._disk_rows = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = self._disk_rows - int(self.max_disk_items * _DISK_EVICT_TO)
+        if self._disk_rows <= self.max_disk_items or excess <= 0:
+            return
+        self._db.execute(
+            "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY accessed LIMIT ?)",
+            (excess,),
+        )
+        self._disk_rows -= excess
+        self.disk_evictions += excess
+
+    def _remember(self, key: bytes, vector: np.ndarray):
+        if not self.max_memory_items:
+            return
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "model": self.model,
+                "memory_entries": len(self._memory),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "disk_evictions": self.disk_evictions,
+                "hit_rate": ((self.memory_hits + self.disk_hits) / lookups) if lookups else 0.0,
+            }
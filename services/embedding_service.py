@@ -1,28 +1,289 @@
+import asyncio
 import os
-from functools import lru_cache
-from typing import Iterable, List
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
 
 from dotenv import load_dotenv
-from fastembed import TextEmbedding
+import numpy as np
+
+from services.embedding_cache import EmbeddingCache
+from services.executors import cpu_workers, run_cpu, run_io
+from utils.chunking import approximate_token_counts
 
 load_dotenv()
 
 _EMBED_MODEL = os.getenv(
     "EMBEDDING_MODEL_NAME", "BAAI/bge-small-en-v1.5"
 )
+# "hash" swaps the model for deterministic feature-hash vectors (benchmarks, load tests).
+_EMBED_BACKEND = os.getenv("EMBEDDING_BACKEND", "fastembed").strip().lower()
+_HASH_DIM = int(os.getenv("EMBEDDING_HASH_DIM", "384"))
+if _EMBED_BACKEND == "hash":
+    _EMBED_MODEL = f"hash-{_HASH_DIM}"
+# Requests of up to this many texts are coalesced across callers (0 disables).
+_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "64"))
+_BATCH_MAX_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", "3"))
+# Content-addressed cache shared by every conversation ("0" disables it).
+_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE", "1").strip().lower() not in ("0", "false", "no")
+_CACHE_MEMORY_ITEMS = int(os.getenv("EMBEDDING_CACHE_MEMORY_ITEMS", "50000"))
+_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "db/embedding_cache.sqlite3")
+# Vectors kept on disk before the least recently used are evicted (0 = no limit).
+_CACHE_DISK_ITEMS = int(os.getenv("EMBEDDING_CACHE_DISK_ITEMS", "500000"))
+# ONNX intra-op threads per inference; by default the CPUs are split between the CPU pool's workers.
+_THREADS = int(os.getenv("EMBEDDING_THREADS", "0")) or max(1, (os.cpu_count() or 1) // cpu_workers())
+_WARMUP_BATCH = 8
+_WARMUP_TEXT = " ".join(["The quick brown fox jumps over the lazy dog."] * 20)
+
 
+_model = None
+_model_lock = threading.Lock()
+_token_counter = None
 
-@lru_cache(maxsize=1)
-def _load_model() -> TextEmbedding:
+
+def _load_model():
     """Load and cache the embedding model used for vector generation."""
-    return TextEmbedding(model_name=_EMBED_MODEL)
+    global _model
+    if _model is None:
+        # Startup warmup and the first requests may race here; load once.
+        with _model_lock:
+            if _model is None:
+                _model = _create_model()
+    return _model
+
+
+def _create_model():
+    if _EMBED_BACKEND == "hash":
+        from services.hash_embedding import HashEmbedding
+
+        return HashEmbedding(_HASH_DIM)
+    # fastembed pulls in onnxruntime and tokenizers; import it only when the model is needed.
+    from fastembed import TextEmbedding
+
+    return TextEmbedding(model_name=_EMBED_MODEL, threads=_THREADS)
+
+
+def model_loaded() -> bool:
+    return _model is not None
+
+
+def warm_up() -> float:
+    """Load the model and embed one dummy batch so the first request skips both; returns seconds."""
+    start = time.perf_counter()
+    # Bypasses the cache so every start really runs inference once.
+    _embed_now([_WARMUP_TEXT] * _WARMUP_BATCH)
+    count_tokens([_WARMUP_TEXT])
+    return time.perf_counter() - start
+
+
+def count_tokens(texts: List[str]) -> List[int]:
+    """Length of each text in the embedding model's tokens, excluding special tokens.
+
+    Falls back to an approximation when the model does not expose its tokenizer.
+    """
+    tokenizer = _counting_tokenizer()
+    if tokenizer is None:
+        return approximate_token_counts(texts)
+    return [len(encoding.ids) for encoding in tokenizer.encode_batch(texts, add_special_tokens=False)]
+
+
+def _counting_tokenizer():
+    """A copy of the model's tokenizer without padding or truncation.
+
+    The model's own tokenizer pads every text of a batch to the longest one
+    and truncates at the model's input size, so its lengths are not per text.
+    """
+    global _token_counter
+    if _token_counter is None:
+        tokenizer = getattr(getattr(_load_model(), "model", None), "tokenizer", None)
+        if tokenizer is None:
+            return None
+        counter = type(tokenizer).from_str(tokenizer.to_str())
+        counter.no_padding()
+        counter.no_truncation()
+        _token_counter = counter
+    return _token_counter
+
+
+def _embed_now(clean_texts: List[str]) -> List[List[float]]:
+    model = _load_model()
+    vectors = model.embed(clean_texts)
+    return [vector.astype("float32").tolist() for vector in vectors]
+
+
+class EmbeddingBatcher:
+    """Coalesces small embedding requests from concurrent callers into one model call.
+
+    A single worker thread takes the first queued request, keeps collecting
+    requests for up to ``max_wait_ms`` or until ``max_batch_size`` texts are
+    pending, runs one batched inference and hands each caller its slice.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[List[str]], List[List[float]]],
+        max_batch_size: int,
+        max_wait_ms: float,
+    ):
+        self._embed_fn = embed_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue[Tuple[List[str], Future]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._pending_items = 0
+        self.batches = 0
+        self.requests = 0
+        self.items = 0
+        self.largest_batch = 0
+        self._histogram: Dict[int, int] = {}  # power-of-two upper bound -> batches
+
+    def submit(self, texts: List[str]) -> Future:
+        self._ensure_started()
+        future: Future = Future()
+        with self._stats_lock:
+            self._pending_items += len(texts)
+        self._queue.put((texts, future))
+        return future
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            count = len(batch[0][0])
+            deadline = time.monotonic() + self.max_wait
+            while count < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                batch.append(item)
+                count += len(item[0])
+            self._dispatch(batch, count)
+
+    def _dispatch(self, batch: List[Tuple[List[str], Future]], count: int):
+        with self._stats_lock:
+            self._pending_items -= count
+            self.batches += 1
+            self.requests += len(batch)
+            self.items += count
+            self.largest_batch = max(self.largest_batch, count)
+            bucket = 1 << max(count - 1, 0).bit_length()
+            self._histogram[bucket] = self._histogram.get(bucket, 0) + 1
+        try:
+            vectors = self._embed_fn([text for texts, _ in batch for text in texts])
+        except Exception as exc:  # hand the failure to every waiting caller
+            for _, future in batch:
+                future.set_exception(exc)
+            return
+        offset = 0
+        for texts, future in batch:
+            future.set_result(vectors[offset:offset + len(texts)])
+            offset += len(texts)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "pending_items": self._pending_items,
+                "batches": self.batches,
+                "requests": self.requests,
+                "items": self.items,
+                "avg_batch_size": (self.items / self.batches) if self.batches else 0.0,
+                "largest_batch": self.largest_batch,
+                "batch_size_histogram": {f"<={k}": v for k, v in sorted(self._histogram.items())},
+            }
+
+
+_batcher = EmbeddingBatcher(_embed_now, _BATCH_MAX_SIZE, _BATCH_MAX_WAIT_MS) if _BATCH_MAX_SIZE > 0 else None
+_cache = EmbeddingCache(_EMBED_MODEL, _CACHE_MEMORY_ITEMS, _CACHE_PATH or None, _CACHE_DISK_ITEMS) if _CACHE_ENABLED else None
+
+
+def _clean(texts: Iterable[str]) -> List[str]:
+    return [text.strip() for text in texts if text and text.strip()]
+
+
+def _batchable(clean_texts: Sequence[str]) -> bool:
+    return _batcher is not None and len(clean_texts) <= _BATCH_MAX_SIZE
+
+
+def _cached(clean_texts: List[str]) -> Tuple[List[Optional[List[float]]], List[str]]:
+    """Cached vectors (None where missing) and the distinct texts still to embed."""
+    if _cache is None:
+        return [None] * len(clean_texts), list(dict.fromkeys(clean_texts))
+    found = [
+        vector.tolist() if vector is not None else None for vector in _cache.get_many(clean_texts)
+    ]
+    missing = list(dict.fromkeys(text for text, vector in zip(clean_texts, found) if vector is None))
+    return found, missing
+
+
+def _merge(
+    clean_texts: List[str], found: List[Optional[List[float]]], missing: List[str], vectors: List[List[float]]
+) -> List[List[float]]:
+    if _cache is not None and missing:
+        _cache.put_many(missing, [np.asarray(vector, dtype="float32") for vector in vectors])
+    computed = dict(zip(missing, vectors))
+    return [vector if vector is not None else computed[text] for text, vector in zip(clean_texts, found)]
 
 
 def get_embeddings(texts: Iterable[str]) -> List[List[float]]:
     """Return embeddings for a batch of texts, skipping blanks."""
-    clean_texts = [text.strip() for text in texts if text and text.strip()]
+    clean_texts = _clean(texts)
     if not clean_texts:
         return []
-    model = _load_model()
-    vectors = model.embed(clean_texts)
-    return [vector.astype("float32").tolist() for vector in vectors]
+    found, missing = _cached(clean_texts)
+    vectors: List[List[float]] = []
+    if missing:
+        if _batchable(missing):
+            vectors = _batcher.submit(missing).result()
+        else:
+            vectors = _embed_now(missing)
+    return _merge(clean_texts, found, missing, vectors)
+
+
+async def get_embeddings_async(texts: Iterable[str]) -> List[List[float]]:
+    """Awaitable get_embeddings; small requests join the shared micro-batch without holding a thread.
+
+    Cache lookups and stores go through SQLite and the cache lock, so they run
+    on the I/O pool rather than the event loop.
+    """
+    clean_texts = _clean(texts)
+    if not clean_texts:
+        return []
+    if _cache is not None:
+        found, missing = await run_io(_cached, clean_texts)
+    else:
+        found, missing = _cached(clean_texts)
+    vectors: List[List[float]] = []
+    if missing:
+        if _batchable(missing):
+            vectors = await asyncio.wrap_future(_batcher.submit(missing))
+        else:
+            vectors = await run_cpu(_embed_now, missing)
+        if _cache is not None:
+            return await run_io(_merge, clean_texts, found, missing, vectors)
+    return _merge(clean_texts, found, missing, vectors)
+
+
+def batcher_stats() -> dict:
+    """Queue depth and batch-size metrics of the embedding micro-batcher."""
+    return _batcher.stats() if _batcher is not None else {}
+
+
+def cache_stats() -> dict:
+    """Hit/miss counters of the embedding cache (memory and disk tiers)."""
+    return _cache.stats() if _cache is not None else {}
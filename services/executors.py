@@ -0,0 +1,77 @@
+import asyncio
+import contextvars
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+# CPU-bound work that releases the GIL (ONNX embedding inference, numpy search).
+_EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", "2"))
+# Pure-Python CPU work (pypdf parsing) runs in separate processes.
+_PDF_PARSE_WORKERS = int(os.getenv("PDF_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Blocking network and file I/O (supabase-py calls, vector store files).
+_IO_WORKERS = int(os.getenv("IO_WORKERS", "32"))
+
+_pools: Dict[str, Executor] = {}
+_pools_lock = threading.Lock()
+
+
+def _pool(name: str) -> Executor:
+    pool = _pools.get(name)
+    if pool is not None:
+        return pool
+    with _pools_lock:
+        pool = _pools.get(name)
+        if pool is None:
+            if name == "cpu":
+                pool = ThreadPoolExecutor(max_workers=_EMBEDDING_WORKERS, thread_name_prefix="cpu")
+            elif name == "parse":
+                # spawn: forking a process that already runs ONNX threads can deadlock.
+                pool = ProcessPoolExecutor(
+                    max_workers=_PDF_PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                pool = ThreadPoolExecutor(max_workers=_IO_WORKERS, thread_name_prefix="io")
+            _pools[name] = pool
+    return pool
+
+
+async def _run(name: str, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    loop = asyncio.get_running_loop()
+    call = partial(fn, *args, **kwargs)
+    if name != "parse":
+        # Thread pools run in the caller's context, so per-request metrics see their stages.
+        call = partial(contextvars.copy_context().run, call)
+    return await loop.run_in_executor(_pool(name), call)
+
+
+async def run_cpu(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run embedding/search work on the CPU thread pool."""
+    return await _run("cpu", fn, *args, **kwargs)
+
+
+async def run_parse(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run document parsing in the process pool; arguments must be picklable."""
+    return await _run("parse", fn, *args, **kwargs)
+
+
+async def run_io(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run blocking database, storage or file I/O on the I/O thread pool."""
+    return await _run("io", fn, *args, **kwargs)
+
+
+def cpu_workers() -> int:
+    """Threads of the CPU pool running embedding and search concurrently."""
+    return max(_EMBEDDING_WORKERS, 1)
+
+
+def shutdown_executors(wait: bool = True):
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=wait)
@@ -0,0 +1,38 @@
+import hashlib
+import re
+from functools import lru_cache
+from typing import Iterable, Iterator, Tuple
+
+import numpy as np
+
+_TOKEN = re.compile(r"\w+")
+
+
+@lru_cache(maxsize=65536)
+def _slot(token: str, dim: int) -> Tuple[int, float]:
+    digest = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+    return digest % dim, 1.0 if digest >> 63 else -1.0
+
+
+class HashEmbedding:
+    """Deterministic stand-in for the embedding model (``EMBEDDING_BACKEND=hash``).
+
+    Each text is the unit-norm signed feature hash of its lowercased words,
+    so vectors are identical across runs and machines, texts sharing words
+    score higher, and no model download or inference is needed. Meant for
+    benchmarks and load tests that measure everything but the model.
+    """
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def embed(self, texts: Iterable[str], **kwargs) -> Iterator[np.ndarray]:
+        for text in texts:
+            vector = np.zeros(self.dim, dtype=np.float32)
+            slots = [_slot(token, self.dim) for token in _TOKEN.findall(text.lower())]
+            if slots:
+                index, sign = zip(*slots)
+                np.add.at(vector, np.array(index), np.array(sign, dtype=np.float32))
+            else:
+                vector[0] = 1.0
+            yield vector / max(float(np.linalg.norm(vector)), 1e-12)
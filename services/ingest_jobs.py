@@ -0,0 +1,343 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Set
+
+try:
+    import fcntl
+except ImportError:  # Windows: jobs are claimed within this process only
+    fcntl = None
+
+from services.embedding_service import count_tokens
+from services.executors import run_cpu, run_io, run_parse
+from services.vector_store import get_store
+from utils.chunking import Chunk, make_chunker
+from utils.metrics import record, timed
+from utils.pdf_loader import aiter_pages, count_pages
+
+logger = logging.getLogger(__name__)
+
+# Job records (``<doc_id>.json``) and spooled uploads (``<doc_id>.pdf``) live here
+# so jobs that were queued or running when the process stopped are resumed.
+JOB_DIR = os.getenv("INGEST_JOB_DIR", "db/ingest_jobs")
+_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+# Uploads beyond this many queued or running jobs are rejected until one finishes.
+_MAX_PENDING = int(os.getenv("INGEST_QUEUE_SIZE", "16"))
+_EMBED_BATCH = int(os.getenv("INGEST_EMBED_BATCH", "256"))
+# Page ranges of one document submitted to the parse pool ahead of embedding.
+_PARSE_IN_FLIGHT = int(os.getenv("INGEST_PARSE_IN_FLIGHT", "8"))
+# "structured" packs whole sentences into token-budgeted chunks; "fixed" is the
+# original 500-character slicing.
+_CHUNKING = os.getenv("CHUNKING_STRATEGY", "structured")
+_CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "256"))
+_CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+
+QUEUED, PARSING, EMBEDDING, DONE, FAILED, CANCELLED = (
+    "queued", "parsing", "embedding", "done", "failed", "cancelled"
+)
+_FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class IngestQueueFull(Exception):
+    pass
+
+
+class IngestQueue:
+    """Bounded queue of document ingestion jobs processed by a pool of asyncio workers.
+
+    Each job parses the spooled PDF on the parse pool, chunks it and embeds the
+    chunks batch by batch on the CPU pool, recording progress in its job file.
+    """
+
+    def __init__(self, job_dir: str, workers: int, max_pending: int):
+        self.job_dir = job_dir
+        self.workers = max(int(workers), 1)
+        self.max_pending = max(int(max_pending), 1)
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._pending = 0
+        self._cancelled: Set[str] = set()
+        self._claims: Dict[str, threading.Lock] = {}  # doc_id -> claim, where fcntl is unavailable
+
+    # ---- paths ----
+    def _job_path(self, doc_id: str) -> str:
+        return os.path.join(self.job_dir, f"{doc_id}.json")
+
+    def _data_path(self, doc_id: str) -> str:
+        return os.path.join(self.job_dir, f"{doc_id}.pdf")
+
+    def _lock_path(self, doc_id: str) -> str:
+        return os.path.join(self.job_dir, f"{doc_id}.lock")
+
+    # ---- lifecycle ----
+    async def start(self):
+        """Start the workers and re-enqueue jobs left unfinished by a previous run."""
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        for job in await run_io(self._unfinished_jobs):
+            self._pending += 1
+            self._queue.put_nowait(job["doc_id"])
+            logger.info("Resuming ingestion job %s (%s)", job["doc_id"], job["state"])
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    # ---- admission ----
+    def reserve(self):
+        """Claim a queue slot before accepting an upload; raises IngestQueueFull."""
+        if self._pending >= self.max_pending:
+            raise IngestQueueFull(f"{self._pending} ingestion jobs pending")
+        self._pending += 1
+
+    def release(self):
+        """Give back a slot reserved for an upload that was never submitted."""
+        self._pending = max(self._pending - 1, 0)
+
+    async def submit(self, doc_id: str, conversation_id: str, filename: str, data: bytes) -> Dict:
+        """Spool ``data`` and queue a job for it; the caller must hold a reserved slot."""
+        now = time.time()
+        job = {
+            "job_id": doc_id,
+            "doc_id": doc_id,
+            "conversation_id": conversation_id,
+            "filename": filename,
+            "state": QUEUED,
+            "pages_total": None,
+            "pages_parsed": 0,
+            "chunks_total": None,
+            "chunks_embedded": 0,
+            "chunks_duplicate": 0,  # embedded chunks stored as references to existing rows
+            "parse_seconds": 0.0,
+            "slowest_page": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        await run_io(self._spool, job, data)
+        self._queue.put_nowait(doc_id)
+        return job
+
+    def _spool(self, job: Dict, data: bytes):
+        os.makedirs(self.job_dir, exist_ok=True)
+        with open(self._data_path(job["doc_id"]), "wb") as f:
+            f.write(data)
+        self._save(job)
+
+    # ---- status ----
+    def status(self, doc_id: str) -> Optional[Dict]:
+        try:
+            with open(self._job_path(doc_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def stats(self) -> Dict:
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self._pending,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+        }
+
+    def _save(self, job: Dict):
+        job["updated_at"] = time.time()
+        tmp_path = self._job_path(job["doc_id"]) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(job, f)
+        os.replace(tmp_path, self._job_path(job["doc_id"]))
+
+    def _unfinished_jobs(self) -> List[Dict]:
+        if not os.path.isdir(self.job_dir):
+            return []
+        jobs = []
+        for name in os.listdir(self.job_dir):
+            if name.endswith(".json"):
+                job = self.status(name[:-len(".json")])
+                if job and job["state"] not in _FINISHED:
+                    jobs.append(job)
+        return sorted(jobs, key=lambda job: job["created_at"])
+
+    # ---- cancellation ----
+    def cancel(self, doc_id: str):
+        """Stop a queued or running job; a running job removes the rows it added."""
+        job = self.status(doc_id)
+        if job and job["state"] not in _FINISHED:
+            self._cancelled.add(doc_id)
+            job["state"] = CANCELLED
+            self._save(job)
+            self._discard_data(doc_id)
+
+    def cancel_conversation(self, conversation_id: str):
+        for job in self._unfinished_jobs():
+            if job["conversation_id"] == conversation_id:
+                self.cancel(job["doc_id"])
+
+    def forget(self, doc_id: str):
+        """Cancel the job of a deleted document, wait for a running attempt to stop, and drop its record.
+
+        The running attempt (in any worker process) holds the job's lock until
+        it has seen the cancellation, so once this returns no ``store.add`` of
+        the document is in flight and the caller can remove its rows.
+        """
+        self.cancel(doc_id)
+        if fcntl is None:
+            with self._claims.setdefault(doc_id, threading.Lock()):
+                self._remove_record(doc_id)
+            self._claims.pop(doc_id, None)
+        elif os.path.exists(self._lock_path(doc_id)):
+            with open(self._lock_path(doc_id), "a") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                self._remove_record(doc_id)
+        else:
+            self._remove_record(doc_id)
+
+    def _remove_record(self, doc_id: str):
+        for path in (self._job_path(doc_id), self._lock_path(doc_id)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _is_cancelled(self, doc_id: str) -> bool:
+        # The job file is authoritative so cancellations from other processes are seen.
+        if doc_id in self._cancelled:
+            return True
+        job = self.status(doc_id)
+        return job is None or job["state"] == CANCELLED
+
+    def _checkpoint(self, job: Dict) -> bool:
+        """Persist progress unless the job was cancelled meanwhile; returns False if it was."""
+        if self._is_cancelled(job["doc_id"]):
+            return False
+        self._save(job)
+        return True
+
+    def _discard_data(self, doc_id: str):
+        if os.path.exists(self._data_path(doc_id)):
+            os.remove(self._data_path(doc_id))
+
+    # ---- processing ----
+    async def _worker(self):
+        while True:
+            doc_id = await self._queue.get()
+            try:
+                await self._run(doc_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Ingestion job %s crashed", doc_id)
+            finally:
+                self._pending = max(self._pending - 1, 0)
+                self._queue.task_done()
+
+    async def _run(self, doc_id: str):
+        # Other uvicorn workers resume the same job directory; the file lock
+        # makes sure exactly one of them processes each job.
+        lock = await run_io(self._claim, doc_id)
+        if lock is None:
+            return
+        try:
+            job = await run_io(self.status, doc_id)
+            if job is None or job["state"] in _FINISHED:
+                return
+            try:
+                await timed("ingest_document", self._process(job))
+            except Exception as exc:
+                logger.exception("Ingestion of document %s failed", doc_id)
+                # Batches already added must not stay searchable under a failed document.
+                store = await run_io(get_store, job["conversation_id"])
+                await run_io(store.remove_doc, doc_id)
+                job.update(state=FAILED, error=str(exc) or exc.__class__.__name__)
+                if await run_io(self._checkpoint, job):
+                    await run_io(self._discard_data, doc_id)
+        finally:
+            lock.close()
+            self._cancelled.discard(doc_id)
+
+    def _claim(self, doc_id: str):
+        if fcntl is None:
+            claim = self._claims.setdefault(doc_id, threading.Lock())
+            return _ThreadClaim(claim) if claim.acquire(blocking=False) else None
+        os.makedirs(self.job_dir, exist_ok=True)
+        lock = open(self._lock_path(doc_id), "a")
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            return None
+        return lock
+
+    async def _process(self, job: Dict):
+        """Parse, chunk and embed as a pipeline: batches are embedded while later pages are parsed."""
+        doc_id, conversation_id = job["doc_id"], job["conversation_id"]
+        path = self._data_path(doc_id)
+        page_count = await run_parse(count_pages, path)
+        job.update(
+            state=PARSING, pages_total=page_count, pages_parsed=0, chunks_total=None,
+            chunks_embedded=0, chunks_duplicate=0, parse_seconds=0.0, slowest_page=None,
+        )
+        if not await run_io(self._checkpoint, job):
+            return
+        store = await run_io(get_store, conversation_id)
+        # Rows from an attempt interrupted by a restart are replaced, not duplicated.
+        await run_io(store.remove_doc, doc_id)
+
+        chunker = make_chunker(_CHUNKING, _CHUNK_MAX_TOKENS, _CHUNK_OVERLAP_TOKENS, count_tokens=count_tokens)
+        chunks: List[Chunk] = []
+        async for page in aiter_pages(path, run_parse, page_count, max_in_flight=_PARSE_IN_FLIGHT):
+            job["pages_parsed"] = page.number
+            job["parse_seconds"] += page.seconds
+            record("pdf_parse_page", page.seconds)
+            if job["slowest_page"] is None or page.seconds > job["slowest_page"]["seconds"]:
+                job["slowest_page"] = {"page": page.number, "seconds": page.seconds}
+            chunks.extend(await timed("chunking", run_cpu(chunker.feed, page.number, page.text)))
+            while len(chunks) >= _EMBED_BATCH:
+                if not await self._embed_batch(job, store, chunks[:_EMBED_BATCH]):
+                    return
+                del chunks[:_EMBED_BATCH]
+        chunks.extend(await timed("chunking", run_cpu(chunker.finish)))
+
+        job.update(state=EMBEDDING, chunks_total=job["chunks_embedded"] + len(chunks))
+        if not await run_io(self._checkpoint, job):
+            await run_io(store.remove_doc, doc_id)
+            return
+        for start in range(0, len(chunks), _EMBED_BATCH):
+            if not await self._embed_batch(job, store, chunks[start:start + _EMBED_BATCH]):
+                return
+
+        job.update(state=DONE)
+        if await run_io(self._checkpoint, job):
+            await run_io(self._discard_data, doc_id)
+
+    async def _embed_batch(self, job: Dict, store, batch: List[Chunk]) -> bool:
+        """Embed and persist one batch; on cancellation drop the document's rows and return False."""
+        counts = await timed("store_add", run_cpu(
+            store.add,
+            [chunk.text for chunk in batch],
+            doc_id=job["doc_id"],
+            pages=[(chunk.page_start, chunk.page_end) for chunk in batch],
+        ))
+        job["chunks_embedded"] += len(batch)
+        job["chunks_duplicate"] = job.get("chunks_duplicate", 0) + counts["exact"]
+        if await run_io(self._checkpoint, job):
+            return True
+        await run_io(store.remove_doc, job["doc_id"])
+        return False
+
+
+class _ThreadClaim:
+    """Stands in for a job's lock file where ``fcntl`` is unavailable."""
+
+    def __init__(self, lock: threading.Lock):
+        self._lock = lock
+
+    def close(self):
+        self._lock.release()
+
+
+ingest_queue = IngestQueue(JOB_DIR, _WORKERS, _MAX_PENDING)
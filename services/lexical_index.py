@@ -0,0 +1,200 @@
+import math
+import re
+from collections import Counter
+from typing import Dict, List, NamedTuple, Sequence, Tuple
+
+import numpy as np
+
+# Identifiers such as "PN-0-3", "E_1042" or "v2.1" are kept whole and also
+# indexed by their parts, so both exact and partial queries match.
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-_./:][a-z0-9]+)*")
+_SEPARATORS = re.compile(r"[-_./:]")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have if in into is it its of on or that the "
+    "their then there these they this to was were will with what which who whom how why when "
+    "where do does did can could should would".split()
+)
+_K1 = 1.2
+_B = 0.75
+# Merge adjacent segments once the newer one is at least half the older one's size.
+_MERGE_RATIO = 0.5
+
+
+def tokenize(text: str) -> List[str]:
+    tokens: List[str] = []
+    for token in _TOKEN.findall(text.lower()):
+        if token in _STOPWORDS:
+            continue
+        tokens.append(token)
+        if _SEPARATORS.search(token):
+            tokens.extend(part for part in _SEPARATORS.split(token) if part and part not in _STOPWORDS)
+    return tokens
+
+
+class _Segment(NamedTuple):
+    """Postings of a contiguous block of rows starting at ``base``; never mutated."""
+
+    base: int
+    vocab: Dict[str, Tuple[int, int]]  # term -> slice of rows/tfs
+    rows: np.ndarray  # int32, relative to base, ascending within each term
+    tfs: np.ndarray  # uint16 term frequencies
+    lengths: np.ndarray  # int32 token count of each row
+
+
+class BM25Index:
+    """Inverted index over a store's chunk texts, scored with Okapi BM25.
+
+    The index is a list of immutable segments (one per ``add``, merged
+    log-structured as they accumulate) so ``extended`` returns a new index and
+    snapshots held by concurrent searches stay valid. Collection statistics
+    (row count, average length, document frequency) are computed over the rows
+    a query is allowed to see, so tombstoned rows drop out without a rebuild.
+    """
+
+    def __init__(self, segments: Sequence[_Segment] = ()):
+        self.segments: Tuple[_Segment, ...] = tuple(segments)
+        lengths = [seg.lengths for seg in self.segments]
+        self.row_lengths = np.concatenate(lengths) if lengths else np.zeros(0, dtype=np.int32)
+        self._length_prefix = np.concatenate([[0], np.cumsum(self.row_lengths, dtype=np.int64)])
+
+    @property
+    def rows(self) -> int:
+        return self.row_lengths.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        postings = sum(seg.rows.nbytes + seg.tfs.nbytes + seg.lengths.nbytes for seg in self.segments)
+        vocab = sum(len(seg.vocab) for seg in self.segments) * 100  # rough dict + key overhead
+        return postings + vocab + self._length_prefix.nbytes
+
+    @classmethod
+    def build(cls, texts: Sequence[str]) -> "BM25Index":
+        return cls().extended(texts)
+
+    def extended(self, texts: Sequence[str]) -> "BM25Index":
+        """A new index with ``texts`` appended as the next rows."""
+        if not texts:
+            return self
+        segments = [*self.segments, _build_segment(texts, self.rows)]
+        while len(segments) > 1 and segments[-1].lengths.shape[0] >= _MERGE_RATIO * segments[-2].lengths.shape[0]:
+            newer = segments.pop()
+            segments[-1] = _merge(segments[-1], newer)
+        return BM25Index(segments)
+
+    def search(
+        self, query: str, ranges: List[Tuple[int, int]], top_k: int, min_score_ratio: float = 0.0
+    ) -> List[int]:
+        """Best ``top_k`` rows within the sorted, allowed ``ranges``, best first.
+
+        Rows scoring below ``min_score_ratio`` times the best score are dropped,
+        e.g. rows that only share a common word with a query for an identifier.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not ranges or top_k <= 0:
+            return []
+        starts = np.fromiter((start for start, _ in ranges), dtype=np.int64, count=len(ranges))
+        stops = np.fromiter((stop for _, stop in ranges), dtype=np.int64, count=len(ranges))
+        stops = np.minimum(stops, self.rows)
+        total = int(np.maximum(stops - starts, 0).sum())
+        if not total:
+            return []
+        avg_length = max(float((self._length_prefix[stops] - self._length_prefix[starts]).sum()) / total, 1e-9)
+
+        hit_rows, hit_scores = [], []
+        for term in terms:
+            rows, tfs = self._postings(term)
+            if not rows.shape[0]:
+                continue
+            slot = np.searchsorted(starts, rows, side="right") - 1
+            inside = (slot >= 0) & (rows < stops[np.maximum(slot, 0)])
+            rows, tfs = rows[inside], tfs[inside]
+            df = rows.shape[0]
+            if not df:
+                continue
+            idf = math.log(1.0 + (total - df + 0.5) / (df + 0.5))
+            norm = _K1 * (1.0 - _B + _B * self.row_lengths[rows] / avg_length)
+            hit_rows.append(rows)
+            hit_scores.append((idf * tfs * (_K1 + 1.0) / (tfs + norm)).astype(np.float32))
+        if not hit_rows:
+            return []
+        rows = np.concatenate(hit_rows)
+        unique_rows, inverse = np.unique(rows, return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(hit_scores))
+        if min_score_ratio > 0:
+            strong = scores >= min_score_ratio * scores.max()
+            unique_rows, scores = unique_rows[strong], scores[strong]
+        k = min(top_k, unique_rows.shape[0])
+        best = np.argpartition(-scores, k - 1)[:k] if k < unique_rows.shape[0] else np.arange(unique_rows.shape[0])
+        # Ties broken by row order so results are deterministic.
+        best = best[np.lexsort((unique_rows[best], -scores[best]))]
+        return unique_rows[best].tolist()
+
+    def _postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        rows, tfs = [], []
+        for seg in self.segments:
+            span = seg.vocab.get(term)
+            if span is not None:
+                rows.append(seg.rows[span[0]:span[1]].astype(np.int64) + seg.base)
+                tfs.append(seg.tfs[span[0]:span[1]])
+        if not rows:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        return np.concatenate(rows), np.concatenate(tfs).astype(np.float32)
+
+
+def _build_segment(texts: Sequence[str], base: int) -> _Segment:
+    postings: Dict[str, Tuple[List[int], List[int]]] = {}
+    lengths = np.zeros(len(texts), dtype=np.int32)
+    for row, text in enumerate(texts):
+        counts = Counter(tokenize(text))
+        lengths[row] = sum(counts.values())
+        for term, tf in counts.items():
+            entry = postings.get(term)
+            if entry is None:
+                postings[term] = entry = ([], [])
+            entry[0].append(row)
+            entry[1].append(tf)
+    vocab: Dict[str, Tuple[int, int]] = {}
+    rows: List[int] = []
+    tfs: List[int] = []
+    for term, (term_rows, term_tfs) in postings.items():
+        vocab[term] = (len(rows), len(rows) + len(term_rows))
+        rows.extend(term_rows)
+        tfs.extend(term_tfs)
+    return _Segment(base, vocab, np.asarray(rows, dtype=np.int32), np.minimum(np.asarray(tfs), 65535).astype(np.uint16), lengths)
+
+
+def _merge(older: _Segment, newer: _Segment) -> _Segment:
+    shift = newer.base - older.base
+    vocab: Dict[str, Tuple[int, int]] = {}
+    row_parts: List[np.ndarray] = []
+    tf_parts: List[np.ndarray] = []
+    offset = 0
+    for term in {**older.vocab, **newer.vocab}:
+        count = 0
+        for seg, delta in ((older, 0), (newer, shift)):
+            span = seg.vocab.get(term)
+            if span is not None:
+                row_parts.append(seg.rows[span[0]:span[1]] + np.int32(delta))
+                tf_parts.append(seg.tfs[span[0]:span[1]])
+                count += span[1] - span[0]
+        vocab[term] = (offset, offset + count)
+        offset += count
+    empty_rows = np.zeros(0, dtype=np.int32)
+    return _Segment(
+        older.base,
+        vocab,
+        np.concatenate(row_parts) if row_parts else empty_rows,
+        np.concatenate(tf_parts) if tf_parts else np.zeros(0, dtype=np.uint16),
+        np.concatenate([older.lengths, newer.lengths]),
+    )
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], top_k: int, k: int = 60) -> List[int]:
+    """Fuse best-first rankings: each row scores ``sum(1 / (k + rank))``; ties keep first-list order."""
+    scores: Dict[int, float] = {}
+    order: Dict[int, int] = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking, start=1):
+            scores[row] = scores.get(row, 0.0) + 1.0 / (k + rank)
+            order.setdefault(row, len(order))
+    return sorted(scores, key=lambda row: (-scores[row], order[row]))[:top_k]
@@ -1,58 +1,96 @@
 import os
-import re
-from typing import List, Sequence, Tuple
+from typing import List, Optional, Sequence, Tuple
 
 from dotenv import load_dotenv
 import numpy as np
 
 from services.embedding_service import get_embeddings
+from utils.metrics import timer
 
 load_dotenv()
 
 _MIN_CONFIDENCE = float(os.getenv("LLM_MIN_CONFIDENCE", "0.2"))
 _MAX_SENTENCES = int(os.getenv("LLM_MAX_SENTENCES", "2"))
+_NOT_FOUND = "I couldn’t find that in the document."
 
 
-def _split_context(context: str) -> List[str]:
-    sentences = [
-        sentence.strip()
-        for sentence in re.split(r"(?<=[.!?])\s+", context)
-        if sentence and sentence.strip()
-    ]
-    if not sentences:
-        stripped = context.strip()
-        return [stripped] if stripped else []
-    return sentences
+def _unit_rows(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
 
 
-def _similarity_scores(query: str, sentences: Sequence[str]) -> List[Tuple[float, str]]:
-    if not sentences:
-        return []
-    embeddings = get_embeddings([query, *sentences])
-    if len(embeddings) <= 1:
-        return []
-    vectors = np.array(embeddings, dtype="float32")
-    query_vec = vectors[0]
-    sentence_vecs = vectors[1:]
-    query_norm = query_vec / (np.linalg.norm(query_vec) + 1e-12)
-    sentence_norms = sentence_vecs / np.maximum(
-        np.linalg.norm(sentence_vecs, axis=1, keepdims=True), 1e-12
-    )
-    scores = sentence_norms @ query_norm
-    return list(zip(scores.tolist(), sentences))
-
-
-def generate_answer(query: str, context: str) -> str:
-    context = (context or "").strip()
-    if not context:
-        return "I couldn’t find that in the document."
-    sentences = _split_context(context)
-    scored = sorted(
-        _similarity_scores(query, sentences), key=lambda item: item[0], reverse=True
-    )
+def _select_sentences(scored: List[Tuple[float, str]]) -> List[str]:
+    """The answer's sentences, best first: confident ones, else the single best."""
+    scored = sorted(scored, key=lambda item: item[0], reverse=True)
     if not scored:
-        return "I couldn’t find that in the document."
+        return []
     confident = [text for score, text in scored if score >= _MIN_CONFIDENCE]
     top_candidates = confident or [scored[0][1]]
-    answer = " ".join(top_candidates[: max(_MAX_SENTENCES, 1)])
-    return answer.strip() or "I couldn’t find that in the document."
+    return top_candidates[: max(_MAX_SENTENCES, 1)]
+
+
+def _compose_answer(scored: List[Tuple[float, str]]) -> str:
+    answer = " ".join(_select_sentences(scored))
+    return answer.strip() or _NOT_FOUND
+
+
+def answer_from_chunks(query_vector: Optional[Sequence[float]], chunks) -> str:
+    """Answer from retrieved chunks using their stored sentence vectors.
+
+    ``chunks`` are ``RetrievedChunk``s from ``VectorStore.retrieve_vector``;
+    only sentences of rows stored without vectors are embedded here.
+    """
+    return answers_from_chunks([query_vector], [chunks])[0]
+
+
+def answer_sentences(query_vector: Optional[Sequence[float]], chunks) -> List[str]:
+    """The sentences answer_from_chunks joins into its answer, in order, for streaming."""
+    sentences = [s for s in _select_sentences(_scored_sentences([query_vector], [chunks])[0]) if s.strip()]
+    return sentences or [_NOT_FOUND]
+
+
+def answers_from_chunks(query_vectors: Sequence[Optional[Sequence[float]]], chunk_lists) -> List[str]:
+    """answer_from_chunks for several questions; missing sentence vectors are embedded in one call."""
+    return [_compose_answer(scored) for scored in _scored_sentences(query_vectors, chunk_lists)]
+
+
+def _scored_sentences(
+    query_vectors: Sequence[Optional[Sequence[float]]], chunk_lists
+) -> List[List[Tuple[float, str]]]:
+    """(score, sentence) pairs of each question's retrieved chunks; empty when nothing was found."""
+    missing = [
+        sentence
+        for query_vector, chunks in zip(query_vectors, chunk_lists)
+        if query_vector is not None
+        for chunk in chunks
+        if chunk.sentence_vectors is None
+        for sentence in chunk.sentences
+    ]
+    missing_vectors = None
+    if missing:
+        with timer("answer_embed_sentences"):
+            missing_vectors = np.array(get_embeddings(missing), dtype="float32")
+
+    results: List[List[Tuple[float, str]]] = []
+    offset = 0
+    for query_vector, chunks in zip(query_vectors, chunk_lists):
+        if query_vector is None or not chunks:
+            results.append([])
+            continue
+        sentences: List[str] = []
+        blocks: List[np.ndarray] = []
+        for chunk in chunks:
+            if not chunk.sentences:
+                continue
+            sentences.extend(chunk.sentences)
+            if chunk.sentence_vectors is not None:
+                blocks.append(chunk.sentence_vectors)
+            else:
+                blocks.append(_unit_rows(missing_vectors[offset:offset + len(chunk.sentences)]))
+                offset += len(chunk.sentences)
+        if not sentences:
+            results.append([])
+            continue
+        query = _unit_rows(np.asarray(query_vector, dtype="float32"))
+        scores = np.concatenate(blocks) @ query
+        results.append(list(zip(scores.tolist(), sentences)))
+    return results
@@ -0,0 +1,85 @@
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+MODES = ("none", "float16", "int8")
+_SCORE_BLOCK_ROWS = 32768
+
+
+class QuantizedMatrix:
+    """Compact copy of a unit-normalized float32 matrix used for coarse scoring.
+
+    ``float16`` halves the footprint; ``int8`` stores each row as signed bytes
+    with a per-row float32 scale (``row ~= codes * scale``), roughly a quarter.
+    Scores are computed block by block so only one block is ever widened back
+    to float32.
+    """
+
+    def __init__(self, mode: str, codes: np.ndarray, scales: Optional[np.ndarray] = None):
+        self.mode = mode
+        self.codes = codes
+        self.scales = scales
+
+    @classmethod
+    def from_vectors(cls, mode: str, vectors: np.ndarray) -> "QuantizedMatrix":
+        # Encode in blocks so a memory-mapped store is never widened in full.
+        parts = [
+            _encode(mode, vectors[start:start + _SCORE_BLOCK_ROWS])
+            for start in range(0, vectors.shape[0], _SCORE_BLOCK_ROWS)
+        ] or [_encode(mode, np.empty((0, vectors.shape[1]), dtype=np.float32))]
+        codes = np.concatenate([codes for codes, _ in parts])
+        scales = None if parts[0][1] is None else np.concatenate([scales for _, scales in parts])
+        return cls(mode, codes, scales)
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def extended(self, vectors: np.ndarray) -> "QuantizedMatrix":
+        """A new matrix with ``vectors`` appended; the original is left untouched."""
+        codes, scales = _encode(self.mode, vectors)
+        if self.scales is not None:
+            scales = np.concatenate([self.scales, scales])
+        return QuantizedMatrix(self.mode, np.concatenate([self.codes, codes]), scales)
+
+    def take(self, ranges: List[Tuple[int, int]]) -> "QuantizedMatrix":
+        """Rows in ``ranges``, renumbered consecutively (compaction)."""
+        codes = np.concatenate([self.codes[start:stop] for start, stop in ranges]) if ranges else self.codes[:0]
+        scales = None
+        if self.scales is not None:
+            scales = np.concatenate([self.scales[start:stop] for start, stop in ranges]) if ranges else self.scales[:0]
+        return QuantizedMatrix(self.mode, codes, scales)
+
+    def score_range(self, start: int, stop: int, query: np.ndarray) -> np.ndarray:
+        """Scores of rows ``start``..``stop - 1``; a ``(dim, n)`` query matrix gives one column per query."""
+        out = np.empty((stop - start, *query.shape[1:]), dtype=np.float32)
+        for block_start in range(start, stop, _SCORE_BLOCK_ROWS):
+            block_stop = min(block_start + _SCORE_BLOCK_ROWS, stop)
+            out[block_start - start:block_stop - start] = self._score(
+                self.codes[block_start:block_stop],
+                None if self.scales is None else self.scales[block_start:block_stop],
+                query,
+            )
+        return out
+
+    def score_rows(self, rows: np.ndarray, query: np.ndarray) -> np.ndarray:
+        return self._score(self.codes[rows], None if self.scales is None else self.scales[rows], query)
+
+    @staticmethod
+    def _score(codes: np.ndarray, scales: Optional[np.ndarray], query: np.ndarray) -> np.ndarray:
+        scores = codes.astype(np.float32) @ query
+        if scales is not None:
+            scores *= scales if scores.ndim == 1 else scales[:, None]
+        return scores
+
+
+def _encode(mode: str, vectors: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if mode == "float16":
+        return vectors.astype(np.float16), None
+    if mode == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales = np.maximum(scales, 1e-12).astype(np.float32)
+        codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+        return codes, scales
+    raise ValueError(f"Unknown quantization mode {mode!r}; expected one of {MODES}")
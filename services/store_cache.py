@@ -0,0 +1,108 @@
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class StoreCache:
+    """LRU registry of resident stores bounded by an approximate byte budget.
+
+    Entries must expose an ``nbytes`` attribute; it is re-read whenever an
+    entry is (re)inserted so stores that grow or shrink stay accounted for.
+
+    There is at most one live entry per key: entries that were evicted, or
+    never kept because they exceed the budget, are served again for as long
+    as something still references them, and concurrent misses on one key
+    share a single load.
+    """
+
+    def __init__(self, budget_bytes: int):
+        self.budget_bytes = max(int(budget_bytes), 0)
+        self._entries: "OrderedDict[str, object]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._resident = 0
+        self._lock = threading.Lock()
+        # Every entry handed out and still referenced, cached or not.
+        self._live: "weakref.WeakValueDictionary[str, object]" = weakref.WeakValueDictionary()
+        self._loading: Dict[str, List] = {}  # key -> [load lock, threads using it]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[object]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def get_or_load(self, key: str, loader: Callable[[str], T]) -> T:
+        entry = self.get(key)
+        if entry is not None:
+            return entry  # type: ignore[return-value]
+        with self._lock:
+            slot = self._loading.setdefault(key, [threading.Lock(), 0])
+            slot[1] += 1
+        try:
+            with slot[0]:
+                entry = self._live.get(key)  # evicted or oversize, but still in use
+                if entry is None:
+                    entry = loader(key)
+                self.put(key, entry)
+        finally:
+            with self._lock:
+                slot[1] -= 1
+                if not slot[1]:
+                    del self._loading[key]
+        return entry  # type: ignore[return-value]
+
+    def put(self, key: str, entry: object):
+        """Insert or replace ``key`` and evict LRU entries over budget."""
+        size = int(getattr(entry, "nbytes", 0) or 0)
+        with self._lock:
+            self._drop(key)
+            self._live[key] = entry
+            if size > self.budget_bytes:
+                # Larger than the whole budget: serve it, but never keep it.
+                return
+            self._entries[key] = entry
+            self._sizes[key] = size
+            self._resident += size
+            while self._resident > self.budget_bytes and len(self._entries) > 1:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def discard(self, key: str):
+        with self._lock:
+            self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._resident = 0
+
+    def _drop(self, key: str):
+        if key in self._entries:
+            del self._entries[key]
+            self._resident -= self._sizes.pop(key, 0)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "live": len(self._live),
+                "resident_bytes": self._resident,
+                "budget_bytes": self.budget_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
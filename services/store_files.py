@@ -0,0 +1,286 @@
+import json
+import os
+import shutil
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# On-disk layout of one conversation store (directory ``STORE_DIR/<conv_id>``):
+#
+#   manifest.json          rows, dim, generation, segments, tombstoned ranges, rows
+#                          other documents reference as duplicates, duplicate reports,
+#                          a random id telling a recreated store from the old one, and a
+#                          sequence number bumped by every manifest write
+#   vectors.<gen>.f32      raw float32 rows, appended one segment per add
+#   chunks.<gen>.jsonl     one JSON object per row ({"text", "doc_id", "sentences", "pages"})
+#   sentences.<gen>.f32    float32 vectors of each chunk's sentences, in row order
+#
+# Bytes past ``rows`` / ``chunks_bytes`` in the data files belong to an append
+# that never reached the manifest and are truncated by the next append.
+_FORMAT = 1
+_DTYPE = np.float32
+
+
+class StoreFiles:
+    """Append-only, memory-mapped files backing one VectorStore."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.manifest_path = os.path.join(path, "manifest.json")
+        self.manifest: Dict = _empty_manifest()
+
+    # ---- paths ----
+    def _vectors_path(self, generation: Optional[int] = None) -> str:
+        gen = self.manifest["generation"] if generation is None else generation
+        return os.path.join(self.path, f"vectors.{gen}.f32")
+
+    def _chunks_path(self, generation: Optional[int] = None) -> str:
+        gen = self.manifest["generation"] if generation is None else generation
+        return os.path.join(self.path, f"chunks.{gen}.jsonl")
+
+    def _sentences_path(self, generation: Optional[int] = None) -> str:
+        gen = self.manifest["generation"] if generation is None else generation
+        return os.path.join(self.path, f"sentences.{gen}.f32")
+
+    # ---- reading ----
+    def exists(self) -> bool:
+        return os.path.exists(self.manifest_path)
+
+    def load(self) -> Tuple[Optional[np.ndarray], List[Dict]]:
+        """Read the manifest and return (memory-mapped vectors, chunk entries)."""
+        self.manifest = self.read_manifest()
+        return self.open_vectors(), self._read_chunks(self._chunks_path(), 0, self.manifest["chunks_bytes"])
+
+    def changed_on_disk(self) -> bool:
+        """Whether the committed files differ from what this object last read or wrote."""
+        try:
+            disk = self.read_manifest()
+        except FileNotFoundError:
+            disk = _empty_manifest()
+        return any(disk[key] != self.manifest[key] for key in ("instance", "seq", "generation", "rows", "chunks_bytes"))
+
+    def read_manifest(self) -> Dict:
+        """The manifest currently committed on disk, without adopting it."""
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            return {**_empty_manifest(), **json.load(f)}
+
+    def read_chunks(self, manifest: Dict, offset: int) -> List[Dict]:
+        """Chunk entries committed by ``manifest`` past byte ``offset`` of its chunks file."""
+        path = self._chunks_path(manifest["generation"])
+        return self._read_chunks(path, offset, manifest["chunks_bytes"] - offset)
+
+    def open_vectors(self) -> Optional[np.ndarray]:
+        rows, dim = self.manifest["rows"], self.manifest["dim"]
+        if not rows:
+            return None
+        return np.memmap(self._vectors_path(), dtype=_DTYPE, mode="r", shape=(rows, dim))
+
+    def open_sentence_vectors(self) -> Optional[np.ndarray]:
+        rows, dim = self.manifest["sentence_rows"], self.manifest["dim"]
+        if not rows:
+            return None
+        return np.memmap(self._sentences_path(), dtype=_DTYPE, mode="r", shape=(rows, dim))
+
+    @staticmethod
+    def _read_chunks(path: str, offset: int, length: int) -> List[Dict]:
+        if not length:
+            return []
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read(length)
+        return [json.loads(line) for line in data.splitlines() if line]
+
+    # ---- writing ----
+    def append(
+        self,
+        vectors: np.ndarray,
+        entries: Sequence[Dict],
+        doc_id: Optional[str],
+        sentence_vectors: Optional[np.ndarray] = None,
+        refs: Optional[Dict[str, List[int]]] = None,
+        duplicates: Optional[Dict[str, Dict]] = None,
+    ) -> Tuple[int, int]:
+        """Append one segment and commit it to the manifest; returns its row range.
+
+        ``refs`` and ``duplicates``, when given, replace the manifest's
+        duplicate references and reports in the same commit.
+        """
+        manifest = self.manifest
+        if manifest["rows"] and vectors.shape[1] != manifest["dim"]:
+            raise ValueError(
+                f"Vector dimension {vectors.shape[1]} does not match store dimension {manifest['dim']}"
+            )
+        os.makedirs(self.path, exist_ok=True)
+        start = manifest["rows"]
+        _append_bytes(
+            self._vectors_path(),
+            start * vectors.shape[1] * _DTYPE().itemsize,
+            np.ascontiguousarray(vectors, dtype=_DTYPE).tobytes(),
+        )
+        chunk_bytes = _encode_chunks(entries)
+        _append_bytes(self._chunks_path(), manifest["chunks_bytes"], chunk_bytes)
+        sentence_rows = 0 if sentence_vectors is None else sentence_vectors.shape[0]
+        if sentence_rows:
+            _append_bytes(
+                self._sentences_path(),
+                manifest["sentence_rows"] * vectors.shape[1] * _DTYPE().itemsize,
+                np.ascontiguousarray(sentence_vectors, dtype=_DTYPE).tobytes(),
+            )
+
+        stop = start + vectors.shape[0]
+        manifest["dim"] = int(vectors.shape[1])
+        manifest["rows"] = stop
+        manifest["chunks_bytes"] += len(chunk_bytes)
+        manifest["sentence_rows"] += sentence_rows
+        manifest["segments"].append({"doc_id": doc_id, "start": start, "stop": stop})
+        self._set_duplicates(refs, duplicates)
+        self._write_manifest()
+        return start, stop
+
+    def update_duplicates(self, refs: Dict[str, List[int]], duplicates: Dict[str, Dict]):
+        """Commit duplicate references and reports when no rows were appended."""
+        self._set_duplicates(refs, duplicates)
+        self._write_manifest()
+
+    def _set_duplicates(self, refs: Optional[Dict[str, List[int]]], duplicates: Optional[Dict[str, Dict]]):
+        if refs is not None:
+            self.manifest["refs"] = {doc_id: sorted(rows) for doc_id, rows in refs.items() if rows}
+        if duplicates is not None:
+            self.manifest["duplicates"] = duplicates
+
+    def tombstone(
+        self,
+        ranges: Sequence[Tuple[int, int]],
+        reassigned: Sequence[Dict] = (),
+        refs: Optional[Dict[str, List[int]]] = None,
+        duplicates: Optional[Dict[str, Dict]] = None,
+    ):
+        """Mark row ranges dead without touching the data files.
+
+        Rows listed in ``reassigned`` segments (still referenced by another
+        document) stay live under their new owner.
+        """
+        removed = {tuple(r) for r in ranges}
+        self.manifest["segments"] = [
+            seg for seg in self.manifest["segments"] if (seg["start"], seg["stop"]) not in removed
+        ] + [dict(seg) for seg in reassigned]
+        kept = sorted((seg["start"], seg["stop"]) for seg in reassigned)
+        dead = [piece for start, stop in removed for piece in _subtract(start, stop, kept)]
+        self.manifest["dead"] = sorted([*map(tuple, self.manifest["dead"]), *dead])
+        self._set_duplicates(refs, duplicates)
+        self._write_manifest()
+
+    def write_generation(
+        self,
+        generation: int,
+        ranges: Sequence[Tuple[int, int]],
+        sentence_ranges: Sequence[Tuple[int, int]],
+        truncate: bool = True,
+    ):
+        """Copy row ranges (and their sentence rows) into ``generation``'s files."""
+        os.makedirs(self.path, exist_ok=True)
+        mode = "wb" if truncate else "ab"
+        vectors = self.open_vectors()
+        sentence_vectors = self.open_sentence_vectors()
+        with open(self._chunks_path(), "rb") as f:
+            lines = f.read(self.manifest["chunks_bytes"]).splitlines(keepends=True)
+        with open(self._vectors_path(generation), mode) as vf, open(
+            self._chunks_path(generation), mode
+        ) as cf, open(self._sentences_path(generation), mode) as sf:
+            for (start, stop), (s_start, s_stop) in zip(ranges, sentence_ranges):
+                if stop > start and vectors is not None:
+                    vf.write(np.ascontiguousarray(vectors[start:stop]).tobytes())
+                cf.writelines(lines[start:stop])
+                if s_stop > s_start and sentence_vectors is not None:
+                    sf.write(np.ascontiguousarray(sentence_vectors[s_start:s_stop]).tobytes())
+
+    def commit_generation(
+        self,
+        generation: int,
+        rows: int,
+        sentence_rows: int,
+        segments: List[Dict],
+        dead: List[Tuple[int, int]],
+        refs: Optional[Dict[str, List[int]]] = None,
+    ):
+        """Point the manifest at ``generation`` and drop the previous generation's files."""
+        old_paths = (self._vectors_path(), self._chunks_path(), self._sentences_path())
+        self.manifest.update(
+            generation=generation,
+            rows=rows,
+            chunks_bytes=os.path.getsize(self._chunks_path(generation)) if rows else 0,
+            sentence_rows=sentence_rows,
+            segments=segments,
+            dead=sorted(dead),
+        )
+        self._set_duplicates(refs, None)
+        self._write_manifest()
+        # Open memmaps keep the old inode alive until their readers drop them.
+        for path in old_paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def discard_generation(self, generation: int):
+        """Remove the files of a generation that was written but never committed."""
+        if generation == self.manifest["generation"]:
+            return
+        for path in (self._vectors_path(generation), self._chunks_path(generation), self._sentences_path(generation)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _write_manifest(self):
+        if not self.manifest["instance"]:
+            self.manifest["instance"] = os.urandom(8).hex()
+        self.manifest["seq"] += 1
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def remove(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+        self.manifest = _empty_manifest()
+
+
+def _empty_manifest() -> Dict:
+    return {
+        "format": _FORMAT,
+        "generation": 0,
+        "dim": 0,
+        "rows": 0,
+        "chunks_bytes": 0,
+        "sentence_rows": 0,
+        "segments": [],
+        "dead": [],
+        "refs": {},  # doc_id -> rows of other documents' chunks this document duplicates
+        "duplicates": {},  # doc_id -> duplicate report of its adds
+        "instance": "",  # set on the first write; a store deleted and re-created gets a new one
+        "seq": 0,  # manifest writes so far
+    }
+
+
+def _subtract(start: int, stop: int, holes: Sequence[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Pieces of ``[start, stop)`` not covered by the sorted ``holes``."""
+    pieces: List[Tuple[int, int]] = []
+    for hole_start, hole_stop in holes:
+        if hole_stop <= start or hole_start >= stop:
+            continue
+        if hole_start > start:
+            pieces.append((start, hole_start))
+        start = max(start, hole_stop)
+    if start < stop:
+        pieces.append((start, stop))
+    return pieces
+
+
+def _encode_chunks(entries: Sequence[Dict]) -> bytes:
+    return "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries).encode("utf-8")
+
+
+def _append_bytes(path: str, offset: int, data: bytes):
+    """Write ``data`` at ``offset``, discarding any uncommitted tail after it."""
+    mode = "r+b" if os.path.exists(path) else "wb"
+    with open(path, mode) as f:
+        f.truncate(offset)
+        f.seek(offset)
+        f.write(data)
@@ -0,0 +1,111 @@
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+try:
+    import fcntl
+except ImportError:  # Windows: writes are serialized within this process only
+    fcntl = None
+
+import numpy as np
+
+_COUNTER = np.dtype(np.uint64)
+
+
+class _SlotLock:
+    __slots__ = ("lock", "depth")
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.depth = 0
+
+
+class StoreVersions:
+    """Per-store write counters shared by every process that maps the same file.
+
+    Each conversation hashes to one of ``slots`` 8-byte counters in a
+    memory-mapped file next to the stores. Writers bump their store's
+    counter under an exclusive ``lockf`` lock on that slot, so a worker can
+    tell with one memory read whether another worker (or another instance
+    in this process) has written a store since it was loaded. Conversations
+    sharing a slot only cause spurious reloads.
+
+    The file holds two regions: the counters, and one byte range per slot
+    that is locked while a store is being compacted. Without ``fcntl``
+    (Windows) only the in-process locks are taken.
+    """
+
+    def __init__(self, path: str, slots: int = 65536):
+        self.path = path
+        self.slots = max(int(slots), 1)
+        size = 2 * self.slots * _COUNTER.itemsize
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)  # zero-filled; racing workers truncate to the same size
+        self._counters = np.memmap(path, dtype=_COUNTER, mode="r+", shape=(self.slots,))
+        self._locks: Dict[int, _SlotLock] = {}
+        self._claims: Dict[int, threading.Lock] = {}
+        self._registry_lock = threading.Lock()
+
+    def _slot(self, conv_id: str) -> int:
+        digest = hashlib.blake2b(conv_id.encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "little") % self.slots
+
+    def get(self, conv_id: str) -> int:
+        # Aligned 8-byte reads are not torn, so readers need no lock.
+        return int(self._counters[self._slot(conv_id)])
+
+    def bump(self, conv_id: str) -> int:
+        """Advance the store's counter; call while holding ``write_lock(conv_id)``."""
+        slot = self._slot(conv_id)
+        value = int(self._counters[slot]) + 1
+        self._counters[slot] = value
+        return value
+
+    @contextmanager
+    def write_lock(self, conv_id: str) -> Iterator[None]:
+        """Exclusive across processes, re-entrant within a thread.
+
+        ``lockf`` locks belong to the process, so threads are serialized by a
+        per-slot lock and only the outermost acquisition takes the file lock.
+        """
+        slot = self._slot(conv_id)
+        with self._registry_lock:
+            slot_lock = self._locks.setdefault(slot, _SlotLock())
+        with slot_lock.lock:
+            if slot_lock.depth == 0 and fcntl is not None:
+                fcntl.lockf(self._fd, fcntl.LOCK_EX, _COUNTER.itemsize, slot * _COUNTER.itemsize, os.SEEK_SET)
+            slot_lock.depth += 1
+            try:
+                yield
+            finally:
+                slot_lock.depth -= 1
+                if slot_lock.depth == 0 and fcntl is not None:
+                    fcntl.lockf(self._fd, fcntl.LOCK_UN, _COUNTER.itemsize, slot * _COUNTER.itemsize, os.SEEK_SET)
+
+    @contextmanager
+    def claim(self, conv_id: str) -> Iterator[bool]:
+        """Non-blocking exclusive claim (e.g. on compacting a store); yields whether it was won."""
+        slot = self._slot(conv_id)
+        offset = (self.slots + slot) * _COUNTER.itemsize
+        with self._registry_lock:
+            claim = self._claims.setdefault(slot, threading.Lock())
+        if not claim.acquire(blocking=False):
+            yield False
+            return
+        try:
+            if fcntl is not None:
+                try:
+                    fcntl.lockf(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB, _COUNTER.itemsize, offset, os.SEEK_SET)
+                except OSError:
+                    yield False
+                    return
+            try:
+                yield True
+            finally:
+                if fcntl is not None:
+                    fcntl.lockf(self._fd, fcntl.LOCK_UN, _COUNTER.itemsize, offset, os.SEEK_SET)
+        finally:
+            claim.release()
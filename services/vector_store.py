@@ -1,14 +1,70 @@
+import itertools
 import os
 import pickle
-from typing import Iterable, List, Optional, Sequence, Set, Tuple
+import threading
+from bisect import bisect_right
+from contextlib import nullcontext
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
 
 import numpy as np
 
+from services.ann_index import IVFIndex
+from services.embedding_cache import text_key
 from services.embedding_service import get_embeddings
+from services.lexical_index import BM25Index, reciprocal_rank_fusion
+from services.quantization import MODES as QUANTIZATION_MODES, QuantizedMatrix
+from services.store_cache import StoreCache
+from services.store_files import StoreFiles
+from services.store_versions import StoreVersions
+from utils.metrics import timer
+from utils.text import sentence_spans, split_sentences
 
 STORE_DIR = os.getenv("VECTOR_STORE_DIR", "db/vector_stores")
 os.makedirs(STORE_DIR, exist_ok=True)
 
+# Workers sharing STORE_DIR (uvicorn --workers N) serialize writes to a store
+# with a file lock and catch up with a store another worker has written since
+# they read it. Vectors are read-only memmaps, so workers share them in the page cache.
+_SHARED = os.getenv("VECTOR_STORE_SHARED", "1").strip().lower() not in ("0", "false", "no")
+_VERSION_SLOTS = int(os.getenv("VECTOR_STORE_VERSION_SLOTS", "65536"))
+_shared = StoreVersions(os.path.join(STORE_DIR, ".versions"), _VERSION_SLOTS) if _SHARED else None
+# Memory budget for stores kept resident between requests (default 512 MiB).
+_CACHE_BUDGET_BYTES = int(os.getenv("VECTOR_STORE_CACHE_BYTES", str(512 * 1024 * 1024)))
+_cache = StoreCache(_CACHE_BUDGET_BYTES)
+# Compact a store in the background once this fraction of its rows is tombstoned.
+_COMPACT_RATIO = float(os.getenv("VECTOR_STORE_COMPACT_RATIO", "0.3"))
+# Approximate (IVF) search is used once this many rows are searched; below it, exact.
+_ANN_MIN_ROWS = int(os.getenv("VECTOR_ANN_MIN_ROWS", "50000"))
+_ANN_NLIST = int(os.getenv("VECTOR_ANN_NLIST", "0"))  # 0 = sqrt(rows)
+_ANN_NPROBE = int(os.getenv("VECTOR_ANN_NPROBE", "16"))
+# Keep a float16/int8 copy resident for coarse scoring; float32 rows stay on disk.
+_QUANTIZATION = os.getenv("VECTOR_STORE_QUANTIZATION", "none").strip().lower()
+if _QUANTIZATION not in QUANTIZATION_MODES:
+    raise RuntimeError(f"VECTOR_STORE_QUANTIZATION must be one of {QUANTIZATION_MODES}")
+# Coarse candidates per result re-scored exactly against float32 rows (0 = no re-rank).
+_RERANK_FACTOR = int(os.getenv("VECTOR_STORE_RERANK_FACTOR", "4"))
+# Hybrid retrieval: fuse the vector ranking with a BM25 ranking of the chunk
+# texts (reciprocal rank fusion over ``top_k * candidates`` from each side).
+_HYBRID_SEARCH = os.getenv("VECTOR_HYBRID_SEARCH", "1").strip().lower() not in ("0", "false", "no")
+_HYBRID_CANDIDATES = int(os.getenv("VECTOR_HYBRID_CANDIDATES", "4"))
+_RRF_K = int(os.getenv("VECTOR_RRF_K", "60"))
+# Lexical hits scoring below this fraction of the best BM25 score do not vote.
+_LEXICAL_MIN_RATIO = 0.3
+# Chunks identical (by content hash) to a live chunk are stored as a reference to
+# it instead of a new row. Chunks at least this similar (cosine) are still stored
+# with their own text, since a revised figure must not be answered from the older
+# document, and only reported as near duplicates; >= 1 skips the similarity scan.
+_DEDUP = os.getenv("VECTOR_DEDUP", "1").strip().lower() not in ("0", "false", "no")
+_DEDUP_THRESHOLD = float(os.getenv("VECTOR_DEDUP_THRESHOLD", "1"))
+_SCAN_BLOCK_ROWS = 32768
+# Upper bound on the rows x queries score matrix of one batched search pass (float32 cells).
+_BATCH_SCORE_CELLS = 16 * 1024 * 1024
+_dedup_totals = {"chunks": 0, "stored": 0, "exact": 0, "near": 0}
+_dedup_lock = threading.Lock()
+# Content versions are unique across store instances, so a store reloaded
+# after eviction never reuses a version an earlier state of it had.
+_versions = itertools.count(1)
+
 
 def _clean_texts(texts: Iterable[str]) -> List[str]:
     return [text.strip() for text in texts if text and text.strip()]
@@ -18,95 +74,1099 @@ def _embed(texts: Iterable[str]) -> np.ndarray:
     vectors = get_embeddings(texts)
     if not vectors:
         return np.array([], dtype="float32")
-    return np.array(vectors, dtype="float32")
+    return _normalize(np.array(vectors, dtype="float32"))
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    """Scale rows of a contiguous float32 matrix to unit length (in place when possible)."""
+    matrix = np.ascontiguousarray(matrix, dtype="float32")
+    if matrix.ndim != 2 or matrix.size == 0:
+        return matrix
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix /= np.maximum(norms, 1e-12)
+    return matrix
+
+
+class Sentences(NamedTuple):
+    """Sentence spans and vectors of every row; row ``r`` owns ``offsets[r]:offsets[r + 1]``."""
+
+    vectors: Optional[np.ndarray]  # (sentences, dim) unit-normalized, memory-mapped
+    offsets: np.ndarray  # int64, rows + 1
+    spans: np.ndarray  # int32 (sentences, 2) character offsets into the row's text
+
+    @classmethod
+    def empty(cls) -> "Sentences":
+        return cls(None, np.zeros(1, dtype=np.int64), np.zeros((0, 2), dtype=np.int32))
+
+    def extended(self, vectors: Optional[np.ndarray], spans_per_row: List[List[Tuple[int, int]]]) -> "Sentences":
+        counts = np.fromiter((len(spans) for spans in spans_per_row), dtype=np.int64, count=len(spans_per_row))
+        offsets = np.concatenate([self.offsets, self.offsets[-1] + np.cumsum(counts)])
+        flat = [span for spans in spans_per_row for span in spans]
+        spans = np.concatenate([self.spans, np.array(flat, dtype=np.int32).reshape(-1, 2)])
+        return Sentences(vectors, offsets, spans)
+
+    def ranges(self, row_ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        return [(int(self.offsets[start]), int(self.offsets[stop])) for start, stop in row_ranges]
+
+    def take(self, vectors: Optional[np.ndarray], row_ranges: List[Tuple[int, int]]) -> "Sentences":
+        """Sentences of ``row_ranges``, renumbered consecutively (compaction)."""
+        counts = [np.diff(self.offsets[start:stop + 1]) for start, stop in row_ranges]
+        offsets = np.concatenate([[0], np.cumsum(np.concatenate(counts))]) if counts else np.zeros(1)
+        spans = [self.spans[s_start:s_stop] for s_start, s_stop in self.ranges(row_ranges)]
+        return Sentences(
+            vectors,
+            offsets.astype(np.int64),
+            np.concatenate(spans) if spans else np.zeros((0, 2), dtype=np.int32),
+        )
+
+
+class RetrievedChunk(NamedTuple):
+    text: str
+    doc_id: Optional[str]
+    sentences: List[str]
+    # Unit-normalized vectors aligned with ``sentences``; None for rows stored
+    # before sentence vectors were precomputed.
+    sentence_vectors: Optional[np.ndarray]
+
+
+class StoreView(NamedTuple):
+    """Consistent snapshot of a store's state, taken under its lock."""
+
+    vectors: Optional[np.ndarray]
+    docs: List[Tuple[str, Optional[str]]]
+    doc_rows: Dict[Optional[str], List[Tuple[int, int]]]
+    doc_refs: Dict[str, List[int]]
+    dead_rows: int
+    ann: Optional[IVFIndex]
+    quantized: Optional[QuantizedMatrix]
+    sentences: Sentences
+    lexical: Optional[BM25Index]
 
 
-# Stored payload: (index, [(text, doc_id)])
+# Each conversation is a StoreFiles directory: an append-only, memory-mapped
+# matrix of unit-normalized float32 rows plus per-row chunk metadata.
 class VectorStore:
     def __init__(self, conv_id: str):
         self.conv_id = conv_id
-        self.path = os.path.join(STORE_DIR, f"{conv_id}.pkl")
+        self.path = os.path.join(STORE_DIR, conv_id)
+        self.legacy_path = os.path.join(STORE_DIR, f"{conv_id}.pkl")
+        self.files = StoreFiles(self.path)
         self.vectors: Optional[np.ndarray] = None
         self.docs: List[Tuple[str, Optional[str]]] = []  # list of (text, doc_id)
+        # doc_id -> [(start, stop)] row ranges of live rows in vectors/docs
+        self.doc_rows: Dict[Optional[str], List[Tuple[int, int]]] = {}
+        # doc_id -> rows owned by other documents that duplicate this document's chunks
+        self.doc_refs: Dict[str, List[int]] = {}
+        self.duplicates: Dict[str, Dict] = {}  # doc_id -> duplicate report
+        self._row_hashes: Optional[Dict[bytes, int]] = None  # content hash -> row, built on first add
+        self.dead_rows = 0  # tombstoned rows awaiting compaction
+        self.ann: Optional[IVFIndex] = None
+        self.ann_path = os.path.join(self.path, "ivf.npz")
+        self.quantized: Optional[QuantizedMatrix] = None
+        self.sentences = Sentences.empty()
+        # BM25 index of the chunk texts, built on the first hybrid search after a load
+        self.lexical: Optional[BM25Index] = None
+        self._text_bytes = 0
+        # Changes whenever searchable content changes (add, remove_doc, delete_store).
+        self.version = next(_versions)
+        # Shared write counter of this store when its files were last read or written.
+        self.disk_version = 0
+        self._lock = threading.RLock()
+        self._compacting = False
         self._load()
 
+    @property
+    def nbytes(self) -> int:
+        """Approximate resident size, used by the store cache budget."""
+        if self.quantized is not None:
+            vector_bytes = self.quantized.nbytes  # float32 rows are only paged in for re-ranking
+        else:
+            vector_bytes = self.vectors.nbytes if self.vectors is not None else 0
+        ann_bytes = self.ann.nbytes if self.ann is not None else 0
+        sentence_bytes = self.sentences.offsets.nbytes + self.sentences.spans.nbytes
+        lexical_bytes = self.lexical.nbytes if self.lexical is not None else 0
+        return vector_bytes + ann_bytes + sentence_bytes + lexical_bytes + self._text_bytes
+
     def _load(self):
-        if os.path.exists(self.path):
-            with open(self.path, "rb") as f:
-                vectors, docs = pickle.load(f)
-            self.vectors = vectors
-            self.docs = [
-                entry if isinstance(entry, tuple) and len(entry) == 2 else (entry, None)
-                for entry in docs or []
-            ]
-
-    def _persist(self):
-        with open(self.path, "wb") as f:
-            pickle.dump((self.vectors, self.docs), f)
-
-    def add(self, texts: Iterable[str], doc_id: str):
+        # Read before the files: a write landing mid-load only causes another reload.
+        self.disk_version = _shared.get(self.conv_id) if _shared is not None else 0
+        if not self.files.exists() and os.path.exists(self.legacy_path):
+            with self._write_lock():
+                # Another worker may have migrated it while this one waited.
+                if not self.files.exists() and os.path.exists(self.legacy_path):
+                    self._migrate_legacy()
+                    self._written()
+        if not self.files.exists():
+            return
+        vectors, entries = self.files.load()
+        sentences = Sentences.empty().extended(
+            self.files.open_sentence_vectors(),
+            [[tuple(span) for span in entry.get("sentences", ())] for entry in entries],
+        )
+        self._set_state(vectors, [(entry["text"], entry.get("doc_id")) for entry in entries], sentences)
+        manifest = self.files.manifest
+        self.ann = IVFIndex.load(self.ann_path, manifest["rows"], manifest["generation"])
+        self._refresh_ann()
+
+    def _set_state(
+        self,
+        vectors: Optional[np.ndarray],
+        docs: List[Tuple[str, Optional[str]]],
+        sentences: Sentences,
+        appended_from: Optional[int] = None,
+    ):
+        """Adopt loaded rows; with ``appended_from``, rows before it are the current ones
+        and derived indexes are extended instead of rebuilt."""
+        manifest = self.files.manifest
+        doc_rows: Dict[Optional[str], List[Tuple[int, int]]] = {}
+        for seg in manifest["segments"]:
+            doc_rows.setdefault(seg["doc_id"], []).append((seg["start"], seg["stop"]))
+        # Rows reassigned to a referencing document keep their old owner in chunks.jsonl.
+        # Those segments are single rows, so checking each segment's first row is enough.
+        docs = list(docs)
+        for seg in manifest["segments"]:
+            text, owner = docs[seg["start"]]
+            if owner != seg["doc_id"]:
+                docs[seg["start"]] = (text, seg["doc_id"])
+        self.vectors = vectors
+        self.docs = docs
+        self.doc_rows = doc_rows
+        self.doc_refs = {doc_id: list(rows) for doc_id, rows in manifest["refs"].items()}
+        self.duplicates = dict(manifest["duplicates"])
+        self.sentences = sentences
+        if appended_from is None:
+            self._row_hashes = None
+            self.lexical = None
+            self.quantized = None
+            if _QUANTIZATION != "none" and vectors is not None:
+                self.quantized = QuantizedMatrix.from_vectors(_QUANTIZATION, vectors)
+        elif len(docs) > appended_from:
+            appended = vectors[appended_from:]
+            texts = [text for text, _ in docs[appended_from:]]
+            if self._row_hashes is not None:
+                for row, text in enumerate(texts, appended_from):
+                    self._row_hashes.setdefault(text_key(text), row)
+            if self.lexical is not None:
+                self.lexical = self.lexical.extended(texts) if self.lexical.rows == appended_from else None
+            if self.quantized is not None:
+                self.quantized = self.quantized.extended(appended)
+            elif _QUANTIZATION != "none":
+                self.quantized = QuantizedMatrix.from_vectors(_QUANTIZATION, vectors)
+            if self.ann is not None:
+                if self.ann.assign.shape[0] == appended_from:
+                    self.ann.add(appended)
+                else:
+                    self.ann = IVFIndex.load(self.ann_path, manifest["rows"], manifest["generation"])
+        self.dead_rows = sum(stop - start for start, stop in manifest["dead"])
+        self._text_bytes = sum(len(text) for text, _ in docs)
+
+    def _migrate_legacy(self):
+        """Convert a ``<conv_id>.pkl`` store to the segment format, once."""
+        with open(self.legacy_path, "rb") as f:
+            vectors, docs = pickle.load(f)
+        docs = [
+            entry if isinstance(entry, tuple) and len(entry) == 2 else (entry, None)
+            for entry in docs or []
+        ]
+        if vectors is not None and len(docs):
+            # Older stores hold raw model output; normalize once while migrating.
+            vectors = _normalize(vectors)
+            start = 0
+            for row in range(1, len(docs) + 1):
+                if row == len(docs) or docs[row][1] != docs[start][1]:
+                    self.files.append(
+                        vectors[start:row],
+                        [{"text": text, "doc_id": d_id} for text, d_id in docs[start:row]],
+                        docs[start][1],
+                    )
+                    start = row
+        os.remove(self.legacy_path)
+
+    def snapshot(self) -> StoreView:
+        with self._lock:
+            return StoreView(
+                self.vectors,
+                self.docs,
+                self.doc_rows,
+                self.doc_refs,
+                self.dead_rows,
+                self.ann,
+                self.quantized,
+                self.sentences,
+                self.lexical,
+            )
+
+    def _persisted(self):
+        # Re-register so the cache serves this state and re-accounts its size.
+        _cache.put(self.conv_id, self)
+
+    def _write_lock(self):
+        """Held around every write to this store's files, across worker processes."""
+        return _shared.write_lock(self.conv_id) if _shared is not None else nullcontext()
+
+    def _written(self):
+        if _shared is not None:
+            self.disk_version = _shared.bump(self.conv_id)
+
+    def refresh(self) -> bool:
+        """Reload from disk if another worker has written this store since it was read."""
+        if _shared is None or _shared.get(self.conv_id) == self.disk_version:
+            return False
+        with self._lock:
+            if _shared.get(self.conv_id) == self.disk_version:
+                return False
+            return self._reload()
+
+    def _sync(self) -> bool:
+        """Catch up with the files before changing them; called under the write lock.
+
+        Compares the manifest on disk rather than the shared counter, so a
+        writer never appends from a stale manifest, with or without
+        VECTOR_STORE_SHARED.
+        """
+        with self._lock:
+            return self.files.changed_on_disk() and self._reload()
+
+    def _reload(self) -> bool:
+        # Called with self._lock held.
+        if not self._load_appended():
+            for attempt in range(3):
+                self._clear_state()
+                self.files = StoreFiles(self.path)
+                try:
+                    self._load()
+                    break
+                except FileNotFoundError:
+                    # Compacted (old generation removed) or deleted between manifest and data reads.
+                    if attempt == 2:
+                        raise
+        self.version = next(_versions)
+        return True
+
+    def _load_appended(self) -> bool:
+        """Catch up with writes that only appended rows or rewrote the manifest.
+
+        Adds and removals of one generation leave the rows already read
+        untouched, so only the manifest and the new chunk entries are read.
+        Returns False, leaving the store as it was, after a compaction or a
+        re-creation; the caller then reloads everything.
+        """
+        disk_version = _shared.get(self.conv_id) if _shared is not None else 0
+        current = self.files.manifest
+        try:
+            manifest = self.files.read_manifest()
+            if (
+                not current["instance"]
+                or manifest["instance"] != current["instance"]
+                or manifest["generation"] != current["generation"]
+                or manifest["rows"] < current["rows"]
+            ):
+                return False
+            entries = self.files.read_chunks(manifest, current["chunks_bytes"])
+        except FileNotFoundError:
+            return False
+        if len(entries) != manifest["rows"] - current["rows"]:
+            return False
+        self.files.manifest = manifest
+        self.disk_version = disk_version
+        sentences = self.sentences.extended(
+            self.files.open_sentence_vectors(),
+            [[tuple(span) for span in entry.get("sentences", ())] for entry in entries],
+        )
+        self._set_state(
+            self.files.open_vectors(),
+            self.docs + [(entry["text"], entry.get("doc_id")) for entry in entries],
+            sentences,
+            appended_from=len(self.docs),
+        )
+        self._refresh_ann()
+        return True
+
+    def add(
+        self, texts: Iterable[str], doc_id: str, pages: Optional[Sequence[Tuple[int, int]]] = None
+    ) -> Dict[str, int]:
+        """Embed and append chunks of ``doc_id``; ``pages`` gives each chunk's (first, last) page.
+
+        Chunks identical to a live chunk are not stored again: the document
+        references the existing row instead. Near duplicates are stored and
+        only counted. Returns how many chunks were stored and how many were
+        exact or near duplicates.
+        """
+        if pages is not None:
+            kept = [(text.strip(), span) for text, span in zip(texts, pages) if text and text.strip()]
+            texts, pages = [text for text, _ in kept], [span for _, span in kept]
         texts = _clean_texts(texts)
+        counts = {"chunks": len(texts), "stored": 0, "exact": 0, "near": 0}
         if not texts:
-            return
-        vectors = _embed(texts)
+            return counts
+        with timer("embed_chunks"):
+            vectors = _embed(texts)
         if vectors.size == 0:
+            return counts
+        hashes = [text_key(text) for text in texts]
+        generation = self.files.manifest["generation"]
+        with timer("dedup"):
+            targets = self._duplicate_targets(texts, hashes, vectors) if _DEDUP else [None] * len(texts)
+        near = {i: target[1] for i, target in enumerate(targets) if target is not None and target[0] == "near"}
+        targets = [None if i in near else target for i, target in enumerate(targets)]
+        # Embed each stored chunk's sentences now so answer synthesis only does lookups.
+        planned = [i for i, target in enumerate(targets) if target is None]
+        spans_by_index = {i: sentence_spans(texts[i]) for i in planned}
+        with timer("embed_sentences"):
+            sentence_vectors = _embed(
+                [texts[i][start:end] for i in planned for start, end in spans_by_index[i]]
+            )
+        with self._write_lock(), self._lock:
+            self._sync()
+            # Rows matched before a compaction (here or in another worker) were renumbered.
+            renumbered = self.files.manifest["generation"] != generation
+            live = _LiveRows(self.doc_rows)
+            for i, target in enumerate(targets):
+                if target is not None and target[1] >= 0 and (renumbered or not live(target[1])):
+                    # Removed since it was matched: store this chunk after all,
+                    # without precomputed sentence vectors.
+                    targets[i] = None
+                    spans_by_index[i] = []
+            stored = [i for i, target in enumerate(targets) if target is None]
+            start = len(self.docs)
+            new_rows = {i: start + n for n, i in enumerate(stored)}
+            refs = {d_id: list(rows) for d_id, rows in self.doc_refs.items()}
+            duplicates = dict(self.duplicates)
+            report = dict(duplicates.get(doc_id) or _empty_report())
+            report["duplicate_of"] = dict(report["duplicate_of"])
+            own_refs = set(refs.get(doc_id, ()))
+            for i, target in enumerate(targets):
+                if target is None:
+                    continue
+                kind, row = target
+                row = row if row >= 0 else new_rows[-row - 1]
+                owner = self.docs[row][1] if row < start else doc_id
+                counts[kind] += 1
+                report[kind] += 1
+                report["duplicate_of"][owner] = report["duplicate_of"].get(owner, 0) + 1
+                if owner != doc_id:
+                    own_refs.add(row)
+            for i, row in near.items():
+                if row >= 0 and (renumbered or not live(row)):
+                    continue  # the similar chunk was removed meanwhile
+                owner = self.docs[row][1] if row >= 0 else doc_id
+                counts["near"] += 1
+                report["near"] += 1
+                report["duplicate_of"][owner] = report["duplicate_of"].get(owner, 0) + 1
+            counts["stored"] = len(stored)
+            report["chunks"] += counts["chunks"]
+            report["stored"] += counts["stored"]
+            duplicates[doc_id] = report
+            if own_refs:
+                refs[doc_id] = sorted(own_refs)
+
+            if stored:
+                entries = []
+                for i in stored:
+                    entry = {"text": texts[i], "doc_id": doc_id, "sentences": [list(span) for span in spans_by_index[i]]}
+                    if pages is not None:
+                        entry["pages"] = [int(pages[i][0]), int(pages[i][1])]
+                    entries.append(entry)
+                stored_vectors = vectors[stored] if len(stored) < len(texts) else vectors
+                with timer("persist"):
+                    start, stop = self.files.append(
+                        stored_vectors, entries, doc_id, sentence_vectors, refs=refs, duplicates=duplicates
+                    )
+                doc_rows = dict(self.doc_rows)
+                doc_rows[doc_id] = [*doc_rows.get(doc_id, []), (start, stop)]
+                # Rows only ever grow here, so older snapshots stay valid.
+                stored_texts = [texts[i] for i in stored]
+                self.docs.extend([(text, doc_id) for text in stored_texts])
+                self.vectors = self.files.open_vectors()
+                self.doc_rows = doc_rows
+                self.sentences = self.sentences.extended(
+                    self.files.open_sentence_vectors(), [spans_by_index[i] for i in stored]
+                )
+                self._text_bytes += sum(len(text) for text in stored_texts)
+                if self._row_hashes is not None:
+                    for i in stored:
+                        self._row_hashes.setdefault(hashes[i], new_rows[i])
+                if self.quantized is not None:
+                    # Replace rather than extend in place so snapshots stay consistent.
+                    self.quantized = self.quantized.extended(stored_vectors)
+                elif _QUANTIZATION != "none":
+                    self.quantized = QuantizedMatrix.from_vectors(_QUANTIZATION, stored_vectors)
+                if self.ann is not None:
+                    self.ann.add(stored_vectors)
+                    self.ann.save(self.ann_path, self.files.manifest["generation"])
+                if self.lexical is not None:
+                    self.lexical = self.lexical.extended(stored_texts) if self.lexical.rows == start else None
+            else:
+                self.files.update_duplicates(refs, duplicates)
+            self.doc_refs = refs
+            self.duplicates = duplicates
+            self.version = next(_versions)
+            self._written()
+        _count_dedup(counts)
+        if stored:
+            self._refresh_ann()
+        self._persisted()
+        return counts
+
+    def _duplicate_targets(
+        self, texts: List[str], hashes: List[bytes], vectors: np.ndarray
+    ) -> List[Optional[Tuple[str, int]]]:
+        """Per chunk, None or ``(kind, row)`` of the chunk it duplicates.
+
+        ``kind`` is "exact" (same content hash) or "near" (cosine similarity of
+        at least VECTOR_DEDUP_THRESHOLD). ``row`` is an existing row, or
+        ``-(i + 1)`` for the ``i``-th chunk of this same batch. Only exact
+        duplicates are stored as references; near ones are stored as well.
+        """
+        view = self.snapshot()
+        row_hashes = self._hash_index(view)
+        live = _LiveRows(view.doc_rows)
+        targets: List[Optional[Tuple[str, int]]] = [None] * len(texts)
+        for i, key in enumerate(hashes):
+            row = row_hashes.get(key)
+            if row is not None and live(row):
+                targets[i] = ("exact", row)
+
+        near = _DEDUP_THRESHOLD < 1.0
+        pending = [i for i, target in enumerate(targets) if target is None]
+        if near and pending and view.vectors is not None and live.ranges:
+            rows, scores = _nearest_rows(view, vectors[pending], live.ranges)
+            for i, row, score in zip(pending, rows.tolist(), scores.tolist()):
+                if row >= 0 and score >= _DEDUP_THRESHOLD:
+                    targets[i] = ("near", row)
+
+        # Duplicates inside the batch point at the first stored copy.
+        first_by_hash: Dict[bytes, int] = {}
+        stored: List[int] = []
+        similarity = vectors @ vectors.T if near else None
+        for i, key in enumerate(hashes):
+            if targets[i] is not None and targets[i][0] == "exact":
+                continue
+            earlier = first_by_hash.get(key)
+            if earlier is not None:
+                targets[i] = ("exact", -(earlier + 1))
+                continue
+            if targets[i] is None and similarity is not None and stored:
+                best = stored[int(np.argmax(similarity[i, stored]))]
+                if similarity[i, best] >= _DEDUP_THRESHOLD:
+                    targets[i] = ("near", -(best + 1))
+            # Near duplicates are stored too, so later exact copies can refer to them.
+            first_by_hash[key] = i
+            stored.append(i)
+        return targets
+
+    def _hash_index(self, view: StoreView) -> Dict[bytes, int]:
+        """Content hash -> first row with that text; rows may since have been removed."""
+        hashes = self._row_hashes
+        if hashes is not None:
+            return hashes
+        rows = len(view.docs)
+        hashes = {}
+        for row, (text, _) in enumerate(view.docs[:rows]):
+            hashes.setdefault(text_key(text), row)
+        with self._lock:
+            if self.docs is view.docs and self._row_hashes is None:
+                for row in range(rows, len(self.docs)):
+                    hashes.setdefault(text_key(self.docs[row][0]), row)
+                self._row_hashes = hashes
+        return hashes
+
+    def duplicate_report(self, doc_id: str) -> Optional[Dict]:
+        """Duplicate statistics of a document's adds, or None if nothing was added for it."""
+        with self._lock:
+            report = self.duplicates.get(doc_id)
+            refs = len(self.doc_refs.get(doc_id, ()))
+        if report is None:
+            return None
+        chunks = report["chunks"]
+        return {
+            "doc_id": doc_id,
+            **report,
+            "referenced_rows": refs,
+            "dedup_ratio": (1 - report["stored"] / chunks) if chunks else 0.0,
+        }
+
+    def _refresh_ann(self):
+        """(Re)train the IVF index when the store crosses the size threshold or outgrows it."""
+        with self._lock:
+            vectors, ann, generation = self.vectors, self.ann, self.files.manifest["generation"]
+            live_rows = len(self.docs) - self.dead_rows
+        if vectors is None or live_rows < _ANN_MIN_ROWS:
             return
-        if self.vectors is None:
-            self.vectors = vectors
-        else:
-            self.vectors = np.vstack([self.vectors, vectors])
-        self.docs.extend([(text, doc_id) for text in texts])
-        self._persist()
+        if ann is not None and vectors.shape[0] <= 4 * ann.trained_rows:
+            return  # kept current incrementally by add()
+        # Train outside the lock; rows appended meanwhile are assigned on install.
+        ann = IVFIndex.build(vectors, _ANN_NLIST)
+        with self._lock:
+            if self.vectors is None or self.files.manifest["generation"] != generation:
+                return  # deleted or compacted while training
+            if self.vectors.shape[0] > ann.assign.shape[0]:
+                ann.add(self.vectors[ann.assign.shape[0]:])
+            self.ann = ann
+            ann.save(self.ann_path, generation)
 
     def remove_doc(self, doc_id: str):
-        if not self.docs:
-            return
-        kept_entries = [(text, d_id) for text, d_id in self.docs if d_id != doc_id]
-        if len(kept_entries) == len(self.docs):
-            return  # Nothing to remove
-        if not kept_entries:
-            self.delete_store()
-            return
-        vectors = _embed([text for text, _ in kept_entries])
-        if vectors.size == 0:
-            self.delete_store()
-            return
-        self.vectors = vectors
-        self.docs = kept_entries
-        self._persist()
+        """Tombstone a document's rows; stored vectors of everything else are reused.
+
+        The BM25 index needs no update: its statistics only count rows that
+        are still listed in ``doc_rows``.
+        """
+        with self._write_lock(), self._lock:
+            self._sync()
+            ranges = sorted(self.doc_rows.get(doc_id) or [])
+            if not ranges:
+                return  # Nothing to remove
+            refs = {d_id: list(rows) for d_id, rows in self.doc_refs.items() if d_id != doc_id}
+            reassigned = self._reassign_referenced(doc_id, ranges, refs)
+            removed = sum(stop - start for start, stop in ranges) - len(reassigned)
+            if not reassigned and removed >= len(self.docs) - self.dead_rows:
+                self.delete_store()
+                return
+            duplicates = {d_id: report for d_id, report in self.duplicates.items() if d_id != doc_id}
+            self.files.tombstone(ranges, reassigned, refs, duplicates)
+            doc_rows = dict(self.doc_rows)
+            del doc_rows[doc_id]
+            for seg in reassigned:
+                doc_rows[seg["doc_id"]] = [*doc_rows.get(seg["doc_id"], []), (seg["start"], seg["stop"])]
+                text, _ = self.docs[seg["start"]]
+                self.docs[seg["start"]] = (text, seg["doc_id"])
+            self.doc_rows = doc_rows
+            self.doc_refs = refs
+            self.duplicates = duplicates
+            self.dead_rows += removed
+            self._row_hashes = None  # may point at removed rows that have live copies
+            self.version = next(_versions)
+            self._written()
+        self._persisted()
+        if self._needs_compaction():
+            threading.Thread(target=self.compact, name=f"compact-{self.conv_id}", daemon=True).start()
+
+    @staticmethod
+    def _reassign_referenced(
+        doc_id: str, ranges: List[Tuple[int, int]], refs: Dict[str, List[int]]
+    ) -> List[Dict]:
+        """Single-row segments handing rows of ``doc_id`` that other documents
+        reference to the first of them; ``refs`` is updated to match."""
+        starts = [start for start, _ in ranges]
+        owners: Dict[int, str] = {}
+        for d_id, rows in refs.items():
+            for row in rows:
+                slot = bisect_right(starts, row) - 1
+                if slot >= 0 and row < ranges[slot][1]:
+                    owners.setdefault(row, d_id)
+        for row, owner in owners.items():
+            refs[owner] = [r for r in refs[owner] if r != row]
+            if not refs[owner]:
+                del refs[owner]
+        return [{"doc_id": owner, "start": row, "stop": row + 1} for row, owner in sorted(owners.items())]
+
+    def _ensure_lexical(self) -> Optional[BM25Index]:
+        """Build the BM25 index (outside the lock) if this store does not have one yet."""
+        with self._lock:
+            if self.lexical is not None or not self.docs:
+                return self.lexical
+            docs, rows, generation = self.docs, len(self.docs), self.files.manifest["generation"]
+        lexical = BM25Index.build([text for text, _ in docs[:rows]])
+        with self._lock:
+            if self.lexical is not None or self.files.manifest["generation"] != generation or not self.docs:
+                return self.lexical  # built concurrently, compacted or deleted meanwhile
+            if len(self.docs) > rows:
+                lexical = lexical.extended([text for text, _ in self.docs[rows:]])
+            self.lexical = lexical
+        self._persisted()
+        return lexical
 
-    def search(self, query: str, top_k: int = 8, restrict_doc_ids: Optional[Set[str]] = None) -> List[str]:
+    def _needs_compaction(self) -> bool:
+        return bool(self.dead_rows) and self.dead_rows >= _COMPACT_RATIO * len(self.docs)
+
+    def compact(self):
+        """Rewrite the store without tombstoned rows, merging its segments.
+
+        The bulk copy runs without holding the store lock; rows appended or
+        tombstoned meanwhile (by any worker) are carried over when the new
+        generation is swapped in. Only one worker compacts a store at a time.
+        """
+        claim = _shared.claim(self.conv_id) if _shared is not None else nullcontext(True)
+        with claim as claimed:
+            if not claimed:
+                return  # another worker is compacting this store
+            compacted = self._compact_pass()
+        if compacted and self._needs_compaction():
+            self.compact()  # rows were tombstoned while this pass ran
+
+    def _compact_pass(self) -> bool:
+        with self._lock:
+            self._sync()
+            if self._compacting or not self.dead_rows:
+                return False
+            self._compacting = True
+            base_rows = len(self.docs)
+            base_dead = [tuple(r) for r in self.files.manifest["dead"]]
+            generation = self.files.manifest["generation"] + 1
+        try:
+            kept = _complement(base_dead, base_rows)
+            try:
+                self.files.write_generation(generation, kept, self.sentences.ranges(kept))
+            except FileNotFoundError:
+                return False  # deleted while compacting
+            with self._write_lock(), self._lock:
+                reloaded = self._sync()
+                if not self.files.exists():
+                    self.files.remove()  # deleted while compacting; drop partial files
+                    return False
+                if reloaded and (
+                    len(self.docs) < base_rows
+                    or not set(base_dead) <= set(map(tuple, self.files.manifest["dead"]))
+                ):
+                    # Deleted and recreated by another worker: the copy no longer applies.
+                    self.files.discard_generation(generation)
+                    return False
+                tail = (base_rows, len(self.docs))
+                if tail[1] > tail[0]:
+                    self.files.write_generation(
+                        generation, [tail], self.sentences.ranges([tail]), truncate=False
+                    )
+                    kept.append(tail)
+                remap = _RowRemap(kept)
+                segments = []
+                for seg in self.files.manifest["segments"]:
+                    start, stop = remap(seg["start"], seg["stop"])
+                    segments.append({"doc_id": seg["doc_id"], "start": start, "stop": stop})
+                dead = [
+                    remap(*r) for r in map(tuple, self.files.manifest["dead"]) if r not in base_dead
+                ]
+                refs = {
+                    d_id: [remap(row, row + 1)[0] for row in rows]
+                    for d_id, rows in self.files.manifest["refs"].items()
+                }
+                rows = sum(stop - start for start, stop in kept)
+                docs = [entry for start, stop in kept for entry in self.docs[start:stop]]
+                sentence_rows = sum(s_stop - s_start for s_start, s_stop in self.sentences.ranges(kept))
+                self.files.commit_generation(generation, rows, sentence_rows, segments, dead, refs)
+                self._written()
+                sentences = self.sentences.take(self.files.open_sentence_vectors(), kept)
+                had_lexical = self.lexical is not None
+                self._set_state(self.files.open_vectors(), docs, sentences)
+                if self.ann is not None:
+                    self.ann = self.ann.take(kept)
+                    self.ann.save(self.ann_path, generation)
+            if had_lexical:
+                self._ensure_lexical()  # rebuild here rather than in the next search
+            self._persisted()
+        finally:
+            self._compacting = False
+        return True
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 8,
+        restrict_doc_ids: Optional[Set[str]] = None,
+        nprobe: Optional[int] = None,
+    ) -> List[str]:
+        """Texts of the best ``top_k`` chunks; ``nprobe`` trades recall for latency on large stores."""
         if self.vectors is None or not self.docs:
             return []
         q_vec = _embed([query])
         if q_vec.size == 0:
             return []
-        candidates = _top_k_cosine(self.vectors, q_vec[0], top_k * 3)
-        results: List[str] = []
-        for idx in candidates:
-            text, d_id = self.docs[idx]
-            if restrict_doc_ids is not None and (not d_id or d_id not in restrict_doc_ids):
-                continue
-            results.append(text)
-            if len(results) >= top_k:
-                break
-        return results
+        return self.search_vector(q_vec[0], top_k, restrict_doc_ids, nprobe, query_text=query)
+
+    def search_vector(
+        self,
+        query_vec: Sequence[float],
+        top_k: int = 8,
+        restrict_doc_ids: Optional[Set[str]] = None,
+        nprobe: Optional[int] = None,
+        query_text: Optional[str] = None,
+    ) -> List[str]:
+        """Like search, for a query that has already been embedded."""
+        return [
+            chunk.text
+            for chunk in self.retrieve_vector(query_vec, top_k, restrict_doc_ids, nprobe, query_text)
+        ]
+
+    def retrieve_vector(
+        self,
+        query_vec: Sequence[float],
+        top_k: int = 8,
+        restrict_doc_ids: Optional[Set[str]] = None,
+        nprobe: Optional[int] = None,
+        query_text: Optional[str] = None,
+    ) -> List[RetrievedChunk]:
+        """Best chunks for an embedded query, with their precomputed sentence vectors.
+
+        With ``query_text`` (and hybrid search enabled) the vector ranking is
+        fused with a BM25 ranking, so exact identifiers in the query are found.
+        """
+        if query_text and _HYBRID_SEARCH:
+            self._ensure_lexical()
+        view = self.snapshot()
+        if view.vectors is None or not view.docs:
+            return []
+        query_vec = _normalize(np.asarray(query_vec, dtype="float32")[None, :])[0]
+        rows = _search_rows(view, query_vec, top_k, restrict_doc_ids, nprobe, query_text)
+        referenced = _referenced_rows(view, restrict_doc_ids)
+        return [_retrieved_chunk(view, row, restrict_doc_ids, referenced) for row in rows]
+
+    def retrieve_vectors(
+        self,
+        query_vecs: Sequence[Sequence[float]],
+        top_k: int = 8,
+        restrict_doc_ids: Optional[Set[str]] = None,
+        nprobe: Optional[int] = None,
+        query_texts: Optional[Sequence[str]] = None,
+    ) -> List[List[RetrievedChunk]]:
+        """retrieve_vector for several queries against one snapshot.
+
+        The queries are scored together, one matrix-matrix product per block of
+        allowed rows, instead of one pass over the store per query.
+        """
+        if query_texts and _HYBRID_SEARCH:
+            self._ensure_lexical()
+        view = self.snapshot()
+        if view.vectors is None or not view.docs or not len(query_vecs):
+            return [[] for _ in query_vecs]
+        queries = _normalize(np.asarray(query_vecs, dtype="float32"))
+        rows = _search_rows_batch(view, queries, top_k, restrict_doc_ids, nprobe, query_texts)
+        referenced = _referenced_rows(view, restrict_doc_ids)
+        return [
+            [_retrieved_chunk(view, row, restrict_doc_ids, referenced) for row in query_rows]
+            for query_rows in rows
+        ]
 
     def delete_store(self):
         """Remove the persisted vector store for this conversation."""
-        if os.path.exists(self.path):
-            os.remove(self.path)
+        with self._write_lock(), self._lock:
+            self.files.remove()
+            if os.path.exists(self.legacy_path):
+                os.remove(self.legacy_path)
+            self._clear_state()
+            self.version = next(_versions)
+            self._written()
+        _cache.discard(self.conv_id)
+
+    def _clear_state(self):
         self.vectors = None
         self.docs = []
+        self.doc_rows = {}
+        self.doc_refs = {}
+        self.duplicates = {}
+        self._row_hashes = None
+        self.dead_rows = 0
+        self.ann = None
+        self.quantized = None
+        self.sentences = Sentences.empty()
+        self.lexical = None
+        self._text_bytes = 0
+
+
+class _RowRemap:
+    """Maps row ranges inside ``kept`` ranges to their compacted positions."""
+
+    def __init__(self, kept: List[Tuple[int, int]]):
+        self.starts = [start for start, _ in kept]
+        self.offsets = []
+        new_start = 0
+        for start, stop in kept:
+            self.offsets.append(new_start - start)
+            new_start += stop - start
+
+    def __call__(self, start: int, stop: int) -> Tuple[int, int]:
+        offset = self.offsets[bisect_right(self.starts, start) - 1]
+        return start + offset, stop + offset
+
+
+def _complement(ranges: List[Tuple[int, int]], total: int) -> List[Tuple[int, int]]:
+    """Row ranges of ``[0, total)`` not covered by the sorted ``ranges``."""
+    kept: List[Tuple[int, int]] = []
+    prev = 0
+    for start, stop in sorted(ranges):
+        if start > prev:
+            kept.append((prev, start))
+        prev = max(prev, stop)
+    if prev < total:
+        kept.append((prev, total))
+    return kept
+
+
+def _merge_ranges(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Sorted, non-overlapping union of row ranges."""
+    merged: List[Tuple[int, int]] = []
+    for start, stop in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], stop))
+        else:
+            merged.append((start, stop))
+    return merged
+
+
+class _LiveRows:
+    """Membership test for rows inside a store's live row ranges."""
+
+    def __init__(self, doc_rows: Dict[Optional[str], List[Tuple[int, int]]]):
+        self.ranges = _merge_ranges([r for doc_ranges in doc_rows.values() for r in doc_ranges])
+        self.starts = [start for start, _ in self.ranges]
+
+    def __call__(self, row: int) -> bool:
+        slot = bisect_right(self.starts, row) - 1
+        return slot >= 0 and row < self.ranges[slot][1]
+
+
+def _nearest_rows(
+    view: StoreView, queries: np.ndarray, ranges: List[Tuple[int, int]]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Most similar live row to each of the unit-norm ``queries`` and its cosine score.
+
+    Exact stores are scanned block by block as one matrix product per block;
+    stores large enough for the IVF index look up each query through it.
+    """
+    allowed = sum(stop - start for start, stop in ranges)
+    best_rows = np.full(queries.shape[0], -1, dtype=np.int64)
+    best_scores = np.full(queries.shape[0], -np.inf, dtype=np.float32)
+    if view.ann is not None and allowed >= _ANN_MIN_ROWS:
+        for i, query in enumerate(queries):
+            rows = _vector_rows(view, query, 1, ranges, allowed, None)
+            if rows:
+                best_rows[i] = rows[0]
+                best_scores[i] = float(view.vectors[rows[0]] @ query)
+        return best_rows, best_scores
+    for start, stop in ranges:
+        for block in range(start, stop, _SCAN_BLOCK_ROWS):
+            end = min(block + _SCAN_BLOCK_ROWS, stop)
+            scores = view.vectors[block:end] @ queries.T
+            top = np.argmax(scores, axis=0)
+            top_scores = scores[top, np.arange(queries.shape[0])]
+            better = top_scores > best_scores
+            best_rows[better] = top[better] + block
+            best_scores[better] = top_scores[better]
+    return best_rows, best_scores
+
+
+def _search_rows(
+    view: StoreView,
+    query_vec: np.ndarray,
+    top_k: int,
+    restrict_doc_ids: Optional[Set[str]] = None,
+    nprobe: Optional[int] = None,
+    query_text: Optional[str] = None,
+) -> List[int]:
+    """Best ``top_k`` live rows, scoring only rows of allowed documents when restricted."""
+    total_rows = view.vectors.shape[0]
+    ranges = _allowed_ranges(view, restrict_doc_ids)
+    allowed = sum(stop - start for start, stop in ranges)
+    if not allowed:
+        return []
+    if query_text and _HYBRID_SEARCH and view.lexical is not None and view.lexical.rows == total_rows:
+        pool = top_k * max(_HYBRID_CANDIDATES, 1)
+        with timer("lexical_search"):
+            lexical_rows = view.lexical.search(query_text, ranges, pool, _LEXICAL_MIN_RATIO)
+        if lexical_rows:
+            with timer("vector_search"):
+                vector_rows = _vector_rows(view, query_vec, pool, ranges, allowed, nprobe)
+            # Lexical first: on equal fused scores an exact term match wins.
+            return reciprocal_rank_fusion([lexical_rows, vector_rows], top_k, _RRF_K)
+    with timer("vector_search"):
+        return _vector_rows(view, query_vec, top_k, ranges, allowed, nprobe)
+
+
+def _search_rows_batch(
+    view: StoreView,
+    queries: np.ndarray,
+    top_k: int,
+    restrict_doc_ids: Optional[Set[str]] = None,
+    nprobe: Optional[int] = None,
+    query_texts: Optional[Sequence[str]] = None,
+) -> List[List[int]]:
+    """_search_rows for each row of ``queries``, sharing the vector scoring pass."""
+    ranges = _allowed_ranges(view, restrict_doc_ids)
+    allowed = sum(stop - start for start, stop in ranges)
+    if not allowed:
+        return [[] for _ in range(queries.shape[0])]
+    lexical = view.lexical
+    hybrid = bool(query_texts) and _HYBRID_SEARCH and lexical is not None and lexical.rows == view.vectors.shape[0]
+    pool = top_k * max(_HYBRID_CANDIDATES, 1) if hybrid else top_k
+    results = []
+    for i, vector_rows in enumerate(_vector_rows_batch(view, queries, pool, ranges, allowed, nprobe)):
+        lexical_rows = lexical.search(query_texts[i], ranges, pool, _LEXICAL_MIN_RATIO) if hybrid else []
+        if lexical_rows:
+            results.append(reciprocal_rank_fusion([lexical_rows, vector_rows], top_k, _RRF_K))
+        else:
+            results.append(vector_rows[:top_k])
+    return results
+
+
+def _allowed_ranges(view: StoreView, restrict_doc_ids: Optional[Set[str]]) -> List[Tuple[int, int]]:
+    """Sorted live row ranges a search may return, all documents' when unrestricted."""
+    total_rows = view.vectors.shape[0]
+    if restrict_doc_ids is None:
+        if view.dead_rows:
+            ranges = sorted(r for doc_ranges in view.doc_rows.values() for r in doc_ranges)
+        else:
+            ranges = [(0, total_rows)]
+    else:
+        ranges = sorted(
+            row_range
+            for d_id in restrict_doc_ids
+            if d_id
+            for row_range in view.doc_rows.get(d_id, ())
+        )
+        # Chunks deduplicated against another document's rows are found through those rows.
+        referenced = [(row, row + 1) for row in _referenced_rows(view, restrict_doc_ids)]
+        if referenced:
+            ranges = _merge_ranges(ranges + referenced)
+    return ranges
+
+
+def _referenced_rows(view: StoreView, restrict_doc_ids: Optional[Set[str]]) -> Dict[int, str]:
+    """Rows that an allowed document references as duplicates, with that document's id."""
+    if restrict_doc_ids is None:
+        return {}
+    return {row: d_id for d_id in restrict_doc_ids if d_id for row in view.doc_refs.get(d_id, ())}
+
+
+def _vector_rows(
+    view: StoreView,
+    query_vec: np.ndarray,
+    top_k: int,
+    ranges: List[Tuple[int, int]],
+    allowed: int,
+    nprobe: Optional[int],
+) -> List[int]:
+    """Best ``top_k`` rows by cosine similarity within the sorted, allowed ``ranges``."""
+    total_rows = view.vectors.shape[0]
+    if view.ann is not None and allowed >= _ANN_MIN_ROWS:
+        rows = _ann_candidates(view.ann, query_vec, ranges, nprobe or _ANN_NPROBE)
+        if rows.shape[0] >= top_k:
+            return _best_rows(view, rows, _score_rows(view, rows, query_vec), query_vec, top_k)
+        # Too few allowed rows in the probed lists: fall back to exact search.
+    if view.quantized is None and allowed == total_rows:
+        return list(_top_k_cosine(view.vectors, query_vec, top_k))
+    # Score each allowed range through a view: work scales with allowed rows.
+    scores = np.concatenate([_score_range(view, start, stop, query_vec) for start, stop in ranges])
+    rows = np.concatenate([np.arange(start, stop) for start, stop in ranges])
+    return _best_rows(view, rows, scores, query_vec, top_k)
+
+
+def _vector_rows_batch(
+    view: StoreView,
+    queries: np.ndarray,
+    top_k: int,
+    ranges: List[Tuple[int, int]],
+    allowed: int,
+    nprobe: Optional[int],
+) -> List[List[int]]:
+    """_vector_rows for each row of ``queries``; exact scoring is one matrix product per range."""
+    if view.ann is not None and allowed >= _ANN_MIN_ROWS:
+        return [_vector_rows(view, query, top_k, ranges, allowed, nprobe) for query in queries]
+    rows = np.concatenate([np.arange(start, stop) for start, stop in ranges])
+    results: List[List[int]] = []
+    # Bound the score matrix by scoring the queries in groups.
+    group = max(1, _BATCH_SCORE_CELLS // allowed)
+    for first in range(0, queries.shape[0], group):
+        block = queries[first:first + group]
+        scores = np.concatenate([_score_range(view, start, stop, block.T) for start, stop in ranges])
+        results.extend(_best_rows(view, rows, scores[:, i], query, top_k) for i, query in enumerate(block))
+    return results
+
+
+def _score_range(view: StoreView, start: int, stop: int, query_vec: np.ndarray) -> np.ndarray:
+    if view.quantized is not None:
+        return view.quantized.score_range(start, stop, query_vec)
+    return view.vectors[start:stop] @ query_vec
+
+
+def _score_rows(view: StoreView, rows: np.ndarray, query_vec: np.ndarray) -> np.ndarray:
+    if view.quantized is not None:
+        return view.quantized.score_rows(rows, query_vec)
+    return view.vectors[rows] @ query_vec
+
+
+def _best_rows(
+    view: StoreView, rows: np.ndarray, scores: np.ndarray, query_vec: np.ndarray, top_k: int
+) -> List[int]:
+    """Top ``top_k`` of ``rows``; quantized scores are re-ranked against float32 rows."""
+    if view.quantized is None or _RERANK_FACTOR <= 0:
+        return rows[_top_k_indices(scores, top_k)].tolist()
+    candidates = np.sort(rows[_top_k_indices(scores, top_k * _RERANK_FACTOR)])
+    exact = view.vectors[candidates] @ query_vec
+    return candidates[_top_k_indices(exact, top_k)].tolist()
+
+
+def _retrieved_chunk(
+    view: StoreView, row: int, restrict_doc_ids: Optional[Set[str]], referenced: Dict[int, str]
+) -> RetrievedChunk:
+    text, doc_id = view.docs[row]
+    if restrict_doc_ids is not None and doc_id not in restrict_doc_ids:
+        # Found through an allowed document's reference: report that document, not the excluded owner.
+        doc_id = referenced.get(row, doc_id)
+    s_start, s_stop = int(view.sentences.offsets[row]), int(view.sentences.offsets[row + 1])
+    if s_stop == s_start or view.sentences.vectors is None:
+        return RetrievedChunk(text, doc_id, split_sentences(text), None)
+    sentences = [text[start:end] for start, end in view.sentences.spans[s_start:s_stop].tolist()]
+    return RetrievedChunk(text, doc_id, sentences, np.asarray(view.sentences.vectors[s_start:s_stop]))
+
+
+def _ann_candidates(
+    ann: IVFIndex, query_vec: np.ndarray, ranges: List[Tuple[int, int]], nprobe: int
+) -> np.ndarray:
+    """IVF candidate rows that fall inside the sorted, allowed ``ranges``."""
+    candidates = ann.candidates(query_vec, nprobe)
+    starts = np.fromiter((start for start, _ in ranges), dtype=np.int64, count=len(ranges))
+    stops = np.fromiter((stop for _, stop in ranges), dtype=np.int64, count=len(ranges))
+    slot = np.searchsorted(starts, candidates, side="right") - 1
+    inside = (slot >= 0) & (candidates < stops[np.maximum(slot, 0)])
+    return candidates[inside]
+
+
+def get_store(conv_id: str) -> VectorStore:
+    """Return the conversation's store, loading it on a miss.
+
+    There is one instance per conversation in a worker, so all of its writes
+    go through one manifest. A store written by another worker since it was
+    loaded catches up first.
+    """
+    store = _cache.get_or_load(conv_id, VectorStore)
+    if store.refresh():
+        store._persisted()
+    return store
+
+
+def cache_stats() -> dict:
+    """Hit/miss/eviction counters and resident size of the store cache."""
+    return _cache.stats()
+
+
+def _empty_report() -> Dict:
+    return {"chunks": 0, "stored": 0, "exact": 0, "near": 0, "duplicate_of": {}}
+
+
+def _count_dedup(counts: Dict[str, int]):
+    with _dedup_lock:
+        for key in _dedup_totals:
+            _dedup_totals[key] += counts[key]
+
+
+def dedup_stats() -> dict:
+    """Chunks added, stored and deduplicated (exact/near) since startup, across stores."""
+    with _dedup_lock:
+        totals = dict(_dedup_totals)
+    totals["dedup_ratio"] = (1 - totals["stored"] / totals["chunks"]) if totals["chunks"] else 0.0
+    return totals
 
 
 def _top_k_cosine(matrix: np.ndarray, query: np.ndarray, k: int) -> Sequence[int]:
+    """Indices of the ``k`` best rows; ``matrix`` rows and ``query`` are unit-norm."""
     if matrix.size == 0:
         return []
-    k = max(k, 1)
-    matrix_norms = np.linalg.norm(matrix, axis=1, keepdims=True)
-    matrix_norm = matrix / np.maximum(matrix_norms, 1e-12)
-    query_norm = query / (np.linalg.norm(query) + 1e-12)
-    scores = matrix_norm @ query_norm
-    top_k_idx = np.argsort(-scores)[: min(k, matrix.shape[0])]
-    return top_k_idx.tolist()
+    return _top_k_indices(matrix @ query, k).tolist()
+
+
+def _top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the ``k`` highest scores, best first."""
+    k = min(max(k, 1), scores.shape[0])
+    if k < scores.shape[0]:
+        top = np.argpartition(scores, -k)[-k:]
+    else:
+        top = np.arange(scores.shape[0])
+    return top[np.argsort(-scores[top])]
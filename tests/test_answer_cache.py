@@ -0,0 +1,30 @@
+"""Semantic answer cache lookups."""
+from services.answer_cache import AnswerCache, query_identifiers
+from services.hash_embedding import HashEmbedding
+
+VERSION = (1, frozenset({"doc"}))
+
+
+def _vector(question: str):
+    return next(iter(HashEmbedding(384).embed([question])))
+
+
+def test_questions_differing_in_an_identifier_both_miss():
+    cache = AnswerCache(threshold=0.95, ttl=60, max_entries=16, max_per_conversation=16)
+    first, second = "What causes error E1042 during upload?", "What causes error E1043 during upload?"
+    assert float(_vector(first) @ _vector(second)) > 0.8  # close enough that vectors alone may match
+    same_vector = _vector(first)
+
+    cache.put("c", VERSION, same_vector, first, "answer for E1042")
+    assert cache.get("c", VERSION, same_vector, second) is None
+    cache.put("c", VERSION, same_vector, second, "answer for E1043")
+    assert cache.get("c", VERSION, same_vector, first) == "answer for E1042"
+    assert cache.get("c", VERSION, same_vector, second) == "answer for E1043"
+    assert cache.get("c", VERSION, same_vector, "What is in section 4.2?") is None
+
+
+def test_paraphrases_with_the_same_identifiers_hit():
+    cache = AnswerCache(threshold=0.5, ttl=60, max_entries=16, max_per_conversation=16)
+    cache.put("c", VERSION, _vector("summary of section 4.2"), "Summary of section 4.2", "answer")
+    assert cache.get("c", VERSION, _vector("summary of section 4.2 please"), "summary of section 4.2 please") == "answer"
+    assert query_identifiers("Summary of section 4.2") == query_identifiers("section 4.2, summarized")
@@ -0,0 +1,43 @@
+"""Memory and SQLite tiers of the embedding cache."""
+import sqlite3
+import threading
+
+import numpy as np
+
+from services.embedding_cache import EmbeddingCache
+
+
+def _vector(i: int) -> np.ndarray:
+    return np.full(4, i, dtype=np.float32)
+
+
+def _disk_rows(path) -> int:
+    with sqlite3.connect(path) as db:
+        return db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = EmbeddingCache("m", 0, path, max_disk_items=10)
+    cache.put_many([f"text {i}" for i in range(10)], [_vector(i) for i in range(10)])
+    assert cache.get_many(["text 0"])[0][0] == 0  # read back from disk, so now recently used
+    cache.put_many([f"text {i}" for i in range(10, 13)], [_vector(i) for i in range(10, 13)])
+
+    assert _disk_rows(path) <= 10
+    reopened = EmbeddingCache("m", 0, path, max_disk_items=10)
+    found = reopened.get_many(["text 0", "text 1", "text 12"])
+    assert found[0] is not None and found[2] is not None
+    assert found[1] is None  # the oldest untouched entry went first
+    assert cache.stats()["disk_evictions"] >= 3
+
+
+def test_memory_hits_do_not_wait_for_the_disk(tmp_path):
+    cache = EmbeddingCache("m", 100, str(tmp_path / "cache.sqlite3"))
+    cache.put_many(["hot"], [_vector(1)])
+    found = []
+    with cache._db_lock:  # a slow disk write in progress
+        reader = threading.Thread(target=lambda: found.extend(cache.get_many(["hot"])))
+        reader.start()
+        reader.join(timeout=5)
+        assert not reader.is_alive()
+    assert found[0][0] == 1
@@ -0,0 +1,28 @@
+"""Token counts used by the structured chunker."""
+from types import SimpleNamespace
+
+import pytest
+
+from services import embedding_service
+
+tokenizers = pytest.importorskip("tokenizers")
+
+
+def _padded_tokenizer():
+    """A tiny tokenizer configured like fastembed's: padding to the batch's longest text, truncation on."""
+    vocab = {"[PAD]": 0, "[UNK]": 1, "a": 2, "b": 3}
+    tokenizer = tokenizers.Tokenizer(tokenizers.models.WordLevel(vocab, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = tokenizers.pre_tokenizers.Whitespace()
+    tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+    tokenizer.enable_truncation(max_length=4)
+    return tokenizer
+
+
+def test_count_tokens_per_text_in_a_mixed_batch(monkeypatch):
+    tokenizer = _padded_tokenizer()
+    assert [len(e.ids) for e in tokenizer.encode_batch(["a", "a b a"])] == [3, 3]  # what was counted before
+    monkeypatch.setattr(embedding_service, "_load_model", lambda: SimpleNamespace(model=SimpleNamespace(tokenizer=tokenizer)))
+    monkeypatch.setattr(embedding_service, "_token_counter", None)
+
+    assert embedding_service.count_tokens(["a", "a b a b a b", "b b"]) == [1, 6, 2]
+    assert tokenizer.padding is not None and tokenizer.truncation is not None  # the model's tokenizer is untouched
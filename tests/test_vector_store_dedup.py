@@ -0,0 +1,48 @@
+"""Chunks shared between documents by deduplication.
+
+Runs in a fresh interpreter (this file run as a script) because store
+settings are read when ``services.vector_store`` is imported.
+"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_duplicate_rows_report_the_allowed_document(tmp_path):
+    environment = dict(
+        os.environ,
+        PYTHONPATH=ROOT,
+        EMBEDDING_BACKEND="hash",
+        EMBEDDING_CACHE="0",
+        VECTOR_DEDUP="1",
+        VECTOR_STORE_DIR=str(tmp_path),
+    )
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__)],
+        cwd=ROOT, env=environment, capture_output=True, text=True, timeout=300,
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
+
+
+def _duplicate_rows_report_the_allowed_document():
+    from services import vector_store
+
+    texts = [f"clause {i} of the shared appendix text" for i in range(4)]
+    store = vector_store.VectorStore("dedup")
+    store.add(texts, doc_id="owner")
+    assert store.add(texts, doc_id="copy")["exact"] == len(texts)
+    query = vector_store._embed([texts[0]])[0]
+
+    only_copy = store.retrieve_vector(query, top_k=4, restrict_doc_ids={"copy"}, query_text=texts[0])
+    assert sorted(chunk.text for chunk in only_copy) == sorted(texts)
+    assert {chunk.doc_id for chunk in only_copy} == {"copy"}
+    batch = store.retrieve_vectors([query], top_k=4, restrict_doc_ids={"copy"}, query_texts=[texts[0]])
+    assert {chunk.doc_id for chunk in batch[0]} == {"copy"}
+    both = store.retrieve_vector(query, top_k=4, restrict_doc_ids={"owner", "copy"})
+    assert {chunk.doc_id for chunk in both} == {"owner"}
+
+
+if __name__ == "__main__":
+    _duplicate_rows_report_the_allowed_document()
@@ -0,0 +1,155 @@
+"""Vector stores written by several instances and worker processes on one directory.
+
+Store settings are read when ``services.vector_store`` is imported, so each
+scenario runs in a fresh interpreter (this file run as a script) with its own
+environment. Run from the Backend directory::
+
+    python -m pytest -q tests
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONVERSATION = "shared-conversation"
+
+
+def _run(scenario: str, store_dir, **env: str):
+    environment = dict(
+        os.environ,
+        PYTHONPATH=ROOT,
+        EMBEDDING_BACKEND="hash",
+        EMBEDDING_CACHE="0",
+        VECTOR_DEDUP="0",
+        VECTOR_STORE_DIR=str(store_dir),
+        # Compaction only when a scenario asks for it.
+        VECTOR_STORE_COMPACT_RATIO="1",
+        **env,
+    )
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), scenario],
+        cwd=ROOT, env=environment, capture_output=True, text=True, timeout=300,
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
+
+
+@pytest.mark.parametrize("shared", ["1", "0"])
+def test_instances_write_through_one_manifest(tmp_path, shared):
+    _run("instances", tmp_path, VECTOR_STORE_SHARED=shared)
+
+
+@pytest.mark.parametrize("shared", ["1", "0"])
+def test_store_over_cache_budget(tmp_path, shared):
+    _run("over_budget", tmp_path, VECTOR_STORE_SHARED=shared, VECTOR_STORE_CACHE_BYTES="1000")
+
+
+def test_writes_from_another_process(tmp_path):
+    _run("resident_reader", tmp_path, VECTOR_STORE_SHARED="1")
+
+
+def test_recreated_store_is_reloaded(tmp_path):
+    _run("recreate", tmp_path, VECTOR_STORE_SHARED="1")
+
+
+# ---- scenarios (run in a child interpreter) ----
+
+def _texts(words: str, count: int):
+    return [f"{words} {i} sentence about {words}" for i in range(count)]
+
+
+def _doc_texts(store, doc_id: str):
+    return [store.docs[row][0] for start, stop in store.doc_rows.get(doc_id, []) for row in range(start, stop)]
+
+
+def _assert_contents(store, expected: dict):
+    assert sorted(store.doc_rows) == sorted(expected), store.doc_rows
+    for doc_id, texts in expected.items():
+        assert _doc_texts(store, doc_id) == texts, (doc_id, _doc_texts(store, doc_id))
+
+
+def _instances():
+    from services import vector_store
+
+    a = vector_store.VectorStore(CONVERSATION)
+    b = vector_store.VectorStore(CONVERSATION)
+    a.add(_texts("alpha", 6), doc_id="d1")
+    a.add(_texts("beta", 6), doc_id="d2")
+    b.add(_texts("gamma", 3), doc_id="d3")  # appends after a's rows, not over them
+    b.remove_doc("d1")
+    b.compact()
+    a.add(_texts("delta", 4), doc_id="d4")  # a writes to the generation b compacted into
+    a.remove_doc("d3")
+    expected = {"d2": _texts("beta", 6), "d4": _texts("delta", 4)}
+    for store in (a, b, vector_store.VectorStore(CONVERSATION)):
+        store._sync()
+        _assert_contents(store, expected)
+    assert a.files.manifest["generation"] == b.files.manifest["generation"] == 1
+
+
+def _over_budget():
+    from services import vector_store
+
+    a = vector_store.get_store(CONVERSATION)
+    a.add(_texts("alpha", 20), doc_id="d1")
+    a.add(_texts("beta", 20), doc_id="d2")
+    assert vector_store.get_store(CONVERSATION) is a  # too large to cache, still one instance
+    b = vector_store.VectorStore(CONVERSATION)
+    b.remove_doc("d1")
+    b.compact()
+    a.add(_texts("gamma", 5), doc_id="d3")
+    _assert_contents(
+        vector_store.VectorStore(CONVERSATION),
+        {"d2": _texts("beta", 20), "d3": _texts("gamma", 5)},
+    )
+
+
+def _resident_reader():
+    from services import vector_store
+
+    reader = vector_store.get_store(CONVERSATION)
+    reader.add(_texts("alpha", 6), doc_id="d1")
+    reader.add(_texts("beta", 6), doc_id="d2")
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "other_worker"], capture_output=True, text=True, timeout=300,
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
+    store = vector_store.get_store(CONVERSATION)
+    assert store is reader
+    _assert_contents(store, {"d2": _texts("beta", 6), "d3": _texts("gamma", 3)})
+    assert store.files.manifest["generation"] == 1
+    top = store.search(_texts("gamma", 3)[0], top_k=1)
+    assert top == [_texts("gamma", 3)[0]], top
+
+
+def _other_worker():
+    from services import vector_store
+
+    store = vector_store.get_store(CONVERSATION)
+    _assert_contents(store, {"d1": _texts("alpha", 6), "d2": _texts("beta", 6)})
+    store.remove_doc("d1")
+    store.compact()
+    store.add(_texts("gamma", 3), doc_id="d3")
+
+
+def _recreate():
+    from services import vector_store
+
+    a = vector_store.VectorStore(CONVERSATION)
+    a.add(_texts("alpha", 4), doc_id="old")
+    b = vector_store.VectorStore(CONVERSATION)
+    a.delete_store()
+    vector_store.VectorStore(CONVERSATION).add(_texts("beta", 4), doc_id="new")
+    assert b.refresh()
+    _assert_contents(b, {"new": _texts("beta", 4)})
+
+
+if __name__ == "__main__":
+    {
+        "instances": _instances,
+        "over_budget": _over_budget,
+        "resident_reader": _resident_reader,
+        "other_worker": _other_worker,
+        "recreate": _recreate,
+    }[sys.argv[1]]()
@@ -0,0 +1,223 @@
+import re
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+from utils.text import sentence_spans
+
+# Counts the tokens of each text; defaults to an approximation of a WordPiece tokenizer.
+TokenCounter = Callable[[List[str]], List[int]]
+
+_PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n")
+_APPROX_TOKEN = re.compile(r"\w{1,6}|[^\w\s]")
+_WORD = re.compile(r"\S+")
+_SENTENCE_END = (".", "!", "?", ".\"", ".'", ".)", "?\"", "!\"")
+
+
+def approximate_token_counts(texts: List[str]) -> List[int]:
+    """WordPiece-like estimate: punctuation marks and 6-character word pieces count as one token."""
+    return [len(_APPROX_TOKEN.findall(text)) for text in texts]
+
+
+class Chunk(NamedTuple):
+    text: str
+    page_start: int  # 1-based page numbers the chunk's text came from
+    page_end: int
+
+
+class FixedChunker:
+    """The original scheme: the joined page text sliced every ``size`` characters.
+
+    Streaming and exact: feeding pages one by one yields the same chunks as
+    slicing ``join_pages(pages)`` in one go.
+    """
+
+    def __init__(self, size: int = 500):
+        self.size = size
+        self.buffer = ""
+        self.seen_text = False
+        self.emitted = False
+        self._page_marks: List[Tuple[int, int]] = []  # (buffer offset, page) where each page starts
+
+    def feed(self, page: int, text: str) -> List[Chunk]:
+        if not text:
+            return []
+        if self.seen_text:
+            self.buffer += "\n"
+        self._page_marks.append((len(self.buffer), page))
+        self.buffer += text
+        self.seen_text = True
+        if not self.emitted:
+            stripped = self.buffer.lstrip()
+            self._shift(len(self.buffer) - len(stripped))
+            self.buffer = stripped
+        # Only cut chunks that lie entirely before the last non-whitespace
+        # character, so trailing whitespace is dropped exactly as strip() would.
+        count = len(self.buffer.rstrip()) // self.size
+        if not count:
+            return []
+        cut = count * self.size
+        chunks = [self._chunk(i, i + self.size) for i in range(0, cut, self.size)]
+        self.buffer = self.buffer[cut:]
+        self._shift(cut)
+        self.emitted = True
+        return chunks
+
+    def finish(self) -> List[Chunk]:
+        rest = self.buffer.rstrip()
+        chunks = [self._chunk(0, len(rest))] if rest else []
+        self.buffer, self._page_marks = "", []
+        return chunks
+
+    def _chunk(self, start: int, stop: int) -> Chunk:
+        return Chunk(self.buffer[start:stop], self._page_at(start), self._page_at(stop - 1))
+
+    def _page_at(self, offset: int) -> int:
+        page = self._page_marks[0][1]
+        for mark, number in self._page_marks:
+            if mark > offset:
+                break
+            page = number
+        return page
+
+    def _shift(self, count: int):
+        """Drop ``count`` characters from the front of the buffer's page marks."""
+        marks = [(offset - count, page) for offset, page in self._page_marks]
+        # Keep the last mark at or before the new start; it still covers offset 0.
+        first = max((i for i, (offset, _) in enumerate(marks) if offset <= 0), default=0)
+        self._page_marks = [(max(offset, 0), page) for offset, page in marks[first:]]
+
+
+class _Unit(NamedTuple):
+    text: str
+    tokens: int
+    page_start: int
+    page_end: int
+    paragraph_start: bool
+
+
+class StructuredChunker:
+    """Packs whole sentences into chunks of at most ``max_tokens`` model tokens.
+
+    Chunks end at paragraph breaks once they are at least half full, and a
+    chunk split inside a paragraph repeats up to ``overlap_tokens`` of trailing
+    sentences at the start of the next one. Sentences longer than the budget
+    are split on word boundaries. A sentence left unfinished at the end of a
+    page is carried over and completed with the next page's text.
+    """
+
+    def __init__(self, max_tokens: int = 256, overlap_tokens: int = 32, count_tokens: Optional[TokenCounter] = None):
+        if max_tokens < 1:
+            raise ValueError("max_tokens must be positive")
+        self.max_tokens = max_tokens
+        self.overlap_tokens = max(0, min(overlap_tokens, max_tokens // 2))
+        self.count_tokens = count_tokens or approximate_token_counts
+        self._units: List[_Unit] = []
+        self._tokens = 0
+        self._carry: Optional[_Unit] = None  # unfinished last sentence of the previous page
+
+    def feed(self, page: int, text: str) -> List[Chunk]:
+        pieces: List[_Unit] = []  # sentences, not yet counted
+        carry, self._carry = self._carry, None
+        for p_index, paragraph in enumerate(_PARAGRAPH_BREAK.split(text or "")):
+            for s_index, (start, end) in enumerate(sentence_spans(paragraph)):
+                sentence = paragraph[start:end]
+                if carry is not None:
+                    if p_index == 0:  # the page continues the unfinished sentence
+                        pieces.append(carry._replace(text=_join_words(carry.text, sentence), page_end=page))
+                        carry = None
+                        continue
+                    pieces.append(carry)
+                    carry = None
+                pieces.append(_Unit(sentence, 0, page, page, s_index == 0))
+        if carry is not None:  # a page without text: keep carrying
+            self._carry = carry
+        elif pieces and not pieces[-1].text.endswith(_SENTENCE_END):
+            self._carry = pieces.pop()
+        return self._pack(pieces)
+
+    def finish(self) -> List[Chunk]:
+        chunks: List[Chunk] = []
+        if self._carry is not None:
+            chunks = self._pack([self._carry])
+            self._carry = None
+        if self._units:
+            chunks.append(self._emit(overlap=False))
+        return chunks
+
+    def _pack(self, pieces: List[_Unit]) -> List[Chunk]:
+        chunks: List[Chunk] = []
+        if not pieces:
+            return chunks
+        counts = self.count_tokens([piece.text for piece in pieces])
+        for piece, tokens in zip(pieces, counts):
+            for unit in self._fit(piece._replace(tokens=tokens)):
+                if self._units:
+                    over_budget = self._tokens + unit.tokens > self.max_tokens
+                    paragraph_break = unit.paragraph_start and self._tokens * 2 >= self.max_tokens
+                    if over_budget or paragraph_break:
+                        chunks.append(self._emit(overlap=not unit.paragraph_start))
+                        # Overlap must leave room for the unit that forced the split.
+                        while self._units and self._tokens + unit.tokens > self.max_tokens:
+                            self._tokens -= self._units.pop(0).tokens
+                self._units.append(unit)
+                self._tokens += unit.tokens
+        return chunks
+
+    def _fit(self, unit: _Unit) -> List[_Unit]:
+        """Split a unit that exceeds the budget into word-boundary pieces that fit."""
+        if unit.tokens <= self.max_tokens:
+            return [unit]
+        words = _WORD.findall(unit.text)
+        counts = self.count_tokens(words)
+        pieces: List[_Unit] = []
+        current: List[str] = []
+        tokens = 0
+        for word, count in zip(words, counts):
+            if current and tokens + count > self.max_tokens:
+                pieces.append(unit._replace(text=" ".join(current), tokens=tokens, paragraph_start=unit.paragraph_start and not pieces))
+                current, tokens = [], 0
+            current.append(word)
+            tokens += count
+        if current:
+            pieces.append(unit._replace(text=" ".join(current), tokens=tokens, paragraph_start=unit.paragraph_start and not pieces))
+        return pieces
+
+    def _emit(self, overlap: bool) -> Chunk:
+        units = self._units
+        parts: List[str] = []
+        for i, unit in enumerate(units):
+            if i:
+                parts.append("\n" if unit.paragraph_start else " ")
+            parts.append(unit.text)
+        chunk = Chunk("".join(parts), units[0].page_start, units[-1].page_end)
+        kept: List[_Unit] = []
+        tokens = 0
+        if overlap and self.overlap_tokens:
+            for unit in reversed(units):
+                if tokens + unit.tokens > self.overlap_tokens:
+                    break
+                kept.insert(0, unit._replace(paragraph_start=False))
+                tokens += unit.tokens
+        self._units, self._tokens = kept, tokens
+        return chunk
+
+
+def _join_words(head: str, tail: str) -> str:
+    # A word hyphenated across the page break is rejoined.
+    if head.endswith("-") and not head.endswith(" -"):
+        return head[:-1] + tail
+    return head + " " + tail
+
+
+def make_chunker(
+    strategy: str = "structured",
+    max_tokens: int = 256,
+    overlap_tokens: int = 32,
+    fixed_size: int = 500,
+    count_tokens: Optional[TokenCounter] = None,
+):
+    """A fresh chunker for one document: ``structured`` (default) or the legacy ``fixed``."""
+    if strategy == "fixed":
+        return FixedChunker(fixed_size)
+    if strategy == "structured":
+        return StructuredChunker(max_tokens, overlap_tokens, count_tokens)
+    raise ValueError(f"Unknown chunking strategy {strategy!r}; expected 'structured' or 'fixed'")
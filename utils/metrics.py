@@ -0,0 +1,189 @@
+import bisect
+import contextvars
+import math
+import os
+import re
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+_ENABLED = os.getenv("METRICS", "1").strip().lower() not in ("0", "false", "no")
+# Adds a Server-Timing header with the request's stage durations to every response.
+TIMING_HEADER = _ENABLED and os.getenv("METRICS_TIMING_HEADER", "0").strip().lower() in ("1", "true", "yes")
+_BUCKETS = tuple(
+    float(b) for b in os.getenv(
+        "METRICS_BUCKETS_SECONDS", "0.001,0.0025,0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10,30"
+    ).split(",") if b.strip()
+)
+_PREFIX = "kb"
+
+# Stage durations of the current request, when the timing header is on.
+_request_timings: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram in seconds, in the Prometheus layout."""
+
+    def __init__(self, buckets: Sequence[float] = _BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        slot = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[slot] += 1
+            self.count += 1
+            self.sum += seconds
+
+    def snapshot(self) -> Tuple[List[int], int, float]:
+        with self._lock:
+            return list(self.counts), self.count, self.sum
+
+
+_stages: Dict[str, Histogram] = {}
+_stages_lock = threading.Lock()
+_collectors: List[Tuple[str, Callable[[], dict]]] = []
+
+
+def enabled() -> bool:
+    return _ENABLED
+
+
+def record(stage: str, seconds: float):
+    """Add one observation of ``stage``; also noted for the request's timing header."""
+    if not _ENABLED:
+        return
+    histogram = _stages.get(stage)
+    if histogram is None:
+        with _stages_lock:
+            histogram = _stages.setdefault(stage, Histogram())
+    histogram.observe(seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+class _Timer:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class _NoopTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopTimer()
+
+
+def timer(stage: str):
+    """``with timer("stage"):`` records the block's duration; a shared no-op when metrics are off."""
+    return _Timer(stage) if _ENABLED else _NOOP
+
+
+def timed(stage: str, awaitable: Awaitable[T]) -> Awaitable[T]:
+    """``await timed("stage", coro)``: times an awaitable, e.g. one branch of an ``asyncio.gather``."""
+    if not _ENABLED:
+        return awaitable
+    return _timed(stage, awaitable)
+
+
+async def _timed(stage: str, awaitable: Awaitable[T]) -> T:
+    start = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        record(stage, time.perf_counter() - start)
+
+
+def start_request_timings() -> Tuple[List[Tuple[str, float]], contextvars.Token]:
+    timings: List[Tuple[str, float]] = []
+    return timings, _request_timings.set(timings)
+
+
+def finish_request_timings(token: contextvars.Token):
+    _request_timings.reset(token)
+
+
+def server_timing(timings: Sequence[Tuple[str, float]], total: float) -> str:
+    """Server-Timing header value; repeated stages (e.g. per batch) are summed."""
+    merged: Dict[str, float] = {}
+    for stage, seconds in timings:
+        merged[stage] = merged.get(stage, 0.0) + seconds
+    parts = [f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in merged.items()]
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+
+def register_stats(name: str, stats: Callable[[], dict]):
+    """Export the numeric leaves of ``stats()`` as gauges named ``kb_<name>_<key path>``."""
+    _collectors.append((name, stats))
+
+
+def render() -> str:
+    """All stage histograms and registered stats in the Prometheus text exposition format."""
+    lines = [
+        f"# HELP {_PREFIX}_stage_duration_seconds Duration of request and ingestion stages.",
+        f"# TYPE {_PREFIX}_stage_duration_seconds histogram",
+    ]
+    with _stages_lock:
+        stages = sorted(_stages.items())
+    for stage, histogram in stages:
+        counts, count, total = histogram.snapshot()
+        label = _escape(stage)
+        cumulative = 0
+        for bound, n in zip((*histogram.buckets, math.inf), counts):
+            cumulative += n
+            le = "+Inf" if bound == math.inf else repr(bound)
+            lines.append(f'{_PREFIX}_stage_duration_seconds_bucket{{stage="{label}",le="{le}"}} {cumulative}')
+        lines.append(f'{_PREFIX}_stage_duration_seconds_sum{{stage="{label}"}} {total!r}')
+        lines.append(f'{_PREFIX}_stage_duration_seconds_count{{stage="{label}"}} {count}')
+    for name, stats in _collectors:
+        try:
+            values = stats()
+        except Exception:
+            continue
+        for key, value in _flatten(values, f"{_PREFIX}_{name}"):
+            lines.append(f"# TYPE {key} gauge")
+            lines.append(f"{key} {value!r}")
+    return "\n".join(lines) + "\n"
+
+
+def _flatten(values, prefix: str):
+    if isinstance(values, bool):
+        yield prefix, int(values)
+    elif isinstance(values, (int, float)):
+        yield prefix, values
+    elif isinstance(values, dict):
+        for key, value in values.items():
+            yield from _flatten(value, f"{prefix}_{_metric_name(str(key))}")
+
+
+def _metric_name(key: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", key)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -1,10 +1,86 @@
-from pypdf import PdfReader
+import asyncio
+import time
+from collections import deque
+from typing import TYPE_CHECKING, AsyncIterator, Awaitable, Callable, Iterable, Iterator, List, NamedTuple, Tuple
+
+if TYPE_CHECKING:
+    from pypdf import PdfReader
+
+# Pages handed to one worker task: large enough to amortize re-opening the
+# document in the worker, small enough to keep all workers busy.
+PAGES_PER_TASK = 16
+
+
+class PageText(NamedTuple):
+    number: int  # 1-based page number
+    text: str
+    seconds: float  # time spent extracting this page
+
+
+def extract_pages(file_like) -> List[str]:
+    from pypdf import PdfReader
 
-def load_pdf(file_like):
     reader = PdfReader(file_like)
-    text = ""
-    for page in reader.pages:
-        t = page.extract_text() or ""
-        if t:
-            text += t + "\n"
-    return text.strip()
+    return [page.extract_text() or "" for page in reader.pages]
+
+def load_pdf(file_like):
+    return join_pages(extract_pages(file_like))
+
+def join_pages(pages: Iterable[str]) -> str:
+    return "\n".join(t for t in pages if t).strip()
+
+def _reader(path: str) -> "PdfReader":
+    # pypdf is imported where pages are parsed (the parse pool), not at app startup.
+    from pypdf import PdfReader
+
+    # Pool workers read the file themselves instead of receiving a pickled
+    # copy of the whole document with every task.
+    return PdfReader(path)
+
+def count_pages(path: str) -> int:
+    return len(_reader(path).pages)
+
+def extract_page_range(path: str, start: int, stop: int) -> List[PageText]:
+    """Extract pages ``start``..``stop - 1`` (0-based); runs in a worker process."""
+    return list(_iter_range(_reader(path), start, stop))
+
+def _iter_range(reader: "PdfReader", start: int, stop: int) -> Iterator[PageText]:
+    for index in range(start, min(stop, len(reader.pages))):
+        began = time.perf_counter()
+        text = reader.pages[index].extract_text() or ""
+        yield PageText(index + 1, text, time.perf_counter() - began)
+
+def page_ranges(page_count: int, pages_per_task: int = PAGES_PER_TASK) -> List[Tuple[int, int]]:
+    step = max(int(pages_per_task), 1)
+    return [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+
+def iter_pages(path: str) -> Iterator[PageText]:
+    """Yield the text of each page in order, extracted serially in the calling thread."""
+    reader = _reader(path)
+    yield from _iter_range(reader, 0, len(reader.pages))
+
+async def aiter_pages(
+    path: str,
+    submit: Callable[..., Awaitable[List[PageText]]],
+    page_count: int,
+    pages_per_task: int = PAGES_PER_TASK,
+    max_in_flight: int = 8,
+) -> AsyncIterator[PageText]:
+    """Yield the text of each page in order, as soon as it has been extracted.
+
+    Page ranges are handed to ``submit(extract_page_range, path, start, stop)``
+    (e.g. ``run_parse``) with at most ``max_in_flight`` ranges ahead of the
+    consumer; ranges still pending when the consumer stops are cancelled.
+    """
+    ranges = deque(page_ranges(page_count, pages_per_task))
+    pending: deque = deque()
+    try:
+        while ranges or pending:
+            while ranges and len(pending) < max(max_in_flight, 1):
+                start, stop = ranges.popleft()
+                pending.append(asyncio.ensure_future(submit(extract_page_range, path, start, stop)))
+            for page in await pending.popleft():
+                yield page
+    finally:
+        for future in pending:
+            future.cancel()
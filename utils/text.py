@@ -0,0 +1,25 @@
+import re
+from typing import List, Tuple
+
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+
+
+def sentence_spans(text: str) -> List[Tuple[int, int]]:
+    """``(start, end)`` offsets of the whitespace-trimmed sentences in ``text``."""
+    spans: List[Tuple[int, int]] = []
+    start = 0
+    bounds = [(m.start(), m.end()) for m in _SENTENCE_BOUNDARY.finditer(text)]
+    for end, next_start in [*bounds, (len(text), len(text))]:
+        s, e = start, end
+        while s < e and text[s].isspace():
+            s += 1
+        while e > s and text[e - 1].isspace():
+            e -= 1
+        if e > s:
+            spans.append((s, e))
+        start = next_start
+    return spans
+
+
+def split_sentences(text: str) -> List[str]:
+    return [text[start:end] for start, end in sentence_spans(text)]